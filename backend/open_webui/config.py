@@ -3,6 +3,9 @@ import logging
 import os
 import shutil
 import base64
+import threading
+import time
+import uuid
 import redis
 
 from datetime import datetime
@@ -17,6 +20,7 @@ from authlib.integrations.starlette_client import OAuth
 
 
 from open_webui.env import (
+    CONFIG_REDIS_SYNC_INTERVAL,
     DATA_DIR,
     DATABASE_URL,
     ENV,
@@ -227,6 +231,14 @@ class PersistentConfig(Generic[T]):
 
 
 class AppConfig:
+    """
+    Config values read from memory. With Redis, a change is written to Redis and
+    published on the config channel, which a background thread on every replica
+    applies to its local values. The thread also re-reads every value each
+    `sync_interval` seconds, which bounds how stale a value can get when a
+    change message is missed.
+    """
+
     _state: dict[str, PersistentConfig]
     _redis: Optional[redis.Redis] = None
     _redis_key_prefix: str
@@ -236,48 +248,120 @@ class AppConfig:
         redis_url: Optional[str] = None,
         redis_sentinels: Optional[list] = [],
         redis_key_prefix: str = "open-webui",
+        sync_interval: float = CONFIG_REDIS_SYNC_INTERVAL,
     ):
         super().__setattr__("_state", {})
         super().__setattr__("_redis_key_prefix", redis_key_prefix)
+        super().__setattr__("_sync_interval", sync_interval)
+        # Keys not read from Redis yet, each is read once on its first access
+        super().__setattr__("_unsynced", set())
+        # Local writes per key, which a refresh that raced with them must not undo
+        super().__setattr__("_writes", {})
+        super().__setattr__("_sync_thread", None)
+        super().__setattr__("_id", str(uuid.uuid4()))
         if redis_url:
             super().__setattr__(
                 "_redis",
                 get_redis_connection(redis_url, redis_sentinels, decode_responses=True),
             )
 
+    def _redis_key(self, key: str) -> str:
+        return f"{self._redis_key_prefix}:config:{key}"
+
+    def _channel(self) -> str:
+        return f"{self._redis_key_prefix}:config:changed"
+
     def __setattr__(self, key, value):
         if isinstance(value, PersistentConfig):
             self._state[key] = value
+            if self._redis:
+                self._unsynced.add(key)
         else:
+            self._writes[key] = self._writes.get(key, 0) + 1
             self._state[key].value = value
             self._state[key].save()
 
             if self._redis:
-                redis_key = f"{self._redis_key_prefix}:config:{key}"
-                self._redis.set(redis_key, json.dumps(self._state[key].value))
+                self._unsynced.discard(key)
+                serialized_value = json.dumps(self._state[key].value)
+                self._redis.set(self._redis_key(key), serialized_value)
+                self._redis.publish(
+                    self._channel(),
+                    json.dumps(
+                        {"key": key, "value": serialized_value, "sender": self._id}
+                    ),
+                )
 
     def __getattr__(self, key):
         if key not in self._state:
             raise AttributeError(f"Config key '{key}' not found")
 
-        # If Redis is available, check for an updated value
         if self._redis:
-            redis_key = f"{self._redis_key_prefix}:config:{key}"
-            redis_value = self._redis.get(redis_key)
-
-            if redis_value is not None:
-                try:
-                    decoded_value = json.loads(redis_value)
+            if self._sync_thread is None:
+                self._start_sync()
+            if key in self._unsynced:
+                self._unsynced.discard(key)
+                self._apply(key, self._redis.get(self._redis_key(key)))
 
-                    # Update the in-memory value if different
-                    if self._state[key].value != decoded_value:
-                        self._state[key].value = decoded_value
-                        log.info(f"Updated {key} from Redis: {decoded_value}")
+        return self._state[key].value
 
-                except json.JSONDecodeError:
-                    log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+    def _apply(self, key: str, redis_value: Optional[str]):
+        if redis_value is None or key not in self._state:
+            return
+        try:
+            decoded_value = json.loads(redis_value)
+
+            # Update the in-memory value if different
+            if self._state[key].value != decoded_value:
+                self._state[key].value = decoded_value
+                log.info(f"Updated {key} from Redis: {decoded_value}")
+
+        except json.JSONDecodeError:
+            log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+
+    def _refresh(self):
+        keys = list(self._state.keys())
+        if not keys:
+            return
+        writes = dict(self._writes)
+        values = self._redis.mget([self._redis_key(key) for key in keys])
+        for key, redis_value in zip(keys, values):
+            if self._writes.get(key, 0) != writes.get(key, 0):
+                # Written locally after the values were read
+                continue
+            self._unsynced.discard(key)
+            self._apply(key, redis_value)
+
+    def _start_sync(self):
+        thread = threading.Thread(
+            target=self._sync, name="config-redis-sync", daemon=True
+        )
+        super().__setattr__("_sync_thread", thread)
+        thread.start()
 
-        return self._state[key].value
+    def _sync(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel())
+                # Changes made before the subscription are picked up by a refresh
+                self._refresh()
+                refreshed_at = time.monotonic()
+
+                while True:
+                    message = pubsub.get_message(timeout=self._sync_interval)
+                    if message is not None:
+                        data = json.loads(message["data"])
+                        if data.get("sender") != self._id:
+                            self._unsynced.discard(data["key"])
+                            self._apply(data["key"], data["value"])
+
+                    if time.monotonic() - refreshed_at >= self._sync_interval:
+                        self._refresh()
+                        refreshed_at = time.monotonic()
+            except Exception as e:
+                log.warning(f"Config sync from Redis failed, retrying: {e}")
+                time.sleep(self._sync_interval)
 
 
 ####################################
@@ -800,6 +884,47 @@ if CUSTOM_NAME:
 
 STORAGE_PROVIDER = os.environ.get("STORAGE_PROVIDER", "local")  # defaults to local, s3
 
+# Size of the chunks uploads are copied, hashed and sent to the storage providers
+# in, and of the parts of multipart uploads. Rounded up to a multiple of 256 KiB
+# (required by GCS) between 5 MiB (the S3 minimum part size) and 4000 MiB (the
+# Azure maximum block size).
+STORAGE_UPLOAD_CHUNK_SIZE = os.environ.get("STORAGE_UPLOAD_CHUNK_SIZE", "")
+try:
+    STORAGE_UPLOAD_CHUNK_SIZE = int(STORAGE_UPLOAD_CHUNK_SIZE)
+except ValueError:
+    STORAGE_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+if (
+    not 5 * 1024 * 1024 <= STORAGE_UPLOAD_CHUNK_SIZE <= 4000 * 1024 * 1024
+    or STORAGE_UPLOAD_CHUNK_SIZE % (256 * 1024)
+):
+    log.warning(
+        f"STORAGE_UPLOAD_CHUNK_SIZE={STORAGE_UPLOAD_CHUNK_SIZE} is outside 5-4000 MiB "
+        "or not a multiple of 256 KiB, adjusting it"
+    )
+    STORAGE_UPLOAD_CHUNK_SIZE = min(
+        max(STORAGE_UPLOAD_CHUNK_SIZE, 5 * 1024 * 1024), 4000 * 1024 * 1024
+    )
+    STORAGE_UPLOAD_CHUNK_SIZE = -(-STORAGE_UPLOAD_CHUNK_SIZE // (256 * 1024)) * (
+        256 * 1024
+    )
+
+# Bytes of local copies of S3, GCS and Azure objects kept in UPLOAD_DIR, least
+# recently used copies are evicted beyond it. 0 downloads the object on every read
+STORAGE_LOCAL_CACHE_SIZE = os.environ.get("STORAGE_LOCAL_CACHE_SIZE", "")
+try:
+    STORAGE_LOCAL_CACHE_SIZE = int(STORAGE_LOCAL_CACHE_SIZE)
+except ValueError:
+    STORAGE_LOCAL_CACHE_SIZE = 10 * 1024 * 1024 * 1024
+
+# Copies read within this many seconds are never evicted, as the path handed to a
+# reader may not have been opened yet; the cache can briefly exceed its size
+STORAGE_LOCAL_CACHE_MIN_AGE = os.environ.get("STORAGE_LOCAL_CACHE_MIN_AGE", "300")
+try:
+    STORAGE_LOCAL_CACHE_MIN_AGE = max(float(STORAGE_LOCAL_CACHE_MIN_AGE), 0)
+except ValueError:
+    STORAGE_LOCAL_CACHE_MIN_AGE = 300.0
+
 S3_ACCESS_KEY_ID = os.environ.get("S3_ACCESS_KEY_ID", None)
 S3_SECRET_ACCESS_KEY = os.environ.get("S3_SECRET_ACCESS_KEY", None)
 S3_REGION_NAME = os.environ.get("S3_REGION_NAME", None)
@@ -2202,6 +2327,23 @@ RAG_HYBRID_BM25_WEIGHT = PersistentConfig(
     float(os.environ.get("RAG_HYBRID_BM25_WEIGHT", "0.5")),
 )
 
+# Keep a persistent BM25 index per collection instead of fetching and tokenizing
+# every document of a collection on each hybrid search
+ENABLE_RAG_BM25_INDEX = (
+    os.environ.get("ENABLE_RAG_BM25_INDEX", "False").lower() == "true"
+)
+
+# The index is kept in sync with the writes of this instance. Replicas sharing one
+# vector DB but not CACHE_DIR cannot see each other's writes, so every index is
+# checked against its collection at most once per interval (in seconds) and
+# rebuilt when they differ. Set to 0 on a single instance or a shared CACHE_DIR.
+try:
+    RAG_BM25_INDEX_VALIDATE_INTERVAL = int(
+        os.environ.get("RAG_BM25_INDEX_VALIDATE_INTERVAL", "300")
+    )
+except ValueError:
+    RAG_BM25_INDEX_VALIDATE_INTERVAL = 300
+
 ENABLE_RAG_HYBRID_SEARCH = PersistentConfig(
     "ENABLE_RAG_HYBRID_SEARCH",
     "rag.enable_hybrid_search",
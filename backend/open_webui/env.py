@@ -341,6 +341,37 @@ ENABLE_REALTIME_CHAT_SAVE = (
     os.environ.get("ENABLE_REALTIME_CHAT_SAVE", "False").lower() == "true"
 )
 
+# Realtime saves are buffered and flushed at most once per interval (seconds),
+# or as soon as the buffered message has grown by the given number of bytes.
+REALTIME_CHAT_SAVE_INTERVAL = os.environ.get("REALTIME_CHAT_SAVE_INTERVAL", "1")
+
+try:
+    REALTIME_CHAT_SAVE_INTERVAL = float(REALTIME_CHAT_SAVE_INTERVAL)
+except ValueError:
+    REALTIME_CHAT_SAVE_INTERVAL = 1.0
+
+REALTIME_CHAT_SAVE_MAX_BYTES = os.environ.get("REALTIME_CHAT_SAVE_MAX_BYTES", "16384")
+
+try:
+    REALTIME_CHAT_SAVE_MAX_BYTES = int(REALTIME_CHAT_SAVE_MAX_BYTES)
+except ValueError:
+    REALTIME_CHAT_SAVE_MAX_BYTES = 16384
+
+# Chat events of a streamed response emitted within this window (seconds) are
+# sent to the client as one batched frame, 0 sends every event on its own.
+CHAT_EVENT_BATCH_INTERVAL = os.environ.get("CHAT_EVENT_BATCH_INTERVAL", "0")
+
+try:
+    CHAT_EVENT_BATCH_INTERVAL = float(CHAT_EVENT_BATCH_INTERVAL)
+except ValueError:
+    CHAT_EVENT_BATCH_INTERVAL = 0.0
+
+# Store chat messages as individual rows in the `chat_message` table instead of
+# rewriting the whole `chat.chat` JSON document on every message upsert.
+ENABLE_CHAT_MESSAGE_STORE = (
+    os.environ.get("ENABLE_CHAT_MESSAGE_STORE", "False").lower() == "true"
+)
+
 ####################################
 # CLASSROOM MODE FEATURE FLAG
 ####################################
@@ -349,6 +380,14 @@ ENABLE_REALTIME_CHAT_SAVE = (
 # Default set to enabled per project requirement so classroom features are always available
 CLASSROOM_MODE = os.environ.get("CLASSROOM_MODE", "true").lower() == "true"
 
+# Number of classroom materials extracted and embedded at the same time by the
+# background ingestion queue
+CLASSROOM_INGESTION_WORKERS = os.environ.get("CLASSROOM_INGESTION_WORKERS", "2")
+try:
+    CLASSROOM_INGESTION_WORKERS = max(int(CLASSROOM_INGESTION_WORKERS), 1)
+except ValueError:
+    CLASSROOM_INGESTION_WORKERS = 2
+
 ####################################
 # REDIS
 ####################################
@@ -367,6 +406,98 @@ try:
 except ValueError:
     REDIS_SENTINEL_MAX_RETRY_COUNT = 2
 
+# Config values changed on another replica are applied through pub/sub, and all
+# values are re-read from Redis at this interval (seconds) in case a change
+# message was missed.
+CONFIG_REDIS_SYNC_INTERVAL = os.environ.get("CONFIG_REDIS_SYNC_INTERVAL", "10")
+try:
+    CONFIG_REDIS_SYNC_INTERVAL = float(CONFIG_REDIS_SYNC_INTERVAL)
+except ValueError:
+    CONFIG_REDIS_SYNC_INTERVAL = 10.0
+
+####################################
+# QUERY EMBEDDING CACHE
+####################################
+
+# Query embeddings are cached in-process (LRU bounded by size, evicted after the
+# TTL in seconds) and, optionally, shared between workers through Redis.
+ENABLE_QUERY_EMBEDDING_CACHE = (
+    os.environ.get("ENABLE_QUERY_EMBEDDING_CACHE", "True").lower() == "true"
+)
+
+QUERY_EMBEDDING_CACHE_SIZE = os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "1024")
+try:
+    QUERY_EMBEDDING_CACHE_SIZE = int(QUERY_EMBEDDING_CACHE_SIZE)
+except ValueError:
+    QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+QUERY_EMBEDDING_CACHE_TTL = os.environ.get("QUERY_EMBEDDING_CACHE_TTL", "3600")
+try:
+    QUERY_EMBEDDING_CACHE_TTL = int(QUERY_EMBEDDING_CACHE_TTL)
+except ValueError:
+    QUERY_EMBEDDING_CACHE_TTL = 3600
+
+ENABLE_QUERY_EMBEDDING_CACHE_REDIS = (
+    os.environ.get("ENABLE_QUERY_EMBEDDING_CACHE_REDIS", "False").lower() == "true"
+)
+
+# Document chunk embeddings are stored by (embedding model, chunk hash) and reused
+# when the same chunk is ingested again, in any collection. Opt-in.
+ENABLE_CHUNK_EMBEDDING_STORE = (
+    os.environ.get("ENABLE_CHUNK_EMBEDDING_STORE", "False").lower() == "true"
+)
+
+####################################
+# DOCUMENT EXTRACTION
+####################################
+
+# Documents extracted from a file are stored on disk by (file sha256, loader and
+# extraction settings), and reused when the same file is loaded again.
+ENABLE_DOCUMENT_EXTRACTION_CACHE = (
+    os.environ.get("ENABLE_DOCUMENT_EXTRACTION_CACHE", "True").lower() == "true"
+)
+
+DOCUMENT_EXTRACTION_CACHE_DIR = os.environ.get(
+    "DOCUMENT_EXTRACTION_CACHE_DIR", f"{DATA_DIR}/cache/extraction"
+)
+
+# Entries not read for this many days are removed, and the least recently read
+# entries are removed once the cache grows past this size (MiB). 0 disables either.
+DOCUMENT_EXTRACTION_CACHE_MAX_AGE_DAYS = os.environ.get(
+    "DOCUMENT_EXTRACTION_CACHE_MAX_AGE_DAYS", "30"
+)
+try:
+    DOCUMENT_EXTRACTION_CACHE_MAX_AGE_DAYS = max(
+        float(DOCUMENT_EXTRACTION_CACHE_MAX_AGE_DAYS), 0
+    )
+except ValueError:
+    DOCUMENT_EXTRACTION_CACHE_MAX_AGE_DAYS = 30
+
+DOCUMENT_EXTRACTION_CACHE_MAX_SIZE_MB = os.environ.get(
+    "DOCUMENT_EXTRACTION_CACHE_MAX_SIZE_MB", "1024"
+)
+try:
+    DOCUMENT_EXTRACTION_CACHE_MAX_SIZE_MB = max(
+        int(DOCUMENT_EXTRACTION_CACHE_MAX_SIZE_MB), 0
+    )
+except ValueError:
+    DOCUMENT_EXTRACTION_CACHE_MAX_SIZE_MB = 1024
+
+# PDFs read by the default engine are extracted by a pool of worker processes,
+# shards of pages at a time, and their pages are split and embedded as they are
+# extracted. 0 extracts PDFs in the worker handling the request.
+PDF_EXTRACTION_WORKERS = os.environ.get("PDF_EXTRACTION_WORKERS", "0")
+try:
+    PDF_EXTRACTION_WORKERS = max(int(PDF_EXTRACTION_WORKERS), 0)
+except ValueError:
+    PDF_EXTRACTION_WORKERS = 0
+
+PDF_EXTRACTION_PAGES_PER_SHARD = os.environ.get("PDF_EXTRACTION_PAGES_PER_SHARD", "32")
+try:
+    PDF_EXTRACTION_PAGES_PER_SHARD = max(int(PDF_EXTRACTION_PAGES_PER_SHARD), 1)
+except ValueError:
+    PDF_EXTRACTION_PAGES_PER_SHARD = 32
+
 ####################################
 # UVICORN WORKERS
 ####################################
@@ -481,6 +612,38 @@ else:
         MODELS_CACHE_TTL = 1
 
 
+####################################
+# USERS
+####################################
+
+# Seconds an authenticated user lookup is served from memory, 0 disables it
+USER_CACHE_TTL = os.environ.get("USER_CACHE_TTL", "10")
+
+try:
+    USER_CACHE_TTL = float(USER_CACHE_TTL)
+except ValueError:
+    USER_CACHE_TTL = 10.0
+
+# Users' last active timestamps are written in one batch per interval (seconds)
+USER_LAST_ACTIVE_FLUSH_INTERVAL = os.environ.get(
+    "USER_LAST_ACTIVE_FLUSH_INTERVAL", "30"
+)
+
+try:
+    USER_LAST_ACTIVE_FLUSH_INTERVAL = float(USER_LAST_ACTIVE_FLUSH_INTERVAL)
+except ValueError:
+    USER_LAST_ACTIVE_FLUSH_INTERVAL = 30.0
+
+# Seconds a user's groups and merged permissions are served from memory,
+# 0 disables it. Any group change drops them right away.
+GROUP_MEMBERSHIP_CACHE_TTL = os.environ.get("GROUP_MEMBERSHIP_CACHE_TTL", "10")
+
+try:
+    GROUP_MEMBERSHIP_CACHE_TTL = float(GROUP_MEMBERSHIP_CACHE_TTL)
+except ValueError:
+    GROUP_MEMBERSHIP_CACHE_TTL = 10.0
+
+
 ####################################
 # WEBSOCKET SUPPORT
 ####################################
@@ -505,6 +668,22 @@ WEBSOCKET_SENTINEL_HOSTS = os.environ.get("WEBSOCKET_SENTINEL_HOSTS", "")
 
 WEBSOCKET_SENTINEL_PORT = os.environ.get("WEBSOCKET_SENTINEL_PORT", "26379")
 
+# Collaborative documents are compacted into one snapshot once their update log
+# reaches this many updates or bytes
+ydoc_compaction_updates = os.environ.get("YDOC_COMPACTION_UPDATES", "200")
+
+try:
+    YDOC_COMPACTION_UPDATES = int(ydoc_compaction_updates)
+except ValueError:
+    YDOC_COMPACTION_UPDATES = 200
+
+ydoc_compaction_bytes = os.environ.get("YDOC_COMPACTION_BYTES", str(256 * 1024))
+
+try:
+    YDOC_COMPACTION_BYTES = int(ydoc_compaction_bytes)
+except ValueError:
+    YDOC_COMPACTION_BYTES = 256 * 1024
+
 AIOHTTP_CLIENT_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_TIMEOUT", "")
 
 if AIOHTTP_CLIENT_TIMEOUT == "":
@@ -553,6 +732,58 @@ AIOHTTP_CLIENT_SESSION_TOOL_SERVER_SSL = (
     os.environ.get("AIOHTTP_CLIENT_SESSION_TOOL_SERVER_SSL", "True").lower() == "true"
 )
 
+# OpenAI and Ollama requests share one keep-alive connection pool for the app
+# lifetime: at most AIOHTTP_CLIENT_POOL_LIMIT connections in total and
+# AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST concurrent connections to each upstream,
+# idle connections are kept for AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT seconds.
+# Both limits default to 0, no limit, as with the per-request sessions the pool
+# replaces: every streamed completion holds a connection until it ends, so a cap
+# makes concurrent chats queue behind each other.
+AIOHTTP_CLIENT_POOL_LIMIT = os.environ.get("AIOHTTP_CLIENT_POOL_LIMIT", "0")
+try:
+    AIOHTTP_CLIENT_POOL_LIMIT = int(AIOHTTP_CLIENT_POOL_LIMIT)
+except ValueError:
+    AIOHTTP_CLIENT_POOL_LIMIT = 0
+
+AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = os.environ.get(
+    "AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST", "0"
+)
+try:
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = int(AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST)
+except ValueError:
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = 0
+
+AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = os.environ.get(
+    "AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT", "30"
+)
+try:
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = float(AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT)
+except ValueError:
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = 30.0
+
+# Embedding requests to ollama/openai/azure_openai share a keep-alive pool of
+# RAG_EMBEDDING_POOL_SIZE connections, send up to RAG_EMBEDDING_CONCURRENT_REQUESTS
+# batches at once and retry rate limited (429) batches RAG_EMBEDDING_MAX_RETRIES times.
+RAG_EMBEDDING_CONCURRENT_REQUESTS = os.environ.get(
+    "RAG_EMBEDDING_CONCURRENT_REQUESTS", "4"
+)
+try:
+    RAG_EMBEDDING_CONCURRENT_REQUESTS = int(RAG_EMBEDDING_CONCURRENT_REQUESTS)
+except ValueError:
+    RAG_EMBEDDING_CONCURRENT_REQUESTS = 4
+
+RAG_EMBEDDING_POOL_SIZE = os.environ.get("RAG_EMBEDDING_POOL_SIZE", "16")
+try:
+    RAG_EMBEDDING_POOL_SIZE = int(RAG_EMBEDDING_POOL_SIZE)
+except ValueError:
+    RAG_EMBEDDING_POOL_SIZE = 16
+
+RAG_EMBEDDING_MAX_RETRIES = os.environ.get("RAG_EMBEDDING_MAX_RETRIES", "5")
+try:
+    RAG_EMBEDDING_MAX_RETRIES = int(RAG_EMBEDDING_MAX_RETRIES)
+except ValueError:
+    RAG_EMBEDDING_MAX_RETRIES = 5
+
 
 ####################################
 # SENTENCE TRANSFORMERS
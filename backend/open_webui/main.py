@@ -88,6 +88,7 @@ from open_webui.routers import (
 )
 from open_webui.env import CLASSROOM_MODE
 from open_webui.routers import classroom
+from open_webui.utils.classroom_ingestion import MATERIAL_INGESTION_QUEUE
 from open_webui.routers import admin_settings
 
 from open_webui.routers.retrieval import (
@@ -96,12 +97,17 @@ from open_webui.routers.retrieval import (
     get_ef,
     get_rf,
 )
+from open_webui.retrieval.embedding_cache import QUERY_EMBEDDING_CACHE
+from open_webui.retrieval.embedding_client import EMBEDDING_CLIENT
+from open_webui.retrieval.loaders.parallel_pdf import shutdown_pdf_executor
+from open_webui.utils.http_pool import UPSTREAM_POOL
 
 from open_webui.internal.db import Session, engine
 
 from open_webui.models.functions import Functions
 from open_webui.models.models import Models
-from open_webui.models.users import UserModel, Users
+from open_webui.models.users import USER_ACTIVITY, USER_CACHE, UserModel, Users
+from open_webui.models.groups import GROUP_MEMBERSHIP_CACHE
 from open_webui.models.chats import Chats
 
 from open_webui.config import (
@@ -430,6 +436,7 @@ from open_webui.env import (
 
 
 from open_webui.utils.models import (
+    MODEL_REGISTRY,
     get_all_models,
     get_all_base_models,
     check_model_access,
@@ -441,7 +448,6 @@ from open_webui.utils.chat import (
 )
 from open_webui.utils.embeddings import generate_embeddings
 from open_webui.utils.middleware import process_chat_payload, process_chat_response
-from open_webui.utils.access_control import has_access
 
 from open_webui.utils.auth import (
     get_license_data,
@@ -454,6 +460,7 @@ from open_webui.utils.plugin import install_tool_and_function_dependencies
 from open_webui.utils.oauth import OAuthManager
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
 from open_webui.utils.redis import get_redis_connection
+from open_webui.utils.write_behind import CHAT_MESSAGE_WRITE_BUFFER
 
 from open_webui.tasks import (
     redis_task_command_listener,
@@ -535,11 +542,44 @@ async def lifespan(app: FastAPI):
             redis_task_command_listener(app)
         )
 
+        # Share model registry invalidations with the other replicas
+        MODEL_REGISTRY.redis = app.state.redis
+        MODEL_REGISTRY.loop = asyncio.get_running_loop()
+        app.state.model_registry_listener = asyncio.create_task(MODEL_REGISTRY.listen())
+
+        # Share user cache invalidations with the other replicas
+        USER_CACHE.redis = app.state.redis
+        USER_CACHE.loop = asyncio.get_running_loop()
+        app.state.user_cache_listener = asyncio.create_task(USER_CACHE.listen())
+
+        # Share group membership invalidations with the other replicas
+        GROUP_MEMBERSHIP_CACHE.redis = app.state.redis
+        GROUP_MEMBERSHIP_CACHE.loop = asyncio.get_running_loop()
+        app.state.group_cache_listener = asyncio.create_task(
+            GROUP_MEMBERSHIP_CACHE.listen()
+        )
+
+        # Replay streamed messages that were buffered but not flushed by a replica
+        # that is gone, at startup and then periodically
+        CHAT_MESSAGE_WRITE_BUFFER.redis = app.state.redis
+        try:
+            await CHAT_MESSAGE_WRITE_BUFFER.recover()
+        except Exception as e:
+            log.warning(f"Failed to recover buffered chat messages: {e}")
+        app.state.chat_message_recovery = asyncio.create_task(
+            CHAT_MESSAGE_WRITE_BUFFER.run()
+        )
+
     if THREAD_POOL_SIZE and THREAD_POOL_SIZE > 0:
         limiter = anyio.to_thread.current_default_thread_limiter()
         limiter.total_tokens = THREAD_POOL_SIZE
 
     asyncio.create_task(periodic_usage_pool_cleanup())
+    app.state.user_activity_writer = asyncio.create_task(USER_ACTIVITY.run())
+
+    app.state.material_ingestion_recovery = asyncio.create_task(
+        MATERIAL_INGESTION_QUEUE.run(app.state.redis)
+    )
 
     if app.state.config.ENABLE_BASE_MODELS_CACHE:
         await get_all_models(
@@ -567,6 +607,27 @@ async def lifespan(app: FastAPI):
     if hasattr(app.state, "redis_task_command_listener"):
         app.state.redis_task_command_listener.cancel()
 
+    if hasattr(app.state, "model_registry_listener"):
+        app.state.model_registry_listener.cancel()
+
+    if hasattr(app.state, "user_cache_listener"):
+        app.state.user_cache_listener.cancel()
+
+    if hasattr(app.state, "group_cache_listener"):
+        app.state.group_cache_listener.cancel()
+
+    if hasattr(app.state, "chat_message_recovery"):
+        app.state.chat_message_recovery.cancel()
+
+    app.state.material_ingestion_recovery.cancel()
+
+    app.state.user_activity_writer.cancel()
+    USER_ACTIVITY.flush()
+
+    EMBEDDING_CLIENT.close()
+    await UPSTREAM_POOL.close()
+    shutdown_pdf_executor()
+
 
 app = FastAPI(
     title="Open WebUI",
@@ -936,6 +997,7 @@ app.state.EMBEDDING_FUNCTION = get_embedding_function(
         if app.state.config.RAG_EMBEDDING_ENGINE == "azure_openai"
         else None
     ),
+    cache=QUERY_EMBEDDING_CACHE,
 )
 
 app.state.RERANKING_FUNCTION = get_reranking_function(
@@ -1242,29 +1304,6 @@ if audit_level != AuditLevel.NONE:
 async def get_models(
     request: Request, refresh: bool = False, user=Depends(get_verified_user)
 ):
-    def get_filtered_models(models, user):
-        filtered_models = []
-        for model in models:
-            if model.get("arena"):
-                if has_access(
-                    user.id,
-                    type="read",
-                    access_control=model.get("info", {})
-                    .get("meta", {})
-                    .get("access_control", {}),
-                ):
-                    filtered_models.append(model)
-                continue
-
-            model_info = Models.get_model_by_id(model["id"])
-            if model_info:
-                if user.id == model_info.user_id or has_access(
-                    user.id, type="read", access_control=model_info.access_control
-                ):
-                    filtered_models.append(model)
-
-        return filtered_models
-
     all_models = await get_all_models(request, refresh=refresh, user=user)
 
     models = []
@@ -1299,7 +1338,7 @@ async def get_models(
 
     # Filter out models that the user does not have access to
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
-        models = get_filtered_models(models, user)
+        models = MODEL_REGISTRY.filter_models(models, user)
 
     log.debug(
         f"/api/models returned filtered models accessible to the user: {json.dumps([model['id'] for model in models])}"
@@ -1415,7 +1454,7 @@ async def chat_completion(
         log.debug(f"Error processing chat payload: {e}")
         if metadata.get("chat_id") and metadata.get("message_id"):
             # Update the chat message with the error
-            Chats.upsert_message_to_chat_by_id_and_message_id(
+            Chats.upsert_message_by_id_and_message_id(
                 metadata["chat_id"],
                 metadata["message_id"],
                 {
@@ -1438,7 +1477,7 @@ async def chat_completion(
         log.debug(f"Error in chat completion: {e}")
         if metadata.get("chat_id") and metadata.get("message_id"):
             # Update the chat message with the error
-            Chats.upsert_message_to_chat_by_id_and_message_id(
+            Chats.upsert_message_by_id_and_message_id(
                 metadata["chat_id"],
                 metadata["message_id"],
                 {
@@ -1726,7 +1765,10 @@ async def get_current_usage(user=Depends(get_verified_user)):
     This is an experimental endpoint and subject to change.
     """
     try:
-        return {"model_ids": get_models_in_use(), "user_ids": get_active_user_ids()}
+        return {
+            "model_ids": await get_models_in_use(),
+            "user_ids": await get_active_user_ids(),
+        }
     except Exception as e:
         log.error(f"Error getting usage statistics: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
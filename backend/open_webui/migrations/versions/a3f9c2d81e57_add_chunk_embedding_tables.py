@@ -0,0 +1,68 @@
+"""Add chunk_embedding tables
+
+Revision ID: a3f9c2d81e57
+Revises: d7e1c2a9b4f0
+Create Date: 2025-09-08 00:00:00.000000
+
+Stores document chunk embeddings by (embedding model, chunk hash) so that
+chunks ingested into several collections are embedded once, with one
+reference row per vector DB item. Only used when ENABLE_CHUNK_EMBEDDING_STORE
+is enabled.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from open_webui.migrations.util import get_existing_tables
+
+revision = "a3f9c2d81e57"
+down_revision = "d7e1c2a9b4f0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing_tables = set(get_existing_tables())
+
+    if "chunk_embedding" not in existing_tables:
+        op.create_table(
+            "chunk_embedding",
+            sa.Column("model", sa.Text(), nullable=False),
+            sa.Column("hash", sa.Text(), nullable=False),
+            sa.Column("vector", sa.LargeBinary(), nullable=True),
+            sa.Column("created_at", sa.BigInteger(), nullable=True),
+            sa.PrimaryKeyConstraint("model", "hash"),
+        )
+
+    if "chunk_embedding_ref" not in existing_tables:
+        op.create_table(
+            "chunk_embedding_ref",
+            sa.Column("collection_name", sa.Text(), nullable=False),
+            sa.Column("item_id", sa.Text(), nullable=False),
+            sa.Column("model", sa.Text(), nullable=True),
+            sa.Column("hash", sa.Text(), nullable=True),
+            sa.Column("file_id", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.BigInteger(), nullable=True),
+            sa.PrimaryKeyConstraint("collection_name", "item_id"),
+        )
+        op.create_index(
+            "chunk_embedding_ref_model_hash_idx",
+            "chunk_embedding_ref",
+            ["model", "hash"],
+        )
+        op.create_index(
+            "chunk_embedding_ref_collection_file_idx",
+            "chunk_embedding_ref",
+            ["collection_name", "file_id"],
+        )
+
+
+def downgrade():
+    op.drop_index(
+        "chunk_embedding_ref_collection_file_idx", table_name="chunk_embedding_ref"
+    )
+    op.drop_index(
+        "chunk_embedding_ref_model_hash_idx", table_name="chunk_embedding_ref"
+    )
+    op.drop_table("chunk_embedding_ref")
+    op.drop_table("chunk_embedding")
@@ -0,0 +1,83 @@
+"""Add indexed code, term and visibility columns to courses
+
+Revision ID: b8e4f2a61c93
+Revises: a3f9c2d81e57
+Create Date: 2025-09-10 00:00:00.000000
+
+Courses were listed by loading every row and reading visibility from
+meta_json. The fields courses are listed by are copied into their own
+columns, backfilled from meta_json, and indexed.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from open_webui.migrations.util import get_existing_tables
+
+revision = "b8e4f2a61c93"
+down_revision = "a3f9c2d81e57"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["code", "term", "visibility"]
+
+INDEXES = {
+    "courses_visibility_created_at_idx": ["visibility", "created_at"],
+    "courses_created_by_created_at_idx": ["created_by", "created_at"],
+    "courses_term_created_at_idx": ["term", "created_at"],
+    "courses_code_idx": ["code"],
+}
+
+
+def upgrade():
+    if "courses" not in set(get_existing_tables()):
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    existing_columns = {c["name"] for c in inspector.get_columns("courses")}
+    for column in COLUMNS:
+        if column not in existing_columns:
+            op.add_column("courses", sa.Column(column, sa.String(), nullable=True))
+
+    courses = sa.table(
+        "courses",
+        sa.column("id", sa.String()),
+        sa.column("meta_json", sa.JSON()),
+        *[sa.column(column, sa.String()) for column in COLUMNS],
+    )
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(courses.c.id, courses.c.meta_json)).fetchall()
+    for course_id, meta in rows:
+        if not isinstance(meta, dict):
+            continue
+        # As models.classroom.get_course_listing_columns, "" included
+        values = {
+            column: str(meta[column])
+            for column in COLUMNS
+            if meta.get(column) is not None
+        }
+        if values:
+            conn.execute(
+                courses.update().where(courses.c.id == course_id).values(**values)
+            )
+
+    existing_indexes = {i["name"] for i in inspector.get_indexes("courses")}
+    for name, columns in INDEXES.items():
+        if name not in existing_indexes:
+            op.create_index(name, "courses", columns)
+
+
+def downgrade():
+    if "courses" not in set(get_existing_tables()):
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    existing_indexes = {i["name"] for i in inspector.get_indexes("courses")}
+    for name in INDEXES:
+        if name in existing_indexes:
+            op.drop_index(name, table_name="courses")
+
+    existing_columns = {c["name"] for c in inspector.get_columns("courses")}
+    for column in COLUMNS:
+        if column in existing_columns:
+            op.drop_column("courses", column)
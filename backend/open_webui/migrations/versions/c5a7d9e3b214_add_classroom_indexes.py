@@ -0,0 +1,68 @@
+"""Add indexes to classroom tables
+
+Revision ID: c5a7d9e3b214
+Revises: b8e4f2a61c93
+Create Date: 2025-09-10 00:00:00.000000
+
+Course presets, materials, assignments and submissions were only looked up
+by their course or assignment ids, none of which were indexed.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from open_webui.migrations.util import get_existing_tables
+
+revision = "c5a7d9e3b214"
+down_revision = "b8e4f2a61c93"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "course_presets": {
+        "course_presets_course_id_idx": ["course_id"],
+    },
+    "materials": {
+        "materials_course_id_created_at_idx": ["course_id", "created_at"],
+    },
+    "assignments": {
+        "assignments_course_id_created_at_idx": ["course_id", "created_at"],
+    },
+    "submissions": {
+        "submissions_assignment_id_user_id_idx": [
+            "assignment_id",
+            "user_id",
+            "submitted_at",
+        ],
+        "submissions_assignment_id_submitted_at_idx": [
+            "assignment_id",
+            "submitted_at",
+        ],
+    },
+}
+
+
+def upgrade():
+    existing_tables = set(get_existing_tables())
+    inspector = sa.inspect(op.get_bind())
+
+    for table, indexes in INDEXES.items():
+        if table not in existing_tables:
+            continue
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table)}
+        for name, columns in indexes.items():
+            if name not in existing_indexes:
+                op.create_index(name, table, columns)
+
+
+def downgrade():
+    existing_tables = set(get_existing_tables())
+    inspector = sa.inspect(op.get_bind())
+
+    for table, indexes in INDEXES.items():
+        if table not in existing_tables:
+            continue
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table)}
+        for name in indexes:
+            if name in existing_indexes:
+                op.drop_index(name, table_name=table)
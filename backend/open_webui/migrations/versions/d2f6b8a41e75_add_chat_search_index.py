@@ -0,0 +1,188 @@
+"""Add chat search index
+
+Revision ID: d2f6b8a41e75
+Revises: c5a7d9e3b214
+Create Date: 2025-09-12 00:00:00.000000
+
+Chat search scanned the JSON document of every chat of the user with LIKE. The
+chat titles and message contents are copied into `chat_search`, one row per
+title or message, which is indexed by an FTS5 table kept in sync by triggers on
+SQLite and by a GIN index over a weighted tsvector on PostgreSQL. Existing chats
+are indexed by the migration.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from open_webui.migrations.util import get_existing_tables
+
+revision = "d2f6b8a41e75"
+down_revision = "c5a7d9e3b214"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 500
+
+# Must match POSTGRES_SEARCH_VECTOR in open_webui.models.chats
+POSTGRES_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'B')"
+)
+
+SQLITE_FTS = [
+    """
+    CREATE VIRTUAL TABLE chat_search_fts USING fts5(
+        title, content, content='chat_search', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER chat_search_ai AFTER INSERT ON chat_search BEGIN
+        INSERT INTO chat_search_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_ad AFTER DELETE ON chat_search BEGIN
+        INSERT INTO chat_search_fts(chat_search_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_au AFTER UPDATE ON chat_search BEGIN
+        INSERT INTO chat_search_fts(chat_search_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO chat_search_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+
+def backfill(conn):
+    chat = sa.table(
+        "chat",
+        sa.column("id", sa.String()),
+        sa.column("user_id", sa.String()),
+        sa.column("title", sa.Text()),
+        sa.column("chat", sa.JSON()),
+    )
+    chat_message = sa.table(
+        "chat_message",
+        sa.column("chat_id", sa.Text()),
+        sa.column("message_id", sa.Text()),
+        sa.column("data", sa.JSON()),
+        sa.column("updated_at", sa.BigInteger()),
+    )
+    chat_search = sa.table(
+        "chat_search",
+        sa.column("chat_id", sa.Text()),
+        sa.column("message_id", sa.Text()),
+        sa.column("user_id", sa.Text()),
+        sa.column("title", sa.Text()),
+        sa.column("content", sa.Text()),
+    )
+
+    chat_ids = [
+        row[0]
+        for row in conn.execute(
+            sa.select(chat.c.id).where(~chat.c.user_id.like("shared-%"))
+        )
+    ]
+    for idx in range(0, len(chat_ids), BACKFILL_BATCH_SIZE):
+        batch = chat_ids[idx : idx + BACKFILL_BATCH_SIZE]
+
+        # Messages written to their own rows with ENABLE_CHAT_MESSAGE_STORE
+        message_rows = {}
+        for chat_id, message_id, data in conn.execute(
+            sa.select(
+                chat_message.c.chat_id, chat_message.c.message_id, chat_message.c.data
+            )
+            .where(chat_message.c.chat_id.in_(batch))
+            .order_by(chat_message.c.updated_at.asc())
+        ):
+            message_rows.setdefault(chat_id, {}).setdefault(message_id, {}).update(
+                data or {}
+            )
+
+        entries = []
+        for chat_id, user_id, title, document in conn.execute(
+            sa.select(chat.c.id, chat.c.user_id, chat.c.title, chat.c.chat).where(
+                chat.c.id.in_(batch)
+            )
+        ):
+            entries.append(
+                {
+                    "chat_id": chat_id,
+                    "message_id": "",
+                    "user_id": user_id,
+                    "title": title,
+                    "content": None,
+                }
+            )
+
+            messages = dict(
+                ((document or {}).get("history", {}) or {}).get("messages", {}) or {}
+            )
+            for message_id, data in message_rows.get(chat_id, {}).items():
+                messages[message_id] = {**messages.get(message_id, {}), **data}
+
+            for message_id, message in messages.items():
+                content = message.get("content") if isinstance(message, dict) else None
+                if isinstance(content, str) and content:
+                    entries.append(
+                        {
+                            "chat_id": chat_id,
+                            "message_id": message_id,
+                            "user_id": user_id,
+                            "title": None,
+                            "content": content.replace("\x00", ""),
+                        }
+                    )
+
+        if entries:
+            conn.execute(chat_search.insert(), entries)
+
+
+def upgrade():
+    existing_tables = set(get_existing_tables())
+    if "chat_search" in existing_tables:
+        return
+
+    op.create_table(
+        "chat_search",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("chat_id", sa.Text(), nullable=False),
+        sa.Column("message_id", sa.Text(), nullable=False),
+        sa.Column("user_id", sa.Text(), nullable=True),
+        sa.Column("title", sa.Text(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+    )
+    op.create_index(
+        "chat_search_chat_id_message_id_idx",
+        "chat_search",
+        ["chat_id", "message_id"],
+        unique=True,
+    )
+    op.create_index("chat_search_user_id_idx", "chat_search", ["user_id"])
+
+    conn = op.get_bind()
+    dialect_name = conn.dialect.name
+    if dialect_name == "sqlite":
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+    elif dialect_name == "postgresql":
+        op.execute(
+            "CREATE INDEX chat_search_vector_idx ON chat_search "
+            f"USING GIN (({POSTGRES_SEARCH_VECTOR}))"
+        )
+
+    if "chat" in existing_tables:
+        backfill(conn)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        for trigger in ["chat_search_ai", "chat_search_ad", "chat_search_au"]:
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS chat_search_fts")
+    op.drop_table("chat_search")
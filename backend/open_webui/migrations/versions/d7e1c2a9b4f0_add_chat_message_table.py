@@ -0,0 +1,39 @@
+"""Add chat_message table
+
+Revision ID: d7e1c2a9b4f0
+Revises: 20250815_ensure_course_enrollments
+Create Date: 2025-09-01 00:00:00.000000
+
+Stores chat messages as one row per (chat_id, message_id) so that message
+upserts no longer rewrite the whole `chat.chat` JSON document. Only used when
+ENABLE_CHAT_MESSAGE_STORE is enabled.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from open_webui.migrations.util import get_existing_tables
+
+revision = "d7e1c2a9b4f0"
+down_revision = "20250815_ensure_course_enrollments"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "chat_message" in get_existing_tables():
+        return
+
+    op.create_table(
+        "chat_message",
+        sa.Column("chat_id", sa.Text(), nullable=False),
+        sa.Column("message_id", sa.Text(), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("chat_id", "message_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("chat_message")
@@ -1,18 +1,30 @@
 import logging
 import json
+import re
 import time
 import uuid
+from contextlib import contextmanager
 from typing import Optional
 
 from open_webui.internal.db import Base, get_db
 from open_webui.models.tags import TagModel, Tag, Tags
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import ENABLE_CHAT_MESSAGE_STORE, SRC_LOG_LEVELS
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Float,
+    Index,
+    Integer,
+    String,
+    Text,
+    JSON,
+)
 from sqlalchemy import or_, func, select, and_, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.sql import exists
-from sqlalchemy.sql.expression import bindparam
 
 ####################
 # Chat DB Schema
@@ -41,6 +53,68 @@ class Chat(Base):
     folder_id = Column(Text, nullable=True)
 
 
+class ChatMessage(Base):
+    __tablename__ = "chat_message"
+
+    chat_id = Column(Text, primary_key=True)
+    message_id = Column(Text, primary_key=True)
+
+    # Partial message fields merged over `chat.chat["history"]["messages"]`
+    data = Column(JSON, nullable=True)
+
+    created_at = Column(BigInteger)  # time_ns
+    updated_at = Column(BigInteger)  # time_ns
+
+
+class ChatSearchEntry(Base):
+    """
+    Text of a chat title or message, indexed for search by the `chat_search_fts`
+    FTS5 table on SQLite and by a GIN index over POSTGRES_SEARCH_VECTOR on PostgreSQL.
+    """
+
+    __tablename__ = "chat_search"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(Text, nullable=False)
+    # TITLE_ENTRY_ID for the entry of the chat title
+    message_id = Column(Text, nullable=False)
+    user_id = Column(Text)
+
+    title = Column(Text, nullable=True)
+    content = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "chat_search_chat_id_message_id_idx", "chat_id", "message_id", unique=True
+        ),
+        Index("chat_search_user_id_idx", "user_id"),
+    )
+
+
+TITLE_ENTRY_ID = ""
+
+# Must match the expression of the chat_search_vector_idx index
+POSTGRES_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'B')"
+)
+
+SEARCH_TERM_PATTERN = re.compile(r"\w+")
+
+
+def get_chat_search_entries(
+    title: str, chat: dict
+) -> dict[str, tuple[Optional[str], Optional[str]]]:
+    """Search entries of a chat document as {message_id: (title, content)}."""
+    entries = {TITLE_ENTRY_ID: (title, None)}
+    messages = chat.get("history", {}).get("messages", {}) or {}
+    for message_id, message in messages.items():
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str) and content:
+            entries[message_id] = (None, content)
+    return entries
+
+
 class ChatModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -107,7 +181,113 @@ class ChatTitleIdResponse(BaseModel):
     created_at: int
 
 
+def merge_chat_message_rows(chat: dict, rows: list[ChatMessage]) -> dict:
+    """
+    Reassemble `history.messages` from a chat document and its `chat_message` rows.
+    Rows must be ordered by `updated_at`; the most recently written one becomes
+    `currentId`, unless no row was written as the current message (`updated_at` 0).
+    """
+    history = chat.get("history", {})
+    messages = dict(history.get("messages", {}))
+    current_id = history.get("currentId")
+
+    for row in rows:
+        messages[row.message_id] = {
+            **messages.get(row.message_id, {}),
+            **(row.data or {}),
+        }
+        if row.updated_at:
+            current_id = row.message_id
+
+    return {
+        **chat,
+        "history": {
+            **history,
+            "messages": messages,
+            "currentId": current_id,
+        },
+    }
+
+
 class ChatTable:
+    def _to_chat_models(self, db, chats: list[Chat]) -> list[ChatModel]:
+        chat_models = [ChatModel.model_validate(chat) for chat in chats]
+        if not ENABLE_CHAT_MESSAGE_STORE or not chat_models:
+            return chat_models
+
+        rows = (
+            db.query(ChatMessage)
+            .filter(ChatMessage.chat_id.in_([chat.id for chat in chat_models]))
+            .order_by(ChatMessage.updated_at.asc())
+            .all()
+        )
+
+        rows_by_chat_id = {}
+        for row in rows:
+            rows_by_chat_id.setdefault(row.chat_id, []).append(row)
+
+        for chat in chat_models:
+            if chat.id in rows_by_chat_id:
+                chat.chat = merge_chat_message_rows(chat.chat, rows_by_chat_id[chat.id])
+
+        return chat_models
+
+    def _index_chat(self, db, chat: Chat):
+        """Bring the search entries of a chat in line with its document."""
+        with self._indexing(db, chat.id):
+            entries = get_chat_search_entries(chat.title, chat.chat or {})
+            rows = db.query(ChatSearchEntry).filter_by(chat_id=chat.id).all()
+
+            for row in rows:
+                entry = entries.pop(row.message_id, None)
+                if entry is None:
+                    db.delete(row)
+                elif (row.title, row.content) != entry:
+                    row.title, row.content = entry
+
+            for message_id, (title, content) in entries.items():
+                db.add(
+                    ChatSearchEntry(
+                        chat_id=chat.id,
+                        message_id=message_id,
+                        user_id=chat.user_id,
+                        title=title,
+                        content=content,
+                    )
+                )
+
+    def _index_message(self, db, id: str, message_id: str, content: str):
+        with self._indexing(db, id):
+            row = (
+                db.query(ChatSearchEntry)
+                .filter_by(chat_id=id, message_id=message_id)
+                .first()
+            )
+            if row:
+                row.content = content
+            else:
+                db.add(
+                    ChatSearchEntry(
+                        chat_id=id,
+                        message_id=message_id,
+                        user_id=db.query(Chat.user_id).filter_by(id=id).scalar(),
+                        content=content,
+                    )
+                )
+
+    @contextmanager
+    def _indexing(self, db, id: str):
+        # Concurrent writers of a chat can race to insert the same search entry.
+        # Index writes go in a savepoint so that losing the race only skips them,
+        # the winner indexed the chat, instead of failing the chat write
+        db.flush()
+        savepoint = db.begin_nested()
+        try:
+            with savepoint:
+                yield
+        except SQLAlchemyError as e:
+            log.warning(f"Skipped updating the search entries of chat {id}: {e}")
+
     def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
         with get_db() as db:
             id = str(uuid.uuid4())
@@ -129,6 +309,7 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            self._index_chat(db, result)
             db.commit()
             db.refresh(result)
             return ChatModel.model_validate(result) if result else None
@@ -166,6 +347,7 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            self._index_chat(db, result)
             db.commit()
             db.refresh(result)
             return ChatModel.model_validate(result) if result else None
@@ -177,6 +359,12 @@ class ChatTable:
                 chat_item.chat = chat
                 chat_item.title = chat["title"] if "title" in chat else "New Chat"
                 chat_item.updated_at = int(time.time())
+
+                if ENABLE_CHAT_MESSAGE_STORE:
+                    # The full document is authoritative, fold the message rows into it
+                    db.query(ChatMessage).filter_by(chat_id=id).delete()
+
+                self._index_chat(db, chat_item)
                 db.commit()
                 db.refresh(chat_item)
 
@@ -237,9 +425,73 @@ class ChatTable:
 
         return chat.chat.get("history", {}).get("messages", {}).get(message_id, {})
 
+    def upsert_message_by_id_and_message_id(
+        self, id: str, message_id: str, message: dict, current: bool = True
+    ) -> bool:
+        """
+        Upsert a single message without returning the updated chat.
+
+        With ENABLE_CHAT_MESSAGE_STORE the message is merged into its own `chat_message`
+        row and the chat document is left untouched, so the cost of a write does not
+        grow with the length of the chat history. Writes with `current=False`, such as
+        status updates, do not make the message the chat's `currentId`.
+        """
+        if not ENABLE_CHAT_MESSAGE_STORE:
+            return (
+                self.upsert_message_to_chat_by_id_and_message_id(
+                    id, message_id, message
+                )
+                is not None
+            )
+
+        # Sanitize message content for null characters before upserting
+        if isinstance(message.get("content"), str):
+            message["content"] = message["content"].replace("\x00", "")
+
+        try:
+            with get_db() as db:
+                updated = (
+                    db.query(Chat)
+                    .filter_by(id=id)
+                    .update({"updated_at": int(time.time())})
+                )
+                if not updated:
+                    return False
+
+                now = time.time_ns()
+                row = db.get(ChatMessage, (id, message_id))
+                if row:
+                    row.data = {**(row.data or {}), **message}
+                    if current:
+                        row.updated_at = now
+                else:
+                    db.add(
+                        ChatMessage(
+                            chat_id=id,
+                            message_id=message_id,
+                            data=message,
+                            created_at=now,
+                            updated_at=now if current else 0,
+                        )
+                    )
+
+                if isinstance(message.get("content"), str):
+                    self._index_message(db, id, message_id, message["content"])
+
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(f"Error upserting message {message_id} of chat {id}: {e}")
+            return False
+
     def upsert_message_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, message: dict
     ) -> Optional[ChatModel]:
+        if ENABLE_CHAT_MESSAGE_STORE:
+            if not self.upsert_message_by_id_and_message_id(id, message_id, message):
+                return None
+            return self.get_chat_by_id(id)
+
         chat = self.get_chat_by_id(id)
         if chat is None:
             return None
@@ -271,6 +523,16 @@ class ChatTable:
         if chat is None:
             return None
 
+        if ENABLE_CHAT_MESSAGE_STORE:
+            message = chat.chat.get("history", {}).get("messages", {}).get(message_id)
+            if message is not None:
+                status_history = [*message.get("statusHistory", []), status]
+                message["statusHistory"] = status_history
+                self.upsert_message_by_id_and_message_id(
+                    id, message_id, {"statusHistory": status_history}, current=False
+                )
+            return chat
+
         chat = chat.chat
         history = chat.get("history", {})
 
@@ -295,7 +557,7 @@ class ChatTable:
                     "id": str(uuid.uuid4()),
                     "user_id": f"shared-{chat_id}",
                     "title": chat.title,
-                    "chat": chat.chat,
+                    "chat": self._to_chat_models(db, [chat])[0].chat,
                     "created_at": chat.created_at,
                     "updated_at": int(time.time()),
                 }
@@ -326,7 +588,7 @@ class ChatTable:
                     return self.insert_shared_chat_by_chat_id(chat_id)
 
                 shared_chat.title = chat.title
-                shared_chat.chat = chat.chat
+                shared_chat.chat = self._to_chat_models(db, [chat])[0].chat
 
                 shared_chat.updated_at = int(time.time())
                 db.commit()
@@ -355,7 +617,7 @@ class ChatTable:
                 chat.share_id = share_id
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -367,7 +629,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -379,7 +641,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -427,7 +689,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_list_by_user_id(
         self,
@@ -466,7 +728,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_title_id_list_by_user_id(
         self,
@@ -517,13 +779,13 @@ class ChatTable:
                 .order_by(Chat.updated_at.desc())
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
                 chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -545,7 +807,7 @@ class ChatTable:
         try:
             with get_db() as db:
                 chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -556,7 +818,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats.all())
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -565,7 +827,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats.all())
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -574,7 +836,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, pinned=True, archived=False)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats.all())
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -583,7 +845,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats.all())
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -594,7 +856,9 @@ class ChatTable:
         limit: int = 60,
     ) -> list[ChatModel]:
         """
-        Filters chats based on a search query using Python, allowing pagination using skip and limit.
+        Search the chats of a user by title and message content through the chat
+        search index. Every word must match the start of a word in the chat;
+        results are ranked by relevance, then by recency.
         """
         search_text = search_text.replace("\u0000", "").lower().strip()
 
@@ -616,7 +880,7 @@ class ChatTable:
             word for word in search_text_words if not word.startswith("tag:")
         ]
 
-        search_text = " ".join(search_text_words)
+        search_terms = SEARCH_TERM_PATTERN.findall(" ".join(search_text_words))
 
         with get_db() as db:
             query = db.query(Chat).filter(Chat.user_id == user_id)
@@ -624,24 +888,25 @@ class ChatTable:
             if not include_archived:
                 query = query.filter(Chat.archived == False)
 
-            query = query.order_by(Chat.updated_at.desc())
-
             # Check if the database dialect is either 'sqlite' or 'postgresql'
             dialect_name = db.bind.dialect.name
             if dialect_name == "sqlite":
-                # SQLite case: using JSON1 extension for JSON searching
-                sqlite_content_sql = (
-                    "EXISTS ("
-                    "    SELECT 1 "
-                    "    FROM json_each(Chat.chat, '$.messages') AS message "
-                    "    WHERE LOWER(message.value->>'content') LIKE '%' || :content_key || '%'"
-                    ")"
-                )
-                sqlite_content_clause = text(sqlite_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")), sqlite_content_clause
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
+                # SQLite case: FTS5 prefix query, lower bm25 is a better match.
+                # CROSS JOIN makes the full-text match drive the join rather than
+                # the user_id index, and LIMIT -1 keeps the inner query from being
+                # flattened into the aggregate, where bm25() cannot be used
+                search_query = " ".join(f'"{term}"*' for term in search_terms)
+                matches_sql = (
+                    "SELECT chat_id, MIN(rank) AS rank FROM ("
+                    "    SELECT chat_search.chat_id AS chat_id,"
+                    "        bm25(chat_search_fts, 2.0, 1.0) AS rank"
+                    "    FROM chat_search_fts"
+                    "    CROSS JOIN chat_search"
+                    "        ON chat_search.id = chat_search_fts.rowid"
+                    "    WHERE chat_search_fts MATCH :search_query"
+                    "    AND chat_search.user_id = :user_id"
+                    "    LIMIT -1"
+                    ") GROUP BY chat_id"
                 )
 
                 # Check if there are any tags to filter, it should have all the tags
@@ -675,20 +940,18 @@ class ChatTable:
                     )
 
             elif dialect_name == "postgresql":
-                # PostgreSQL relies on proper JSON query for search
-                postgres_content_sql = (
-                    "EXISTS ("
-                    "    SELECT 1 "
-                    "    FROM json_array_elements(Chat.chat->'messages') AS message "
-                    "    WHERE LOWER(message->>'content') LIKE '%' || :content_key || '%'"
-                    ")"
-                )
-                postgres_content_clause = text(postgres_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")),
-                        postgres_content_clause,
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
+                # PostgreSQL relies on the GIN index over the search vector, ranks
+                # are negated so that lower is a better match as on SQLite
+                search_query = " & ".join(f"{term}:*" for term in search_terms)
+                matches_sql = (
+                    "SELECT chat_id,"
+                    f"    -MAX(ts_rank({POSTGRES_SEARCH_VECTOR},"
+                    "        to_tsquery('simple', :search_query))) AS rank"
+                    " FROM chat_search"
+                    f" WHERE {POSTGRES_SEARCH_VECTOR}"
+                    "    @@ to_tsquery('simple', :search_query)"
+                    " AND chat_search.user_id = :user_id"
+                    " GROUP BY chat_id"
                 )
 
                 # Check if there are any tags to filter, it should have all the tags
@@ -725,13 +988,26 @@ class ChatTable:
                     f"Unsupported dialect: {db.bind.dialect.name}"
                 )
 
+            if search_terms:
+                matches = (
+                    text(matches_sql)
+                    .bindparams(search_query=search_query, user_id=user_id)
+                    .columns(chat_id=Text, rank=Float)
+                    .subquery("matches")
+                )
+                query = query.join(matches, matches.c.chat_id == Chat.id).order_by(
+                    matches.c.rank.asc(), Chat.updated_at.desc()
+                )
+            else:
+                query = query.order_by(Chat.updated_at.desc())
+
             # Perform pagination at the SQL level
             all_chats = query.offset(skip).limit(limit).all()
 
             log.info(f"The number of chats: {len(all_chats)}")
 
             # Validate and return chats
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_folder_id_and_user_id(
         self, folder_id: str, user_id: str
@@ -744,7 +1020,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
@@ -759,7 +1035,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def update_chat_folder_id_by_id_and_user_id(
         self, id: str, user_id: str, folder_id: str
@@ -772,7 +1048,7 @@ class ChatTable:
                 chat.pinned = False
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -811,7 +1087,7 @@ class ChatTable:
 
             all_chats = query.all()
             log.debug(f"all_chats: {all_chats}")
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def add_chat_tag_by_id_and_user_id_and_tag_name(
         self, id: str, user_id: str, tag_name: str
@@ -832,7 +1108,7 @@ class ChatTable:
 
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -908,6 +1184,8 @@ class ChatTable:
     def delete_chat_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
+                db.query(ChatMessage).filter_by(chat_id=id).delete()
+                db.query(ChatSearchEntry).filter_by(chat_id=id).delete()
                 db.query(Chat).filter_by(id=id).delete()
                 db.commit()
 
@@ -918,7 +1196,9 @@ class ChatTable:
     def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
         try:
             with get_db() as db:
-                db.query(Chat).filter_by(id=id, user_id=user_id).delete()
+                if db.query(Chat).filter_by(id=id, user_id=user_id).delete():
+                    db.query(ChatMessage).filter_by(chat_id=id).delete()
+                    db.query(ChatSearchEntry).filter_by(chat_id=id).delete()
                 db.commit()
 
                 return True and self.delete_shared_chat_by_chat_id(id)
@@ -930,6 +1210,12 @@ class ChatTable:
             with get_db() as db:
                 self.delete_shared_chats_by_user_id(user_id)
 
+                db.query(ChatMessage).filter(
+                    ChatMessage.chat_id.in_(
+                        select(Chat.id).where(Chat.user_id == user_id)
+                    )
+                ).delete(synchronize_session=False)
+                db.query(ChatSearchEntry).filter_by(user_id=user_id).delete()
                 db.query(Chat).filter_by(user_id=user_id).delete()
                 db.commit()
 
@@ -942,6 +1228,20 @@ class ChatTable:
     ) -> bool:
         try:
             with get_db() as db:
+                db.query(ChatMessage).filter(
+                    ChatMessage.chat_id.in_(
+                        select(Chat.id).where(
+                            Chat.user_id == user_id, Chat.folder_id == folder_id
+                        )
+                    )
+                ).delete(synchronize_session=False)
+                db.query(ChatSearchEntry).filter(
+                    ChatSearchEntry.chat_id.in_(
+                        select(Chat.id).where(
+                            Chat.user_id == user_id, Chat.folder_id == folder_id
+                        )
+                    )
+                ).delete(synchronize_session=False)
                 db.query(Chat).filter_by(user_id=user_id, folder_id=folder_id).delete()
                 db.commit()
 
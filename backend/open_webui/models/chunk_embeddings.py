@@ -0,0 +1,175 @@
+import logging
+import time
+from array import array
+from typing import Optional
+
+from open_webui.internal.db import Base, get_db
+from open_webui.env import SRC_LOG_LEVELS
+
+from sqlalchemy import BigInteger, Column, Index, LargeBinary, Text, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import exists
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+# Keep IN (...) clauses below the SQLite bound parameter limit
+QUERY_BATCH_SIZE = 500
+
+####################
+# Chunk Embedding DB Schema
+####################
+
+
+class ChunkEmbedding(Base):
+    __tablename__ = "chunk_embedding"
+
+    model = Column(Text, primary_key=True)
+    hash = Column(Text, primary_key=True)
+
+    # float32 vector
+    vector = Column(LargeBinary)
+
+    created_at = Column(BigInteger)
+
+
+class ChunkEmbeddingRef(Base):
+    __tablename__ = "chunk_embedding_ref"
+
+    collection_name = Column(Text, primary_key=True)
+    item_id = Column(Text, primary_key=True)
+
+    model = Column(Text)
+    hash = Column(Text)
+    file_id = Column(Text, nullable=True)
+
+    created_at = Column(BigInteger)
+
+    __table_args__ = (
+        Index("chunk_embedding_ref_model_hash_idx", "model", "hash"),
+        Index("chunk_embedding_ref_collection_file_idx", "collection_name", "file_id"),
+    )
+
+
+class ChunkEmbeddingsTable:
+    """
+    Embeddings of document chunks by (embedding model, chunk hash), shared by all
+    collections. Every vector DB item embedded from an entry holds a reference
+    row; entries without references are evicted.
+    """
+
+    def get_vectors(self, model: str, hashes: list[str]) -> dict[str, list[float]]:
+        vectors = {}
+        hashes = list(dict.fromkeys(hashes))
+        with get_db() as db:
+            for idx in range(0, len(hashes), QUERY_BATCH_SIZE):
+                rows = (
+                    db.query(ChunkEmbedding.hash, ChunkEmbedding.vector)
+                    .filter(
+                        ChunkEmbedding.model == model,
+                        ChunkEmbedding.hash.in_(hashes[idx : idx + QUERY_BATCH_SIZE]),
+                    )
+                    .all()
+                )
+                for hash, vector in rows:
+                    values = array("f")
+                    values.frombytes(vector)
+                    vectors[hash] = values.tolist()
+        return vectors
+
+    def insert_vectors(self, model: str, vectors: dict[str, list[float]]):
+        if not vectors:
+            return
+
+        now = int(time.time())
+        rows = [
+            ChunkEmbedding(
+                model=model,
+                hash=hash,
+                vector=array("f", vector).tobytes(),
+                created_at=now,
+            )
+            for hash, vector in vectors.items()
+        ]
+        with get_db() as db:
+            try:
+                db.add_all(rows)
+                db.commit()
+            except IntegrityError:
+                # Another ingestion stored some of the same chunks meanwhile
+                db.rollback()
+                for row in rows:
+                    db.merge(row)
+                db.commit()
+
+    def add_refs(self, collection_name: str, refs: list[dict]):
+        """Reference entries from vector DB items, refs are {item_id, model, hash, file_id}."""
+        if not refs:
+            return
+
+        now = int(time.time())
+        with get_db() as db:
+            for ref in refs:
+                db.merge(
+                    ChunkEmbeddingRef(
+                        collection_name=collection_name,
+                        item_id=ref["item_id"],
+                        model=ref["model"],
+                        hash=ref["hash"],
+                        file_id=ref.get("file_id"),
+                        created_at=now,
+                    )
+                )
+            db.commit()
+
+    def release_refs(
+        self,
+        collection_name: Optional[str] = None,
+        item_ids: Optional[list[str]] = None,
+        file_id: Optional[str] = None,
+    ) -> int:
+        """
+        Drop the references of a collection, optionally only those of some items
+        or of a file. Without a collection every reference is dropped.
+        """
+        with get_db() as db:
+            query = db.query(ChunkEmbeddingRef)
+            if collection_name is not None:
+                query = query.filter(
+                    ChunkEmbeddingRef.collection_name == collection_name
+                )
+            if file_id is not None:
+                query = query.filter(ChunkEmbeddingRef.file_id == file_id)
+
+            if item_ids is None:
+                count = query.delete(synchronize_session=False)
+            else:
+                count = 0
+                for idx in range(0, len(item_ids), QUERY_BATCH_SIZE):
+                    count += query.filter(
+                        ChunkEmbeddingRef.item_id.in_(
+                            item_ids[idx : idx + QUERY_BATCH_SIZE]
+                        )
+                    ).delete(synchronize_session=False)
+            db.commit()
+            return count
+
+    def evict_unreferenced(self) -> int:
+        with get_db() as db:
+            count = (
+                db.query(ChunkEmbedding)
+                .filter(
+                    ~exists().where(
+                        and_(
+                            ChunkEmbeddingRef.model == ChunkEmbedding.model,
+                            ChunkEmbeddingRef.hash == ChunkEmbedding.hash,
+                        )
+                    )
+                )
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return count
+
+
+ChunkEmbeddings = ChunkEmbeddingsTable()
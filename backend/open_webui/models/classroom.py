@@ -3,7 +3,19 @@ import uuid
 from typing import Any, List, Optional
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, Float, Integer, JSON, String, Text
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Float,
+    Index,
+    Integer,
+    JSON,
+    String,
+    Text,
+    and_,
+    or_,
+)
 
 from open_webui.internal.db import Base, get_db
 
@@ -26,6 +38,17 @@ class Course(Base):
     # Additional metadata for compatibility without breaking schema
     # Stores: code, term, schedule, instructors (list), links (list), videos (list), visibility
     meta_json = Column(JSON, nullable=True)
+    # Copies of meta_json fields that courses are listed by
+    code = Column(String, nullable=True)
+    term = Column(String, nullable=True)
+    visibility = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("courses_visibility_created_at_idx", "visibility", "created_at"),
+        Index("courses_created_by_created_at_idx", "created_by", "created_at"),
+        Index("courses_term_created_at_idx", "term", "created_at"),
+        Index("courses_code_idx", "code"),
+    )
 
 
 # class CourseEnrollment(Base):
@@ -57,6 +80,8 @@ class CoursePreset(Base):
     created_at = Column(BigInteger, nullable=False)
     updated_at = Column(BigInteger, nullable=True)
 
+    __table_args__ = (Index("course_presets_course_id_idx", "course_id"),)
+
 
 class Material(Base):
     __tablename__ = "materials"
@@ -69,6 +94,10 @@ class Material(Base):
     meta_json = Column(JSON, nullable=True)
     created_at = Column(BigInteger, nullable=False)
 
+    __table_args__ = (
+        Index("materials_course_id_created_at_idx", "course_id", "created_at"),
+    )
+
 
 class Assignment(Base):
     __tablename__ = "assignments"
@@ -81,6 +110,10 @@ class Assignment(Base):
     attachments_json = Column(JSON, nullable=True)
     created_at = Column(BigInteger, nullable=False)
 
+    __table_args__ = (
+        Index("assignments_course_id_created_at_idx", "course_id", "created_at"),
+    )
+
 
 class Submission(Base):
     __tablename__ = "submissions"
@@ -94,6 +127,20 @@ class Submission(Base):
     status = Column(String, nullable=False, default="submitted")
     grade_json = Column(JSON, nullable=True)
 
+    __table_args__ = (
+        Index(
+            "submissions_assignment_id_user_id_idx",
+            "assignment_id",
+            "user_id",
+            "submitted_at",
+        ),
+        Index(
+            "submissions_assignment_id_submitted_at_idx",
+            "assignment_id",
+            "submitted_at",
+        ),
+    )
+
 
 ####################
 # Pydantic mirrors (minimal)
@@ -156,6 +203,23 @@ class MaterialsTable:
             db.refresh(mat)
             return MaterialModel.model_validate(mat)
 
+    def update_ingestion(
+        self, material_id: str, patch: dict
+    ) -> Optional[MaterialModel]:
+        """Merge `patch` into the `ingestion` block of the material meta."""
+        with get_db() as db:
+            mat = db.get(Material, material_id)
+            if not mat:
+                return None
+            current = mat.meta_json or {}
+            mat.meta_json = {
+                **current,
+                "ingestion": {**(current.get("ingestion") or {}), **patch},
+            }
+            db.commit()
+            db.refresh(mat)
+            return MaterialModel.model_validate(mat)
+
     def get_by_id(self, material_id: str) -> Optional[MaterialModel]:
         with get_db() as db:
             mat = db.get(Material, material_id)
@@ -166,6 +230,17 @@ class MaterialsTable:
             rows = db.query(Material).filter_by(course_id=course_id).all()
             return [MaterialModel.model_validate(r) for r in rows]
 
+    def list_by_ingestion_status(self, statuses: List[str]) -> List[MaterialModel]:
+        with get_db() as db:
+            rows = (
+                db.query(Material)
+                .filter(
+                    Material.meta_json["ingestion"]["status"].as_string().in_(statuses)
+                )
+                .all()
+            )
+            return [MaterialModel.model_validate(r) for r in rows]
+
 
 Materials = MaterialsTable()
 
@@ -288,6 +363,19 @@ class CourseModel(BaseModel):
     created_by: str
     created_at: int
     updated_at: Optional[int] = None
+    meta_json: Optional[dict] = None
+    code: Optional[str] = None
+    term: Optional[str] = None
+    visibility: Optional[str] = None
+
+
+def get_course_listing_columns(meta_json: dict) -> dict:
+    # Any value set, even "", counts: a course with a visibility is listed unless
+    # it is "private"
+    return {
+        column: None if meta_json.get(column) is None else str(meta_json[column])
+        for column in ("code", "term", "visibility")
+    }
 
 
 class CoursesTable:
@@ -310,6 +398,7 @@ class CoursesTable:
                 created_at=now,
                 updated_at=now,
                 meta_json=meta_json or {},
+                **get_course_listing_columns(meta_json or {}),
             )
             db.add(row)
             db.commit()
@@ -321,32 +410,54 @@ class CoursesTable:
             row = db.get(Course, course_id)
             return CourseModel.model_validate(row) if row else None
 
-    # Also add debug to the list_for_user method:
-    def list_for_user(self, user_id: str, include_admin: bool = False) -> List[CourseModel]:
-        """List courses visible to the user; admins can see all when include_admin=True."""
-        print(f"[list_for_user] user_id: {user_id}, include_admin: {include_admin}")
-        
+    def list_for_user(
+        self,
+        user_id: str,
+        include_admin: bool = False,
+        term: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> List[CourseModel]:
+        """
+        List courses visible to the user, newest first; admins can see all when
+        include_admin=True. Others see the courses they created and those whose
+        visibility is set and not "private".
+
+        Pages are keyed by (created_at, id): pass the id of the last course of a
+        page as `cursor` to get the next one.
+        """
         with get_db() as db:
-            if include_admin:
-                print("[list_for_user] Getting ALL courses (admin mode)")
-                rows = db.query(Course).order_by(Course.created_at.desc()).all()
-                print(f"[list_for_user] Found {len(rows)} total courses")
-                return [CourseModel.model_validate(r) for r in rows]
-            
-            # Enrollment table removed. Fall back to visibility rules:
-            # - Include courses the user created
-            # - Include courses whose meta_json.visibility is not "private"
-            rows = db.query(Course).order_by(Course.created_at.desc()).all()
-            visible: List[CourseModel] = []
-            for r in rows:
-                try:
-                    vis = (r.meta_json or {}).get("visibility")
-                except Exception:
-                    vis = None
-                if r.created_by == user_id or (vis is not None and vis != "private"):
-                    visible.append(CourseModel.model_validate(r))
-            print(f"[list_for_user] Found {len(visible)} visible courses")
-            return visible
+            query = db.query(Course)
+            if not include_admin:
+                query = query.filter(
+                    or_(
+                        Course.created_by == user_id,
+                        # visibility set and not "private", as two ranges of the
+                        # visibility index
+                        Course.visibility < "private",
+                        Course.visibility > "private",
+                    )
+                )
+            if term is not None:
+                query = query.filter(Course.term == term)
+            if cursor is not None:
+                last = db.get(Course, cursor)
+                if last is None:
+                    return []
+                query = query.filter(
+                    or_(
+                        Course.created_at < last.created_at,
+                        and_(
+                            Course.created_at == last.created_at,
+                            Course.id < last.id,
+                        ),
+                    )
+                )
+
+            query = query.order_by(Course.created_at.desc(), Course.id.desc())
+            if limit is not None:
+                query = query.limit(limit)
+            return [CourseModel.model_validate(r) for r in query.all()]
 
     def update_status(self, course_id: str, status: str) -> Optional[CourseModel]:
         with get_db() as db:
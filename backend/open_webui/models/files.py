@@ -172,6 +172,15 @@ class FilesTable:
                 .all()
             ]
 
+    def has_file_by_sha256(self, sha256: str) -> bool:
+        with get_db() as db:
+            return (
+                db.query(File.id)
+                .filter(File.meta["sha256"].as_string() == sha256)
+                .first()
+                is not None
+            )
+
     def get_files_by_user_id(self, user_id: str) -> list[FileModel]:
         with get_db() as db:
             return [
@@ -1,17 +1,24 @@
+import asyncio
 import json
 import logging
+import threading
 import time
-from typing import Optional
+from itertools import chain
+from typing import Any, Optional
 import uuid
 
-from open_webui.internal.db import Base, get_db
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.internal.db import Base, SessionLocal, get_db
+from open_webui.env import (
+    GROUP_MEMBERSHIP_CACHE_TTL,
+    REDIS_KEY_PREFIX,
+    SRC_LOG_LEVELS,
+)
 
 from open_webui.models.files import FileMetadataResponse
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON, func
+from sqlalchemy import BigInteger, Column, String, Text, JSON, event, func
 
 
 log = logging.getLogger(__name__)
@@ -91,6 +98,104 @@ class GroupUpdateForm(GroupForm, UserIdsForm):
     pass
 
 
+class GroupMembershipCache:
+    """
+    Groups of each user, and values derived from them such as merged
+    permissions, kept for `ttl` seconds. Every commit that writes a `Group` row
+    bumps `version`, here and, through REDIS_CHANNEL, on the other replicas,
+    which drops every entry at once.
+    """
+
+    REDIS_CHANNEL = f"{REDIS_KEY_PREFIX}:groups:invalidate"
+
+    def __init__(self, ttl: float = GROUP_MEMBERSHIP_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        # (user_id, key) -> (version, expires_at, value)
+        self._entries: dict[tuple[str, str], tuple[int, float, Any]] = {}
+        self._lock = threading.Lock()
+
+        self.redis = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._id = str(uuid.uuid4())
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, user_id: str, key: str = "groups") -> Optional[Any]:
+        entry = self._entries.get((user_id, key))
+        if entry is None or entry[0] != self.version or entry[1] < time.monotonic():
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry[2]
+
+    def set(self, user_id: str, value: Any, version: int, key: str = "groups"):
+        """Cache a value computed from the groups read at `version`."""
+        if self.ttl <= 0 or version != self.version:
+            return
+        self._entries[(user_id, key)] = (version, time.monotonic() + self.ttl, value)
+
+    def invalidate(self, publish: bool = True):
+        with self._lock:
+            self.version += 1
+            self._entries = {}
+        if publish:
+            self._publish()
+
+    def _publish(self):
+        if self.redis is None or self.loop is None:
+            return
+        # Called from request handlers as well as from worker threads
+        asyncio.run_coroutine_threadsafe(
+            self.redis.publish(self.REDIS_CHANNEL, json.dumps({"sender": self._id})),
+            self.loop,
+        )
+
+    async def listen(self):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.REDIS_CHANNEL)
+
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                if json.loads(message["data"]).get("sender") == self._id:
+                    continue
+                self.invalidate(publish=False)
+            except Exception as e:
+                log.exception(f"Error handling group cache invalidation: {e}")
+
+
+GROUP_MEMBERSHIP_CACHE = GroupMembershipCache()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_group_flush(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Group):
+            session.info["groups_changed"] = True
+            return
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _track_group_statement(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and (
+        orm_execute_state.bind_mapper is not None
+        and orm_execute_state.bind_mapper.class_ is Group
+    ):
+        orm_execute_state.session.info["groups_changed"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_group_membership_cache(session):
+    if session.info.pop("groups_changed", False):
+        GROUP_MEMBERSHIP_CACHE.invalidate()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _reset_group_changes(session):
+    session.info.pop("groups_changed", None)
+
+
 class GroupTable:
     def insert_new_group(
         self, user_id: str, form_data: GroupForm
@@ -141,6 +246,15 @@ class GroupTable:
                 .all()
             ]
 
+    def get_cached_groups_by_member_id(self, user_id: str) -> list[GroupModel]:
+        """Groups of a user for access checks, up to GROUP_MEMBERSHIP_CACHE_TTL seconds old."""
+        groups = GROUP_MEMBERSHIP_CACHE.get(user_id)
+        if groups is None:
+            version = GROUP_MEMBERSHIP_CACHE.version
+            groups = self.get_groups_by_member_id(user_id)
+            GROUP_MEMBERSHIP_CACHE.set(user_id, groups, version)
+        return groups
+
     def get_group_by_id(self, id: str) -> Optional[GroupModel]:
         try:
             with get_db() as db:
@@ -1,7 +1,18 @@
+import asyncio
+import json
+import logging
+import threading
 import time
+import uuid
 from typing import Optional
 
 from open_webui.internal.db import Base, JSONField, get_db
+from open_webui.env import (
+    REDIS_KEY_PREFIX,
+    SRC_LOG_LEVELS,
+    USER_CACHE_TTL,
+    USER_LAST_ACTIVE_FLUSH_INTERVAL,
+)
 
 
 from open_webui.models.chats import Chats
@@ -10,7 +21,10 @@ from open_webui.models.groups import Groups
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text
-from sqlalchemy import or_
+from sqlalchemy import bindparam, or_, update
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
 
 ####################
@@ -114,6 +128,165 @@ class UserUpdateForm(BaseModel):
     password: Optional[str] = None
 
 
+class UserCache:
+    """
+    Users looked up to authenticate requests, by id and by API key, kept for
+    `ttl` seconds. Every write to a user through UsersTable drops its entries,
+    here and, through REDIS_CHANNEL, on the other replicas.
+    """
+
+    REDIS_CHANNEL = f"{REDIS_KEY_PREFIX}:users:invalidate"
+
+    def __init__(self, ttl: float = USER_CACHE_TTL):
+        self.ttl = ttl
+        self._users: dict[str, tuple[float, UserModel]] = {}
+        self._api_keys: dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a lookup that raced one isn't cached
+        self.generation = 0
+
+        self.redis = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._id = str(uuid.uuid4())
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, id: str) -> Optional[UserModel]:
+        entry = self._users.get(id)
+        if entry is None or entry[0] < time.monotonic():
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry[1].model_copy()
+
+    def get_by_api_key(self, api_key: str) -> Optional[UserModel]:
+        entry = self._users.get(self._api_keys.get(api_key, ""))
+        # The key may have been replaced since it was cached
+        if entry is None or entry[0] < time.monotonic() or entry[1].api_key != api_key:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry[1].model_copy()
+
+    def set(self, user: UserModel, generation: int):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._users[user.id] = (time.monotonic() + self.ttl, user.model_copy())
+            if user.api_key:
+                self._api_keys[user.api_key] = user.id
+
+    def touch(self, id: str, last_active_at: int):
+        entry = self._users.get(id)
+        if entry is not None:
+            entry[1].last_active_at = last_active_at
+
+    def invalidate(self, id: str, publish: bool = True):
+        with self._lock:
+            self.generation += 1
+            entry = self._users.pop(id, None)
+            if entry is not None and entry[1].api_key:
+                self._api_keys.pop(entry[1].api_key, None)
+        if publish:
+            self._publish(id)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._api_keys.clear()
+
+    def _publish(self, id: str):
+        if self.redis is None or self.loop is None:
+            return
+        # Called from request handlers as well as from worker threads
+        asyncio.run_coroutine_threadsafe(
+            self.redis.publish(
+                self.REDIS_CHANNEL, json.dumps({"id": id, "sender": self._id})
+            ),
+            self.loop,
+        )
+
+    async def listen(self):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.REDIS_CHANNEL)
+
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                data = json.loads(message["data"])
+                if data.get("sender") == self._id:
+                    continue
+                self.invalidate(data["id"], publish=False)
+            except Exception as e:
+                log.exception(f"Error handling user cache invalidation: {e}")
+
+
+class UserActivityBuffer:
+    """
+    Last active timestamps of users, written to the database in one batched
+    UPDATE every `interval` seconds instead of one per request.
+    """
+
+    def __init__(self, interval: float = USER_LAST_ACTIVE_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"updates": 0, "flushes": 0, "rows_written": 0}
+
+    def touch(self, id: str):
+        last_active_at = int(time.time())
+        with self._lock:
+            self._pending[id] = last_active_at
+        self.stats["updates"] += 1
+        USER_CACHE.touch(id, last_active_at)
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        # A Core executemany, unlike an ORM bulk UPDATE by primary key, does not
+        # raise when some of the users were deleted in the meantime
+        table = User.__table__
+        try:
+            with get_db() as db:
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("_id"))
+                    .values(last_active_at=bindparam("_ts")),
+                    [
+                        {"_id": id, "_ts": last_active_at}
+                        for id, last_active_at in pending.items()
+                    ],
+                )
+                db.commit()
+        except Exception:
+            # Keep the timestamps for the next flush, unless newer ones arrived
+            with self._lock:
+                for id, last_active_at in pending.items():
+                    if self._pending.get(id, 0) < last_active_at:
+                        self._pending[id] = last_active_at
+            raise
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += len(pending)
+        return len(pending)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                log.warning(f"Failed to write user last active timestamps: {e}")
+
+
+USER_CACHE = UserCache()
+USER_ACTIVITY = UserActivityBuffer()
+
+
 class UsersTable:
     def insert_new_user(
         self,
@@ -163,6 +336,25 @@ class UsersTable:
         except Exception:
             return None
 
+    def get_cached_user_by_id(self, id: str) -> Optional[UserModel]:
+        """Get a user for authentication, possibly up to USER_CACHE_TTL seconds old."""
+        user = USER_CACHE.get(id)
+        if user is None:
+            generation = USER_CACHE.generation
+            user = self.get_user_by_id(id)
+            if user is not None:
+                USER_CACHE.set(user, generation)
+        return user
+
+    def get_cached_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
+        user = USER_CACHE.get_by_api_key(api_key)
+        if user is None:
+            generation = USER_CACHE.generation
+            user = self.get_user_by_api_key(api_key)
+            if user is not None:
+                USER_CACHE.set(user, generation)
+        return user
+
     def get_user_by_email(self, email: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
@@ -287,6 +479,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"role": role})
                 db.commit()
+                USER_CACHE.invalidate(id)
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
@@ -301,6 +494,7 @@ class UsersTable:
                     {"profile_image_url": profile_image_url}
                 )
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -320,6 +514,10 @@ class UsersTable:
         except Exception:
             return None
 
+    def mark_user_active_by_id(self, id: str):
+        """Record activity of a user, written with the next batch of USER_ACTIVITY."""
+        USER_ACTIVITY.touch(id)
+
     def update_user_oauth_sub_by_id(
         self, id: str, oauth_sub: str
     ) -> Optional[UserModel]:
@@ -327,6 +525,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"oauth_sub": oauth_sub})
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -338,6 +537,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update(updated)
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -357,6 +557,7 @@ class UsersTable:
 
                 db.query(User).filter_by(id=id).update({"settings": user_settings})
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -375,6 +576,7 @@ class UsersTable:
                     # Delete User
                     db.query(User).filter_by(id=id).delete()
                     db.commit()
+                USER_CACHE.invalidate(id)
 
                 return True
             else:
@@ -387,6 +589,7 @@ class UsersTable:
             with get_db() as db:
                 result = db.query(User).filter_by(id=id).update({"api_key": api_key})
                 db.commit()
+                USER_CACHE.invalidate(id)
                 return True if result == 1 else False
         except Exception:
             return False
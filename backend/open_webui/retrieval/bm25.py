@@ -0,0 +1,611 @@
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import numpy as np
+
+from open_webui.config import CACHE_DIR
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.retrieval.vector.main import (
+    GetResult,
+    SearchResult,
+    VectorDBBase,
+    VectorItem,
+)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+BM25_INDEX_DIR = CACHE_DIR / "bm25"
+
+# Same parameters and tokenizer as langchain's BM25Retriever (rank_bm25.BM25Okapi)
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+# Rewrite a collection into a single segment once it has this many segments or
+# once this fraction of its documents has been deleted
+MAX_SEGMENTS = 8
+MAX_DELETED_RATIO = 0.25
+
+
+def tokenize(text: str) -> list[str]:
+    return text.split()
+
+
+def document_hash(id: str, text: str) -> int:
+    return int.from_bytes(
+        hashlib.sha256(f"{id}\0{text}".encode("utf-8")).digest()[:16], "big"
+    )
+
+
+def match_filter(metadata: Optional[dict], filter: dict) -> bool:
+    metadata = metadata or {}
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+
+def normalize_items(items: list[Union[dict, VectorItem]]) -> list[dict]:
+    return [
+        {
+            "id": str(item["id"]),
+            "text": item["text"],
+            "metadata": item.get("metadata"),
+        }
+        for item in (
+            item.model_dump() if isinstance(item, VectorItem) else item
+            for item in items
+        )
+    ]
+
+
+class BM25Segment:
+    """
+    Immutable, memory-mapped slice of a collection's BM25 index.
+
+    Documents are stored as JSON lines and addressed through `offsets.npy`, term
+    postings are stored as two parallel arrays (document number, term frequency)
+    sliced by the `[start, end)` ranges in `terms.json`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.doc_len = np.load(path / "doc_len.npy", mmap_mode="r")
+        self.postings_doc = np.load(path / "postings_doc.npy", mmap_mode="r")
+        self.postings_tf = np.load(path / "postings_tf.npy", mmap_mode="r")
+        with open(path / "terms.json", "r", encoding="utf-8") as f:
+            self.terms: dict[str, list[int]] = json.load(f)
+        with open(path / "ids.json", "r", encoding="utf-8") as f:
+            self.ids: list[str] = json.load(f)
+        with open(path / "documents.jsonl", "rb") as f:
+            self._documents = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.ids else b""
+            )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def close(self):
+        if isinstance(self._documents, mmap.mmap):
+            self._documents.close()
+
+    def document(self, idx: int) -> dict:
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return json.loads(self._documents[start:end])
+
+    def documents(self):
+        for idx in range(len(self.ids)):
+            yield self.document(idx)
+
+    @staticmethod
+    def write(path: Path, items: list[dict]):
+        path.mkdir(parents=True, exist_ok=True)
+
+        offsets = [0]
+        doc_len = []
+        postings: dict[str, list[tuple[int, int]]] = {}
+        with open(path / "documents.jsonl", "wb") as f:
+            for idx, item in enumerate(items):
+                line = (
+                    json.dumps(
+                        {
+                            "id": item["id"],
+                            "text": item["text"],
+                            "metadata": item.get("metadata"),
+                        },
+                        ensure_ascii=False,
+                    ).encode("utf-8")
+                    + b"\n"
+                )
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+
+                tokens = tokenize(item["text"])
+                doc_len.append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    postings.setdefault(term, []).append((idx, tf))
+
+        terms = {}
+        postings_doc = []
+        postings_tf = []
+        for term, entries in postings.items():
+            terms[term] = [len(postings_doc), len(postings_doc) + len(entries)]
+            for idx, tf in entries:
+                postings_doc.append(idx)
+                postings_tf.append(tf)
+
+        np.save(path / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+        np.save(path / "doc_len.npy", np.asarray(doc_len, dtype=np.int32))
+        np.save(path / "postings_doc.npy", np.asarray(postings_doc, dtype=np.int32))
+        np.save(path / "postings_tf.npy", np.asarray(postings_tf, dtype=np.int32))
+        with open(path / "terms.json", "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(path / "ids.json", "w", encoding="utf-8") as f:
+            json.dump([item["id"] for item in items], f)
+
+
+class LoadedBM25Index:
+    """In-memory view of one version of a collection's index, ready to score."""
+
+    def __init__(self, path: Path, manifest: dict):
+        self.manifest = manifest
+        self.segments = [BM25Segment(path / name) for name in manifest["segments"]]
+
+        self.live = []
+        for name, segment in zip(manifest["segments"], self.segments):
+            deleted = set(manifest["deleted"].get(name, []))
+            self.live.append(
+                np.asarray([id not in deleted for id in segment.ids], dtype=bool)
+            )
+        self.size = sum(int(live.sum()) for live in self.live)
+        total_len = sum(
+            int(segment.doc_len[live].sum())
+            for segment, live in zip(self.segments, self.live)
+        )
+        self.avgdl = total_len / self.size if self.size else 0.0
+
+        # Document frequencies over live documents, merged across segments
+        df: Counter = Counter()
+        for segment, live in zip(self.segments, self.live):
+            live_postings = live[segment.postings_doc]
+            for term, (start, end) in segment.terms.items():
+                count = int(live_postings[start:end].sum())
+                if count:
+                    df[term] += count
+
+        # BM25Okapi idf, with negative values floored at EPSILON * average idf
+        self.idf = {}
+        idf_sum = 0.0
+        negative = []
+        for term, freq in df.items():
+            idf = math.log(self.size - freq + 0.5) - math.log(freq + 0.5)
+            self.idf[term] = idf
+            idf_sum += idf
+            if idf < 0:
+                negative.append(term)
+        eps = EPSILON * idf_sum / len(self.idf) if self.idf else 0.0
+        for term in negative:
+            self.idf[term] = eps
+
+    def search(self, query: str, k: int) -> list[dict]:
+        if self.size == 0:
+            return []
+
+        scored = []
+        tokens = tokenize(query)
+        for segment, live in zip(self.segments, self.live):
+            scores = np.zeros(len(segment), dtype=np.float64)
+            norm = K1 * (1 - B + B * np.asarray(segment.doc_len) / self.avgdl)
+            for term in tokens:
+                span = segment.terms.get(term)
+                if span is None or term not in self.idf:
+                    continue
+                docs = np.asarray(segment.postings_doc[span[0] : span[1]])
+                tf = np.asarray(segment.postings_tf[span[0] : span[1]])
+                scores[docs] += self.idf[term] * tf * (K1 + 1) / (tf + norm[docs])
+
+            live_idx = np.flatnonzero(live)
+            if len(live_idx) > k:
+                top = np.argpartition(-scores[live_idx], k - 1)[:k]
+                live_idx = live_idx[top]
+            scored.extend((float(scores[idx]), segment, int(idx)) for idx in live_idx)
+
+        scored.sort(key=lambda x: x[0], reverse=True)
+        results = []
+        for score, segment, idx in scored[:k]:
+            document = segment.document(idx)
+            document["score"] = score
+            results.append(document)
+        return results
+
+
+class BM25Index:
+    """
+    Persistent BM25 indexes, one per vector collection, stored under
+    `CACHE_DIR/bm25/<collection>`.
+
+    Every write adds an immutable segment (or masks deleted ids) and atomically
+    replaces `manifest.json`. The manifest carries the collection version, an
+    order-independent hash of the (id, text) pairs it contains, which is used to
+    reload the memory-mapped segments when another worker changed the collection.
+    """
+
+    def __init__(self, path: Path = BM25_INDEX_DIR):
+        self.path = Path(path)
+        self._loaded: dict[str, LoadedBM25Index] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _collection_path(self, collection_name: str) -> Path:
+        return self.path / collection_name
+
+    @contextmanager
+    def _lock(self, collection_name: str):
+        with self._locks_lock:
+            lock = self._locks.setdefault(collection_name, threading.Lock())
+
+        with lock:
+            if fcntl is None:
+                yield
+                return
+
+            path = self._collection_path(collection_name)
+            path.mkdir(parents=True, exist_ok=True)
+            with open(path / ".lock", "w") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_manifest(self, collection_name: str) -> Optional[dict]:
+        try:
+            with open(
+                self._collection_path(collection_name) / "manifest.json",
+                "r",
+                encoding="utf-8",
+            ) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, collection_name: str, manifest: dict):
+        path = self._collection_path(collection_name)
+        tmp = path / f"manifest.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path / "manifest.json")
+
+        # Segments that are no longer referenced can be removed, readers holding
+        # them open keep working on POSIX until they reload
+        for child in path.iterdir():
+            if (
+                child.is_dir()
+                and child.name.startswith("seg-")
+                and child.name not in manifest["segments"]
+            ):
+                shutil.rmtree(child, ignore_errors=True)
+
+    def _load(self, collection_name: str) -> Optional[LoadedBM25Index]:
+        manifest = self._read_manifest(collection_name)
+        loaded = self._loaded.get(collection_name)
+        if manifest is None:
+            if loaded is not None:
+                self._loaded.pop(collection_name, None)
+            return None
+
+        if loaded is None or loaded.manifest != manifest:
+            loaded = LoadedBM25Index(self._collection_path(collection_name), manifest)
+            self._loaded[collection_name] = loaded
+        return loaded
+
+    def has_index(self, collection_name: str) -> bool:
+        return self._read_manifest(collection_name) is not None
+
+    def is_current(self, collection_name: str, result: GetResult) -> bool:
+        """
+        Whether the index of a collection holds exactly the documents of `result`,
+        as read from the vector DB, by comparing their version hashes.
+        """
+        manifest = self._read_manifest(collection_name)
+        if manifest is None:
+            return False
+
+        version = 0
+        for id, text in zip(result.ids[0], result.documents[0]):
+            version ^= document_hash(str(id), text)
+        return manifest["version"] == f"{version:032x}"
+
+    def build(self, collection_name: str, items: list[Union[dict, VectorItem]]):
+        """Replace the index of a collection with the given items."""
+        items = normalize_items(items)
+        with self._lock(collection_name):
+            self._write(collection_name, None, items, [])
+            self._set_stale(collection_name, False)
+
+    def build_from_result(self, collection_name: str, result: GetResult):
+        self.build(
+            collection_name,
+            [
+                {"id": id, "text": text, "metadata": metadata}
+                for id, text, metadata in zip(
+                    result.ids[0], result.documents[0], result.metadatas[0]
+                )
+            ],
+        )
+
+    def add(
+        self,
+        collection_name: str,
+        items: list[Union[dict, VectorItem]],
+        create: bool = False,
+    ):
+        """
+        Add or replace documents in the index of a collection. Without an index
+        one is only created for a new collection (`create`), otherwise the
+        collection is marked stale so that no partial index is created for it by
+        a concurrent writer and it is built from the vector DB on next search.
+        """
+        items = normalize_items(items)
+        with self._lock(collection_name):
+            manifest = self._read_manifest(collection_name)
+            if manifest is None:
+                if create and not self._is_stale(collection_name):
+                    self._write(collection_name, None, items, [])
+                else:
+                    self._set_stale(collection_name, True)
+                return
+            self._write(
+                collection_name, manifest, items, [item["id"] for item in items]
+            )
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        with self._lock(collection_name):
+            manifest = self._read_manifest(collection_name)
+            if manifest is None:
+                return
+            if ids is None and filter is None:
+                self._remove(collection_name)
+                self._set_stale(collection_name, True)
+                return
+            self._write(collection_name, manifest, [], ids or [], filter)
+
+    def delete_collection(self, collection_name: str):
+        with self._lock(collection_name):
+            self._remove(collection_name)
+            self._set_stale(collection_name, False)
+
+    def invalidate(self, collection_name: str):
+        """Drop the index of a collection until it is rebuilt from the vector DB."""
+        with self._lock(collection_name):
+            self._remove(collection_name)
+            self._set_stale(collection_name, True)
+
+    def _is_stale(self, collection_name: str) -> bool:
+        return (self._collection_path(collection_name) / ".stale").exists()
+
+    def _set_stale(self, collection_name: str, stale: bool):
+        path = self._collection_path(collection_name) / ".stale"
+        if stale:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def reset(self):
+        # Loaded indexes are only dropped, searches still using them keep working
+        self._loaded = {}
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _remove(self, collection_name: str):
+        self._loaded.pop(collection_name, None)
+
+        path = self._collection_path(collection_name)
+        try:
+            os.remove(path / "manifest.json")
+        except FileNotFoundError:
+            pass
+        for child in path.iterdir() if path.exists() else []:
+            if child.is_dir():
+                shutil.rmtree(child, ignore_errors=True)
+
+    def _write(
+        self,
+        collection_name: str,
+        manifest: Optional[dict],
+        items: list[dict],
+        delete_ids: list[str],
+        delete_filter: Optional[dict] = None,
+    ):
+        path = self._collection_path(collection_name)
+
+        if manifest is None:
+            manifest = {"version": "0" * 32, "segments": [], "deleted": {}}
+        version = int(manifest["version"], 16)
+        deleted = {name: set(ids) for name, ids in manifest["deleted"].items()}
+        delete_ids = set(delete_ids)
+
+        # Mask replaced and deleted documents and remove them from the version hash
+        size = 0
+        removed = 0
+        for name in manifest["segments"]:
+            segment_deleted = deleted.setdefault(name, set())
+            segment = BM25Segment(path / name)
+            try:
+                size += len(segment) - len(segment_deleted)
+                if not delete_ids and not delete_filter:
+                    continue
+                for document in segment.documents():
+                    if document["id"] in segment_deleted:
+                        continue
+                    if document["id"] in delete_ids or (
+                        delete_filter
+                        and match_filter(document["metadata"], delete_filter)
+                    ):
+                        segment_deleted.add(document["id"])
+                        removed += 1
+                        version ^= document_hash(document["id"], document["text"])
+            finally:
+                segment.close()
+
+        if not items and not removed:
+            return
+
+        segments = list(manifest["segments"])
+        if items:
+            name = f"seg-{uuid.uuid4().hex}"
+            BM25Segment.write(path / name, items)
+            segments.append(name)
+            for item in items:
+                version ^= document_hash(item["id"], item["text"])
+
+        size += len(items) - removed
+        deleted_count = sum(len(ids) for ids in deleted.values())
+        manifest = {
+            "version": f"{version:032x}",
+            "segments": segments,
+            "deleted": {name: sorted(ids) for name, ids in deleted.items() if ids},
+        }
+
+        if len(segments) > MAX_SEGMENTS or (
+            deleted_count and deleted_count / (size + deleted_count) > MAX_DELETED_RATIO
+        ):
+            manifest = self._compact(path, manifest)
+
+        self._write_manifest(collection_name, manifest)
+
+    def _compact(self, path: Path, manifest: dict) -> dict:
+        items = []
+        for name in manifest["segments"]:
+            segment_deleted = set(manifest["deleted"].get(name, []))
+            segment = BM25Segment(path / name)
+            try:
+                items.extend(
+                    document
+                    for document in segment.documents()
+                    if document["id"] not in segment_deleted
+                )
+            finally:
+                segment.close()
+
+        name = f"seg-{uuid.uuid4().hex}"
+        BM25Segment.write(path / name, items)
+        log.debug(f"bm25: compacted {path.name} into {len(items)} documents")
+        return {"version": manifest["version"], "segments": [name], "deleted": {}}
+
+    def search(self, collection_name: str, query: str, k: int) -> list[dict]:
+        """
+        Return the top `k` documents of a collection as dicts with `id`, `text`,
+        `metadata` and `score`, or raise `KeyError` if it has no index yet.
+        """
+        try:
+            loaded = self._load(collection_name)
+        except FileNotFoundError:
+            # Segments were replaced by a concurrent write, read the new manifest
+            loaded = self._load(collection_name)
+        if loaded is None:
+            raise KeyError(collection_name)
+        return loaded.search(query, k)
+
+
+class BM25IndexedVectorDB(VectorDBBase):
+    """
+    Vector DB client that keeps the persistent BM25 index of every collection in
+    sync with the writes going through it.
+
+    New collections are indexed as they are created, collections that predate the
+    index are built lazily on their first hybrid search.
+    """
+
+    def __init__(self, client: VectorDBBase, index: BM25Index):
+        self.client = client
+        self.index = index
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def has_collection(self, collection_name: str) -> bool:
+        return self.client.has_collection(collection_name)
+
+    def delete_collection(self, collection_name: str) -> None:
+        self.client.delete_collection(collection_name)
+        self._update(self.index.delete_collection, collection_name)
+
+    def insert(self, collection_name: str, items: list[VectorItem]) -> None:
+        created = not self.client.has_collection(collection_name)
+        self.client.insert(collection_name, items)
+        self._update(self.index.add, collection_name, items, created)
+
+    def upsert(self, collection_name: str, items: list[VectorItem]) -> None:
+        self.client.upsert(collection_name, items)
+        self._update(self.index.add, collection_name, items)
+
+    def search(
+        self, collection_name: str, vectors: list[list[Union[float, int]]], limit: int
+    ) -> Optional[SearchResult]:
+        return self.client.search(collection_name, vectors, limit)
+
+    def query(
+        self, collection_name: str, filter: dict, limit: Optional[int] = None
+    ) -> Optional[GetResult]:
+        return self.client.query(collection_name, filter, limit)
+
+    def get(self, collection_name: str) -> Optional[GetResult]:
+        return self.client.get(collection_name)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> None:
+        self.client.delete(collection_name, ids=ids, filter=filter, **kwargs)
+        if kwargs:
+            # Unknown delete arguments, let the index be rebuilt on next search
+            self._update(self.index.invalidate, collection_name)
+        else:
+            self._update(self.index.delete, collection_name, ids, filter)
+
+    def reset(self) -> None:
+        self.client.reset()
+        self._update(self.index.reset)
+
+    def _update(self, fn, *args):
+        # The vector DB is the source of truth, a failed index update only drops
+        # the index so that it is rebuilt on the next hybrid search
+        try:
+            fn(*args)
+        except Exception as e:
+            log.exception(f"bm25: failed to update index: {e}")
+            if args:
+                try:
+                    self.index.invalidate(args[0])
+                except Exception:
+                    pass
+
+
+BM25_INDEX = BM25Index()
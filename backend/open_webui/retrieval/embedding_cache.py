@@ -0,0 +1,383 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Union
+
+from open_webui.env import (
+    ENABLE_CHUNK_EMBEDDING_STORE,
+    ENABLE_QUERY_EMBEDDING_CACHE,
+    ENABLE_QUERY_EMBEDDING_CACHE_REDIS,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.chunk_embeddings import ChunkEmbeddings, ChunkEmbeddingsTable
+from open_webui.retrieval.vector.main import (
+    GetResult,
+    SearchResult,
+    VectorDBBase,
+    VectorItem,
+)
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with TTL eviction, keyed by
+    (engine, model, prefix, normalized text).
+
+    Entries live in-process; when a Redis connection is given they are also
+    shared between workers with the same TTL. Only misses reach the embedding
+    backend, in a single call.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = QUERY_EMBEDDING_CACHE_SIZE,
+        ttl: int = QUERY_EMBEDDING_CACHE_TTL,
+        redis=None,
+        redis_key_prefix: str = f"{REDIS_KEY_PREFIX}:embedding:query",
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis = redis
+        self.redis_key_prefix = redis_key_prefix
+
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "redis_hits": 0}
+
+    def _key(self, engine: str, model: str, prefix: Optional[str], text: str) -> str:
+        return hashlib.sha256(
+            json.dumps([engine, model, prefix, normalize_text(text)]).encode("utf-8")
+        ).hexdigest()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.redis_key_prefix}:{key}"
+
+    def _get_local(self, key: str) -> Optional[list[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, embedding = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return embedding
+
+    def _set_local(self, key: str, embedding: list[float]):
+        self._entries[key] = (time.monotonic() + self.ttl, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys: list[str]) -> list[Optional[list[float]]]:
+        with self._lock:
+            embeddings = [self._get_local(key) for key in keys]
+
+        missing = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+        if missing and self.redis:
+            try:
+                values = self.redis.mget(
+                    [self._redis_key(keys[idx]) for idx in missing]
+                )
+                with self._lock:
+                    for idx, value in zip(missing, values):
+                        if value is not None:
+                            embeddings[idx] = json.loads(value)
+                            self._set_local(keys[idx], embeddings[idx])
+                            self.stats["redis_hits"] += 1
+            except Exception as e:
+                log.warning(f"Failed to read query embeddings from Redis: {e}")
+
+        with self._lock:
+            hits = sum(1 for embedding in embeddings if embedding is not None)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(keys) - hits
+        return embeddings
+
+    def set_many(self, keys: list[str], embeddings: list[list[float]]):
+        with self._lock:
+            for key, embedding in zip(keys, embeddings):
+                self._set_local(key, embedding)
+
+        if self.redis:
+            try:
+                pipe = self.redis.pipeline()
+                for key, embedding in zip(keys, embeddings):
+                    pipe.set(self._redis_key(key), json.dumps(embedding), ex=self.ttl)
+                pipe.execute()
+            except Exception as e:
+                log.warning(f"Failed to write query embeddings to Redis: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+        if self.redis:
+            try:
+                keys = list(self.redis.scan_iter(match=f"{self.redis_key_prefix}:*"))
+                for idx in range(0, len(keys), 1000):
+                    self.redis.delete(*keys[idx : idx + 1000])
+            except Exception as e:
+                log.warning(f"Failed to clear query embeddings from Redis: {e}")
+
+    def wrap(self, engine: str, model: str, func: Callable) -> Callable:
+        """Return `func` with its results cached, same signature and return shape."""
+
+        def embedding_function(query, prefix=None, user=None):
+            texts = query if isinstance(query, list) else [query]
+            keys = [self._key(engine, model, prefix, text) for text in texts]
+            embeddings = self.get_many(keys)
+
+            missing = [
+                idx for idx, embedding in enumerate(embeddings) if embedding is None
+            ]
+            if missing:
+                # Embed each distinct missing text once
+                missing_texts = list(
+                    OrderedDict((keys[idx], texts[idx]) for idx in missing).items()
+                )
+                results = func(
+                    [text for _, text in missing_texts], prefix=prefix, user=user
+                )
+                if results is None:
+                    return None
+
+                results = dict(zip((key for key, _ in missing_texts), results))
+                self.set_many(list(results.keys()), list(results.values()))
+                for idx in missing:
+                    embeddings[idx] = results[keys[idx]]
+
+            return embeddings if isinstance(query, list) else embeddings[0]
+
+        return embedding_function
+
+
+QUERY_EMBEDDING_CACHE = (
+    QueryEmbeddingCache(
+        redis=(
+            get_redis_connection(
+                REDIS_URL,
+                get_sentinels_from_env(REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT),
+                decode_responses=True,
+            )
+            if ENABLE_QUERY_EMBEDDING_CACHE_REDIS
+            else None
+        )
+    )
+    if ENABLE_QUERY_EMBEDDING_CACHE
+    else None
+)
+
+
+class ChunkEmbeddingStore:
+    """
+    Store of document chunk embeddings keyed by (engine and model, chunk hash),
+    shared by every collection, see `ChunkEmbeddingsTable`.
+
+    `embed` only sends the chunks that are not stored yet to the embedding
+    backend. The vector DB items created from stored embeddings are recorded as
+    references with `add_refs`; `ChunkEmbeddingRefVectorDB` drops them again when
+    the items are deleted, and embeddings left without references are evicted.
+    """
+
+    def __init__(self, table: ChunkEmbeddingsTable = ChunkEmbeddings):
+        self.table = table
+        self._lock = threading.Lock()
+        self.stats = {"reused": 0, "embedded": 0, "calls_saved": 0}
+
+    def _model(self, engine: str, model: str) -> str:
+        return f"{engine}:{model}"
+
+    def _hash(self, prefix: Optional[str], text: str) -> str:
+        return hashlib.sha256(json.dumps([prefix, text]).encode("utf-8")).hexdigest()
+
+    def embed(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        embedding_function: Callable,
+        prefix: Optional[str] = None,
+        user=None,
+        batch_size: Optional[int] = None,
+    ) -> tuple[list[list[float]], list[str], dict]:
+        """
+        Return the embeddings of `texts`, the hashes to reference them by and a
+        report of the chunks reused and the embedding calls saved.
+        """
+        key = self._model(engine, model)
+        hashes = [self._hash(prefix, text) for text in texts]
+
+        try:
+            vectors = self.table.get_vectors(key, hashes)
+        except Exception as e:
+            log.warning(f"Failed to read chunk embeddings: {e}")
+            vectors = {}
+
+        # Embed each distinct missing chunk once
+        missing = OrderedDict(
+            (hash, text) for hash, text in zip(hashes, texts) if hash not in vectors
+        )
+        if missing:
+            embeddings = embedding_function(
+                list(missing.values()), prefix=prefix, user=user
+            )
+            if embeddings is None:
+                raise ValueError("Failed to generate embeddings")
+
+            embedded = dict(zip(missing.keys(), embeddings))
+            try:
+                self.table.insert_vectors(key, embedded)
+            except Exception as e:
+                log.warning(f"Failed to store chunk embeddings: {e}")
+            vectors.update(embedded)
+
+        batch_size = batch_size or len(texts) or 1
+        report = {
+            "chunks": len(texts),
+            "reused": len(texts) - len(missing),
+            "embedded": len(missing),
+            "calls_saved": math.ceil(len(texts) / batch_size)
+            - math.ceil(len(missing) / batch_size),
+        }
+        with self._lock:
+            for stat in self.stats:
+                self.stats[stat] += report[stat]
+
+        return [vectors[hash] for hash in hashes], hashes, report
+
+    def add_refs(
+        self,
+        collection_name: str,
+        items: list[dict],
+        engine: str,
+        model: str,
+        hashes: list[str],
+    ):
+        key = self._model(engine, model)
+        self.table.add_refs(
+            collection_name,
+            [
+                {
+                    "item_id": item["id"],
+                    "model": key,
+                    "hash": hash,
+                    "file_id": (item.get("metadata") or {}).get("file_id"),
+                }
+                for item, hash in zip(items, hashes)
+            ],
+        )
+
+    def release(
+        self,
+        collection_name: Optional[str] = None,
+        item_ids: Optional[list[str]] = None,
+        file_id: Optional[str] = None,
+    ):
+        if self.table.release_refs(collection_name, item_ids, file_id):
+            self.table.evict_unreferenced()
+
+
+class ChunkEmbeddingRefVectorDB(VectorDBBase):
+    """
+    Vector DB client that releases the chunk embedding references of the items
+    deleted through it.
+    """
+
+    def __init__(self, client: VectorDBBase, store: ChunkEmbeddingStore):
+        self.client = client
+        self.store = store
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def has_collection(self, collection_name: str) -> bool:
+        return self.client.has_collection(collection_name)
+
+    def delete_collection(self, collection_name: str) -> None:
+        self.client.delete_collection(collection_name)
+        self._release(collection_name)
+
+    def insert(self, collection_name: str, items: list[VectorItem]) -> None:
+        self.client.insert(collection_name, items)
+
+    def upsert(self, collection_name: str, items: list[VectorItem]) -> None:
+        self.client.upsert(collection_name, items)
+        # Upserted items no longer hold the stored embedding they may have had
+        self._release(
+            collection_name,
+            item_ids=[
+                item["id"] if isinstance(item, dict) else item.id for item in items
+            ],
+        )
+
+    def search(
+        self, collection_name: str, vectors: list[list[Union[float, int]]], limit: int
+    ) -> Optional[SearchResult]:
+        return self.client.search(collection_name, vectors, limit)
+
+    def query(
+        self, collection_name: str, filter: dict, limit: Optional[int] = None
+    ) -> Optional[GetResult]:
+        return self.client.query(collection_name, filter, limit)
+
+    def get(self, collection_name: str) -> Optional[GetResult]:
+        return self.client.get(collection_name)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> None:
+        item_ids = ids
+        if ids is None and filter and list(filter.keys()) != ["file_id"]:
+            # Resolve other filters to the items they match before deleting them
+            try:
+                result = self.client.query(collection_name, filter)
+                item_ids = result.ids[0] if result and result.ids else []
+            except Exception as e:
+                log.warning(f"Failed to resolve deleted chunks: {e}")
+
+        self.client.delete(collection_name, ids=ids, filter=filter, **kwargs)
+
+        if item_ids is not None:
+            self._release(collection_name, item_ids=item_ids)
+        elif filter and list(filter.keys()) == ["file_id"]:
+            self._release(collection_name, file_id=filter["file_id"])
+        elif not filter and not kwargs:
+            self._release(collection_name)
+
+    def reset(self) -> None:
+        self.client.reset()
+        self._release()
+
+    def _release(self, *args, **kwargs):
+        # References that cannot be released only keep their embeddings stored
+        try:
+            self.store.release(*args, **kwargs)
+        except Exception as e:
+            log.warning(f"Failed to release chunk embeddings: {e}")
+
+
+CHUNK_EMBEDDING_STORE = ChunkEmbeddingStore() if ENABLE_CHUNK_EMBEDDING_STORE else None
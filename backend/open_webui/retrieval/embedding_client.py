@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import random
+import threading
+from typing import Optional
+from urllib.parse import quote
+
+import aiohttp
+
+from open_webui.config import RAG_EMBEDDING_PREFIX_FIELD_NAME
+from open_webui.env import (
+    AIOHTTP_CLIENT_TIMEOUT,
+    ENABLE_FORWARD_USER_INFO_HEADERS,
+    RAG_EMBEDDING_CONCURRENT_REQUESTS,
+    RAG_EMBEDDING_MAX_RETRIES,
+    RAG_EMBEDDING_POOL_SIZE,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+
+def get_user_headers(user) -> dict:
+    if not (ENABLE_FORWARD_USER_INFO_HEADERS and user):
+        return {}
+    return {
+        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+        "X-OpenWebUI-User-Id": user.id,
+        "X-OpenWebUI-User-Email": user.email,
+        "X-OpenWebUI-User-Role": user.role,
+    }
+
+
+def build_embedding_request(
+    engine: str,
+    model: str,
+    texts: list[str],
+    url: str,
+    key: str = "",
+    prefix: Optional[str] = None,
+    user=None,
+    azure_api_version: Optional[str] = None,
+) -> tuple[str, dict, dict]:
+    """Return the (url, headers, payload) of an embedding request for a batch."""
+    json_data = {"input": texts}
+    if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
+        json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
+
+    headers = {"Content-Type": "application/json", **get_user_headers(user)}
+    if engine == "ollama":
+        json_data["model"] = model
+        headers["Authorization"] = f"Bearer {key}"
+        return f"{url}/api/embed", headers, json_data
+    elif engine == "openai":
+        json_data["model"] = model
+        headers["Authorization"] = f"Bearer {key}"
+        return f"{url}/embeddings", headers, json_data
+    elif engine == "azure_openai":
+        headers["api-key"] = key
+        return (
+            f"{url}/openai/deployments/{model}/embeddings?api-version={azure_api_version}",
+            headers,
+            json_data,
+        )
+    raise ValueError(f"Unknown embedding engine: {engine}")
+
+
+def parse_embedding_response(engine: str, data: dict) -> list[list[float]]:
+    if engine == "ollama":
+        if "embeddings" in data:
+            return data["embeddings"]
+    elif "data" in data:
+        return [elem["embedding"] for elem in data["data"]]
+    raise Exception("Something went wrong :/")
+
+
+def get_retry_delay(headers, attempt: int) -> float:
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    # Exponential backoff with jitter so that concurrent batches do not retry in step
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt) * (0.5 + random.random() / 2)
+
+
+class EmbeddingClient:
+    """
+    Embedding client for the ollama, openai and azure_openai engines.
+
+    Requests share one keep-alive connection pool, batches of a call are sent
+    with bounded concurrency and reassembled in order, and rate limited (429)
+    requests are retried with backoff. The client runs on its own event loop
+    thread so that it can be shared by the synchronous callers of the embedding
+    function, see `embed_sync`.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = RAG_EMBEDDING_CONCURRENT_REQUESTS,
+        pool_size: int = RAG_EMBEDDING_POOL_SIZE,
+        max_retries: int = RAG_EMBEDDING_MAX_RETRIES,
+        timeout: Optional[int] = AIOHTTP_CLIENT_TIMEOUT,
+    ):
+        self.concurrency = max(concurrency, 1)
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="embedding-client",
+                    daemon=True,
+                ).start()
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trust_env=True,
+            )
+        return self._session
+
+    async def _post(self, url: str, headers: dict, json_data: dict) -> dict:
+        session = self._get_session()
+        for attempt in range(self.max_retries + 1):
+            async with session.post(url, headers=headers, json=json_data) as r:
+                if r.status == 429 and attempt < self.max_retries:
+                    delay = get_retry_delay(r.headers, attempt)
+                    log.debug(f"embedding request rate limited, retrying in {delay}s")
+                    await asyncio.sleep(delay)
+                    continue
+                r.raise_for_status()
+                return await r.json(content_type=None)
+
+    async def embed_batch(
+        self, engine: str, model: str, texts: list[str], **kwargs
+    ) -> list[list[float]]:
+        log.debug(f"embed_batch:{engine}:model {model} batch size: {len(texts)}")
+        url, headers, json_data = build_embedding_request(
+            engine, model, texts, **kwargs
+        )
+        return parse_embedding_response(
+            engine, await self._post(url, headers, json_data)
+        )
+
+    async def embed(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        batch_size: Optional[int] = None,
+        **kwargs,
+    ) -> list[list[float]]:
+        batch_size = batch_size or len(texts) or 1
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def embed_batch(batch: list[str]) -> list[list[float]]:
+            async with semaphore:
+                return await self.embed_batch(engine, model, batch, **kwargs)
+
+        # gather keeps the order of the batches regardless of completion order
+        results = await asyncio.gather(
+            *[
+                embed_batch(texts[i : i + batch_size])
+                for i in range(0, len(texts), batch_size)
+            ]
+        )
+        return [embedding for result in results for embedding in result]
+
+    def embed_sync(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        batch_size: Optional[int] = None,
+        **kwargs,
+    ) -> list[list[float]]:
+        return asyncio.run_coroutine_threadsafe(
+            self.embed(engine, model, texts, batch_size, **kwargs), self._get_loop()
+        ).result()
+
+    def close(self):
+        if self._loop is None or self._session is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._session = None
+
+
+EMBEDDING_CLIENT = EmbeddingClient()
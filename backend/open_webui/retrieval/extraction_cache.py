@@ -0,0 +1,333 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Iterable, Iterator, Optional
+
+from langchain_core.documents import Document
+
+from open_webui.env import (
+    DOCUMENT_EXTRACTION_CACHE_DIR,
+    DOCUMENT_EXTRACTION_CACHE_MAX_AGE_DAYS,
+    DOCUMENT_EXTRACTION_CACHE_MAX_SIZE_MB,
+    ENABLE_DOCUMENT_EXTRACTION_CACHE,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.files import Files
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def calculate_file_sha256(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def is_secret_param(name: str) -> bool:
+    # Rotating a credential does not change what is extracted
+    return name.endswith("_KEY")
+
+
+class ExtractionCache:
+    """
+    On-disk store of the documents extracted from a file, keyed by the sha256 of
+    the file and the loader and extraction settings it was extracted with.
+
+    Every entry is one gzipped JSON lines file holding the page content and
+    metadata of one document per line, followed by how long the extraction took,
+    so that a hit can report the time it saved. Entries are appended to a
+    temporary file as documents are extracted and moved in place once complete,
+    so concurrent workers never read a partial entry.
+
+    The entries of a file live in a directory named after its hash, shared by
+    every upload of the same content, which is removed with `delete` once the
+    last of them is deleted. After every write, entries not read for `max_age`
+    seconds are removed, then the least recently read ones until the cache is
+    back under `max_size` bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = 0, max_age: float = 0):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "errors": 0,
+            "evictions": 0,
+            "seconds_saved": 0.0,
+        }
+
+    @staticmethod
+    def get_key(file_hash: str, loader: str, engine: str, params: dict) -> str:
+        key = json.dumps(
+            {
+                "file": file_hash,
+                "loader": loader,
+                "engine": engine,
+                "params": {
+                    name: value
+                    for name, value in params.items()
+                    if not is_secret_param(name)
+                },
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return f"{file_hash}.{hashlib.sha256(key.encode()).hexdigest()}"
+
+    def _file_dir(self, file_hash: str) -> str:
+        return os.path.join(self.cache_dir, file_hash[:2], file_hash)
+
+    def _path(self, key: str) -> str:
+        file_hash, _ = key.split(".", 1)
+        return os.path.join(self._file_dir(file_hash), f"{key}.jsonl.gz")
+
+    def get(self, key: str) -> Optional[tuple[list[Document], float]]:
+        """Return the cached documents and the seconds their extraction took."""
+        path = self._path(key)
+        try:
+            docs = []
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if isinstance(entry, dict):
+                        duration = entry["duration"]
+                        break
+                    docs.append(Document(page_content=entry[0], metadata=entry[1]))
+                else:
+                    raise ValueError("entry is truncated")
+            # The modification time tracks when an entry was last read
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning(f"Ignoring unreadable extraction cache entry {key}: {e}")
+            with self.lock:
+                self.stats["errors"] += 1
+            return None
+
+        return docs, duration
+
+    def open(self, key: str) -> "ExtractionCacheWriter":
+        return ExtractionCacheWriter(self, key)
+
+    def set(self, key: str, docs: list[Document], duration: float):
+        writer = self.open(key)
+        for doc in docs:
+            writer.write(doc)
+        writer.commit(duration)
+
+    def delete(self, file_hash: str):
+        """Remove every entry extracted from the file with the given hash."""
+        shutil.rmtree(self._file_dir(file_hash), ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def evict(self):
+        if not self.max_size and not self.max_age:
+            return
+
+        entries = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                # Including temporary files left behind by a crashed worker
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Least recently read first
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        evicted = 0
+        for mtime, size, path in entries:
+            if not (self.max_age and now - mtime > self.max_age) and not (
+                self.max_size and total > self.max_size
+            ):
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        if evicted:
+            with self.lock:
+                self.stats["evictions"] += evicted
+
+    def load(
+        self, key: str, docs: Iterable[Document], extraction: dict
+    ) -> Iterator[Document]:
+        """
+        Yield the documents cached under `key`, or the documents extracted by
+        `docs`, which are written to the cache as they are extracted and stored
+        once they have all been.
+
+        `extraction` is filled in once the documents are exhausted: whether they
+        were served from the cache, how long loading them took, and the seconds
+        saved compared to the original extraction.
+        """
+        start = time.perf_counter()
+        cached = self.get(key)
+        if cached is not None:
+            cached_docs, duration = cached
+            elapsed = time.perf_counter() - start
+            saved = max(duration - elapsed, 0.0)
+            with self.lock:
+                self.stats["hits"] += 1
+                self.stats["seconds_saved"] += saved
+            extraction.update(
+                {
+                    "cached": True,
+                    "duration": round(elapsed, 3),
+                    "time_saved": round(saved, 3),
+                }
+            )
+            yield from cached_docs
+            return
+
+        with self.lock:
+            self.stats["misses"] += 1
+
+        writer = self.open(key)
+        try:
+            for doc in measure_extraction(docs, extraction):
+                writer.write(doc)
+                yield doc
+            writer.commit(extraction["duration"])
+        finally:
+            # Extraction failed or the consumer stopped early
+            writer.abort()
+
+
+class ExtractionCacheWriter:
+    """
+    Cache entry being written, one document at a time. Writing errors are
+    logged and drop the entry without interrupting the extraction.
+    """
+
+    def __init__(self, cache: ExtractionCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.path = cache._path(key)
+        self.part_path = f"{self.path}.{uuid.uuid4().hex}.part"
+        self.file = None
+        self.failed = False
+        self.committed = False
+
+    def write(self, doc: Document):
+        if self.failed:
+            return
+        try:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.file = gzip.open(self.part_path, "wt", encoding="utf-8")
+            self.file.write(self._dumps([doc.page_content, doc.metadata]))
+        except Exception as e:
+            self._fail(e)
+
+    def commit(self, duration: float):
+        if self.failed:
+            return
+        try:
+            if self.file is None:
+                # No documents were extracted
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.file = gzip.open(self.part_path, "wt", encoding="utf-8")
+            self.file.write(self._dumps({"duration": duration}))
+            self.file.close()
+            self.file = None
+            os.replace(self.part_path, self.path)
+        except Exception as e:
+            self._fail(e)
+            return
+        self.committed = True
+        self.cache.evict()
+
+    def abort(self):
+        if self.committed:
+            return
+        try:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            os.remove(self.part_path)
+        except OSError:
+            pass
+
+    def _fail(self, e: Exception):
+        log.warning(f"Error writing extraction cache entry {self.key}: {e}")
+        with self.cache.lock:
+            self.cache.stats["errors"] += 1
+        self.failed = True
+        self.abort()
+
+    @staticmethod
+    def _dumps(value) -> str:
+        return json.dumps(value, separators=(",", ":"), default=str) + "\n"
+
+
+def measure_extraction(
+    docs: Iterable[Document], extraction: dict
+) -> Iterator[Document]:
+    """
+    Yield `docs`, recording in `extraction` the seconds spent extracting them,
+    excluding the time the consumer spends on each document.
+    """
+    duration = 0.0
+    iterator = iter(docs)
+    while True:
+        start = time.perf_counter()
+        doc = next(iterator, None)
+        duration += time.perf_counter() - start
+        if doc is None:
+            break
+        yield doc
+
+    extraction.update(
+        {"cached": False, "duration": round(duration, 3), "time_saved": 0}
+    )
+
+
+def delete_cached_extractions(file_hash: Optional[str]):
+    """
+    Forget what was extracted from a deleted file, unless another file record
+    still has the same content.
+    """
+    if (
+        EXTRACTION_CACHE is not None
+        and file_hash
+        and not Files.has_file_by_sha256(file_hash)
+    ):
+        EXTRACTION_CACHE.delete(file_hash)
+
+
+EXTRACTION_CACHE = (
+    ExtractionCache(
+        DOCUMENT_EXTRACTION_CACHE_DIR,
+        max_size=DOCUMENT_EXTRACTION_CACHE_MAX_SIZE_MB * 1024 * 1024,
+        max_age=DOCUMENT_EXTRACTION_CACHE_MAX_AGE_DAYS * 24 * 60 * 60,
+    )
+    if ENABLE_DOCUMENT_EXTRACTION_CACHE
+    else None
+)
@@ -3,6 +3,7 @@ import logging
 import ftfy
 import sys
 import json
+from typing import Iterator
 
 from langchain_community.document_loaders import (
     AzureAIDocumentIntelligenceLoader,
@@ -26,9 +27,20 @@ from open_webui.retrieval.loaders.external_document import ExternalDocumentLoade
 
 from open_webui.retrieval.loaders.mistral import MistralLoader
 from open_webui.retrieval.loaders.datalab_marker import DatalabMarkerLoader
+from open_webui.retrieval.loaders.parallel_pdf import ParallelPDFLoader
+from open_webui.retrieval.extraction_cache import (
+    EXTRACTION_CACHE,
+    calculate_file_sha256,
+    measure_extraction,
+)
 
 
-from open_webui.env import SRC_LOG_LEVELS, GLOBAL_LOG_LEVEL
+from open_webui.env import (
+    GLOBAL_LOG_LEVEL,
+    PDF_EXTRACTION_PAGES_PER_SHARD,
+    PDF_EXTRACTION_WORKERS,
+    SRC_LOG_LEVELS,
+)
 
 logging.basicConfig(stream=sys.stdout, level=GLOBAL_LOG_LEVEL)
 log = logging.getLogger(__name__)
@@ -210,19 +222,57 @@ class Loader:
     def __init__(self, engine: str = "", **kwargs):
         self.engine = engine
         self.kwargs = kwargs
+        # Set by `lazy_load`: whether the documents are yielded while the file is
+        # still being extracted
+        self.streamed = False
+        # Filled in once loaded: whether the documents came from the extraction
+        # cache, how long loading took and the seconds the cache saved
+        self.extraction: dict = {}
 
     def load(
-        self, filename: str, file_content_type: str, file_path: str
+        self,
+        filename: str,
+        file_content_type: str,
+        file_path: str,
+        use_cache: bool = True,
     ) -> list[Document]:
+        return list(
+            self.lazy_load(filename, file_content_type, file_path, use_cache=use_cache)
+        )
+
+    def lazy_load(
+        self,
+        filename: str,
+        file_content_type: str,
+        file_path: str,
+        use_cache: bool = True,
+    ) -> Iterator[Document]:
         loader = self._get_loader(filename, file_content_type, file_path)
-        docs = loader.load()
+        self.streamed = isinstance(loader, ParallelPDFLoader)
+        self.extraction = {}
 
-        return [
-            Document(
-                page_content=ftfy.fix_text(doc.page_content), metadata=doc.metadata
-            )
-            for doc in docs
-        ]
+        def extract() -> Iterator[Document]:
+            for doc in loader.lazy_load() if self.streamed else loader.load():
+                yield Document(
+                    page_content=ftfy.fix_text(doc.page_content), metadata=doc.metadata
+                )
+
+        docs = extract()
+
+        if EXTRACTION_CACHE is None or not use_cache:
+            return measure_extraction(docs, self.extraction)
+
+        key = EXTRACTION_CACHE.get_key(
+            calculate_file_sha256(file_path),
+            type(loader).__name__,
+            self.engine,
+            {
+                **self.kwargs,
+                "file_ext": filename.split(".")[-1].lower(),
+                "content_type": file_content_type,
+            },
+        )
+        return EXTRACTION_CACHE.load(key, docs, self.extraction)
 
     def _is_text_file(self, file_ext: str, file_content_type: str) -> bool:
         return file_ext in known_source_ext or (
@@ -358,7 +408,14 @@ class Loader:
                 api_key=self.kwargs.get("MISTRAL_OCR_API_KEY"), file_path=file_path
             )
         else:
-            if file_ext == "pdf":
+            if file_ext == "pdf" and PDF_EXTRACTION_WORKERS > 0:
+                loader = ParallelPDFLoader(
+                    file_path,
+                    extract_images=self.kwargs.get("PDF_EXTRACT_IMAGES"),
+                    workers=PDF_EXTRACTION_WORKERS,
+                    pages_per_shard=PDF_EXTRACTION_PAGES_PER_SHARD,
+                )
+            elif file_ext == "pdf":
                 loader = PyPDFLoader(
                     file_path, extract_images=self.kwargs.get("PDF_EXTRACT_IMAGES")
                 )
@@ -0,0 +1,196 @@
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, Optional
+
+import pypdf
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+log = logging.getLogger(__name__)
+
+# Shards queued per worker, so that the pool keeps extracting while the pages of
+# earlier shards are consumed, without holding the whole document
+SHARDS_IN_FLIGHT_PER_WORKER = 2
+
+# Where PyPDFParser inserts the text of a page's images, between paragraphs
+PARAGRAPH_DELIMITERS = ["\n\n\n", "\n\n"]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_pdf_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Forking a process that runs threads can deadlock the child
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def shutdown_pdf_executor():
+    """Stop the worker processes, which are otherwise waited for on exit."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def purge_metadata(metadata: dict) -> dict:
+    """Normalize PDF document metadata the way `PyPDFParser` does."""
+    purged = {}
+    for key, value in metadata.items():
+        if type(value) not in [str, int]:
+            value = str(value)
+        key = key.removeprefix("/").lower()
+        if key in ["creationdate", "moddate"]:
+            try:
+                purged[key] = datetime.strptime(
+                    value.replace("'", ""), "D:%Y%m%d%H%M%S%z"
+                ).isoformat("T")
+            except ValueError:
+                purged[key] = value
+        elif key == "page_count":
+            purged["total_pages"] = purged[key] = value
+        elif key == "file_path":
+            purged["source"] = purged[key] = value
+        elif isinstance(value, str):
+            purged[key] = value.strip()
+        else:
+            purged[key] = value
+    return purged
+
+
+def merge_text_and_images(
+    images: str, text: str, recurse: bool = True
+) -> Optional[str]:
+    """
+    Insert the text of a page's images before its last paragraph, or before the
+    one preceding it when there is one, like `PyPDFParser` does.
+    """
+    if not images:
+        return text
+
+    for delimiter in PARAGRAPH_DELIMITERS:
+        pos = text.rfind(delimiter)
+        if pos != -1:
+            # The last paragraph is usually the footer
+            previous = (
+                merge_text_and_images(images, text[:pos], False) if recurse else None
+            )
+            if previous:
+                return previous + text[pos:]
+            return text[:pos] + delimiter + images + text[pos:]
+
+    if not recurse:
+        return None
+    return text + PARAGRAPH_DELIMITERS[-1] + images
+
+
+def extract_pages(
+    file_path: str, start: int, page_labels: list[str], extract_images: bool
+) -> list[tuple[str, dict]]:
+    """
+    Extract the pages [start, start + len(page_labels)) of a PDF in a pool
+    worker, with the same text and metadata as `PyPDFLoader`.
+    """
+    from langchain_community.document_loaders.parsers.pdf import PyPDFParser
+
+    parser = PyPDFParser(extract_images=extract_images)
+    pages = []
+    with open(file_path, "rb") as f:
+        reader = pypdf.PdfReader(f)
+        doc_metadata = purge_metadata(
+            {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+            | dict(reader.metadata or {})
+            | {"source": file_path, "total_pages": len(reader.pages)}
+        )
+
+        for page_number, page_label in enumerate(page_labels, start):
+            page = reader.pages[page_number]
+            text = page.extract_text(
+                extraction_mode=parser.extraction_mode, **parser.extraction_kwargs
+            )
+            images = parser.extract_images_from_page(page)
+            pages.append(
+                (
+                    merge_text_and_images(images, text).strip(),
+                    doc_metadata | {"page": page_number, "page_label": page_label},
+                )
+            )
+    return pages
+
+
+class ParallelPDFLoader(BaseLoader):
+    """
+    Load a PDF one document per page like `PyPDFLoader`, extracting shards of
+    `pages_per_shard` pages on a shared pool of `workers` processes.
+
+    `lazy_load` yields the pages in order as soon as their shard is extracted.
+    At most `SHARDS_IN_FLIGHT_PER_WORKER` shards per worker are queued ahead of
+    the consumer, so extraction overlaps with whatever is done with the pages
+    without holding the whole document in memory.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        extract_images: bool = False,
+        workers: int = 1,
+        pages_per_shard: int = 32,
+    ):
+        self.file_path = str(file_path)
+        self.extract_images = bool(extract_images)
+        self.workers = workers
+        self.pages_per_shard = pages_per_shard
+
+    def lazy_load(self) -> Iterator[Document]:
+        with open(self.file_path, "rb") as f:
+            # Labelling the pages of every shard in its worker would read the page
+            # label tree once per shard
+            page_labels = pypdf.PdfReader(f).page_labels
+
+        shards = iter(
+            (start, page_labels[start : start + self.pages_per_shard])
+            for start in range(0, len(page_labels), self.pages_per_shard)
+        )
+        executor = get_pdf_executor(self.workers)
+        futures = deque()
+
+        def submit_next() -> bool:
+            shard = next(shards, None)
+            if shard is None:
+                return False
+            futures.append(
+                executor.submit(
+                    extract_pages, self.file_path, *shard, self.extract_images
+                )
+            )
+            return True
+
+        try:
+            for _ in range(self.workers * SHARDS_IN_FLIGHT_PER_WORKER):
+                if not submit_next():
+                    break
+
+            while futures:
+                pages = futures.popleft().result()
+                submit_next()
+                for page_content, metadata in pages:
+                    yield Document(page_content=page_content, metadata=metadata)
+        except BrokenProcessPool:
+            log.error("PDF extraction worker died, restarting the pool")
+            shutdown_pdf_executor()
+            raise
+        finally:
+            # Stopped early by the consumer or by an error
+            for future in futures:
+                future.cancel()
@@ -1,19 +1,21 @@
 import logging
 import os
+import time
 from typing import Optional, Union
 
-import requests
-import hashlib
+import heapq
 from concurrent.futures import ThreadPoolExecutor
-import time
 
-from urllib.parse import quote
 from huggingface_hub import snapshot_download
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
 from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
-from open_webui.config import VECTOR_DB
+from open_webui.config import (
+    VECTOR_DB,
+    ENABLE_RAG_BM25_INDEX,
+    RAG_BM25_INDEX_VALIDATE_INTERVAL,
+)
 from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
 
 from open_webui.models.users import UserModel
@@ -22,13 +24,14 @@ from open_webui.models.knowledge import Knowledges
 from open_webui.models.notes import Notes
 
 from open_webui.retrieval.vector.main import GetResult
+from open_webui.retrieval.embedding_cache import QueryEmbeddingCache
+from open_webui.retrieval.embedding_client import EMBEDDING_CLIENT
 from open_webui.utils.access_control import has_access
 
 
 from open_webui.env import (
     SRC_LOG_LEVELS,
     OFFLINE_MODE,
-    ENABLE_FORWARD_USER_INFO_HEADERS,
 )
 from open_webui.config import (
     RAG_EMBEDDING_QUERY_PREFIX,
@@ -78,6 +81,59 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class BM25IndexRetriever(BaseRetriever):
+    collection_name: Any
+    k: int
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        from open_webui.retrieval.bm25 import BM25_INDEX
+
+        return [
+            Document(metadata=result["metadata"], page_content=result["text"])
+            for result in BM25_INDEX.search(self.collection_name, query, self.k)
+        ]
+
+
+# Last time the BM25 index of each collection was checked against the vector DB
+BM25_INDEX_VALIDATED_AT: dict[str, float] = {}
+
+
+def get_bm25_index(collection_name: str) -> bool:
+    """
+    Make sure the persistent BM25 index of a collection exists, building it from
+    the vector DB the first time a collection that predates the index is searched.
+
+    Every RAG_BM25_INDEX_VALIDATE_INTERVAL seconds the index is also compared with
+    the collection and rebuilt if another replica wrote to it.
+    """
+    from open_webui.retrieval.bm25 import BM25_INDEX
+
+    has_index = BM25_INDEX.has_index(collection_name)
+    now = time.monotonic()
+    if has_index and (
+        RAG_BM25_INDEX_VALIDATE_INTERVAL <= 0
+        or now - BM25_INDEX_VALIDATED_AT.get(collection_name, float("-inf"))
+        < RAG_BM25_INDEX_VALIDATE_INTERVAL
+    ):
+        return True
+
+    log.debug(f"get_bm25_index:VECTOR_DB_CLIENT.get:collection {collection_name}")
+    result = VECTOR_DB_CLIENT.get(collection_name=collection_name)
+    if result is None:
+        return False
+    if not has_index or not BM25_INDEX.is_current(collection_name, result):
+        if has_index:
+            log.info(f"bm25: rebuilding stale index of {collection_name}")
+        BM25_INDEX.build_from_result(collection_name, result)
+    BM25_INDEX_VALIDATED_AT[collection_name] = now
+    return True
+
+
 def query_doc(
     collection_name: str, query_embedding: list[float], k: int, user: UserModel = None
 ):
@@ -114,7 +170,7 @@ def get_doc(collection_name: str, user: UserModel = None):
 
 def query_doc_with_hybrid_search(
     collection_name: str,
-    collection_result: GetResult,
+    collection_result: Optional[GetResult],
     query: str,
     embedding_function,
     k: int,
@@ -125,11 +181,15 @@ def query_doc_with_hybrid_search(
 ) -> dict:
     try:
         log.debug(f"query_doc_with_hybrid_search:doc {collection_name}")
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=collection_result.documents[0],
-            metadatas=collection_result.metadatas[0],
-        )
-        bm25_retriever.k = k
+        if collection_result is None:
+            # Use the persistent index instead of tokenizing the whole collection
+            bm25_retriever = BM25IndexRetriever(collection_name=collection_name, k=k)
+        else:
+            bm25_retriever = BM25Retriever.from_texts(
+                texts=collection_result.documents[0],
+                metadatas=collection_result.metadatas[0],
+            )
+            bm25_retriever.k = k
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
@@ -214,42 +274,29 @@ def merge_get_results(get_results: list[dict]) -> dict:
 
 
 def merge_and_sort_query_results(query_results: list[dict], k: int) -> dict:
-    # Initialize lists to store combined data
-    combined = dict()  # To store documents with unique document hashes
+    # Keep the best result of every chunk across all result sets. Chunks are keyed
+    # by their text: vector ids are per collection, so the same chunk indexed in
+    # two collections has two ids. Strings cache their hash, so no digest is needed.
+    combined = {}
 
     for data in query_results:
-        distances = data["distances"][0]
-        documents = data["documents"][0]
-        metadatas = data["metadatas"][0]
-
-        for distance, document, metadata in zip(distances, documents, metadatas):
-            if isinstance(document, str):
-                doc_hash = hashlib.sha256(
-                    document.encode()
-                ).hexdigest()  # Compute a hash for uniqueness
-
-                if doc_hash not in combined.keys():
-                    combined[doc_hash] = (distance, document, metadata)
-                    continue  # if doc is new, no further comparison is needed
-
-                # if doc is alredy in, but new distance is better, update
-                if distance > combined[doc_hash][0]:
-                    combined[doc_hash] = (distance, document, metadata)
-
-    combined = list(combined.values())
-    # Sort the list based on distances
-    combined.sort(key=lambda x: x[0], reverse=True)
-
-    # Slice to keep only the top k elements
-    sorted_distances, sorted_documents, sorted_metadatas = (
-        zip(*combined[:k]) if combined else ([], [], [])
-    )
+        for distance, document, metadata in zip(
+            data["distances"][0], data["documents"][0], data["metadatas"][0]
+        ):
+            if not isinstance(document, str):
+                continue
+
+            current = combined.get(document)
+            if current is None or distance > current[0]:
+                combined[document] = (distance, document, metadata)
+
+    # Select the top k without sorting every result, ties keep their first-seen order
+    top = heapq.nlargest(k, combined.values(), key=lambda x: x[0])
 
-    # Create and return the output dictionary
     return {
-        "distances": [list(sorted_distances)],
-        "documents": [list(sorted_documents)],
-        "metadatas": [list(sorted_metadatas)],
+        "distances": [[distance for distance, _, _ in top]],
+        "documents": [[document for _, document, _ in top]],
+        "metadatas": [[metadata for _, _, metadata in top]],
     }
 
 
@@ -336,18 +383,29 @@ def query_collection_with_hybrid_search(
     error = False
     # Fetch collection data once per collection sequentially
     # Avoid fetching the same data multiple times later
+    # With the persistent BM25 index the collection data is not needed at all
     collection_results = {}
+    failed_collections = set()
     for collection_name in collection_names:
         try:
+            if ENABLE_RAG_BM25_INDEX:
+                if not get_bm25_index(collection_name):
+                    failed_collections.add(collection_name)
+                collection_results[collection_name] = None
+                continue
+
             log.debug(
                 f"query_collection_with_hybrid_search:VECTOR_DB_CLIENT.get:collection {collection_name}"
             )
             collection_results[collection_name] = VECTOR_DB_CLIENT.get(
                 collection_name=collection_name
             )
+            if collection_results[collection_name] is None:
+                failed_collections.add(collection_name)
         except Exception as e:
             log.exception(f"Failed to fetch collection {collection_name}: {e}")
             collection_results[collection_name] = None
+            failed_collections.add(collection_name)
 
     log.info(
         f"Starting hybrid search for {len(queries)} queries in {len(collection_names)} collections..."
@@ -372,11 +430,11 @@ def query_collection_with_hybrid_search(
             return None, e
 
     # Prepare tasks for all collections and queries
-    # Avoid running any tasks for collections that failed to fetch data (have assigned None)
+    # Avoid running any tasks for collections that failed to fetch data
     tasks = [
         (cn, q)
         for cn in collection_names
-        if collection_results[cn] is not None
+        if cn not in failed_collections
         for q in queries
     ]
 
@@ -406,13 +464,16 @@ def get_embedding_function(
     key,
     embedding_batch_size,
     azure_api_version=None,
+    cache: Optional[QueryEmbeddingCache] = None,
 ):
     if embedding_engine == "":
-        return lambda query, prefix=None, user=None: embedding_function.encode(
-            query, **({"prompt": prefix} if prefix else {})
-        ).tolist()
+        embedding_func = (
+            lambda query, prefix=None, user=None: embedding_function.encode(
+                query, **({"prompt": prefix} if prefix else {})
+            ).tolist()
+        )
     elif embedding_engine in ["ollama", "openai", "azure_openai"]:
-        func = lambda query, prefix=None, user=None: generate_embeddings(
+        embedding_func = lambda query, prefix=None, user=None: generate_embeddings(
             engine=embedding_engine,
             model=embedding_model,
             text=query,
@@ -421,29 +482,15 @@ def get_embedding_function(
             key=key,
             user=user,
             azure_api_version=azure_api_version,
-        )
-
-        def generate_multiple(query, prefix, user, func):
-            if isinstance(query, list):
-                embeddings = []
-                for i in range(0, len(query), embedding_batch_size):
-                    embeddings.extend(
-                        func(
-                            query[i : i + embedding_batch_size],
-                            prefix=prefix,
-                            user=user,
-                        )
-                    )
-                return embeddings
-            else:
-                return func(query, prefix, user)
-
-        return lambda query, prefix=None, user=None: generate_multiple(
-            query, prefix, user, func
+            batch_size=embedding_batch_size,
         )
     else:
         raise ValueError(f"Unknown embedding engine: {embedding_engine}")
 
+    if cache is not None:
+        return cache.wrap(embedding_engine, embedding_model, embedding_func)
+    return embedding_func
+
 
 def get_reranking_function(reranking_engine, reranking_model, reranking_function):
     if reranking_function is None:
@@ -733,37 +780,9 @@ def generate_openai_batch_embeddings(
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
     try:
-        log.debug(
-            f"generate_openai_batch_embeddings:model {model} batch size: {len(texts)}"
+        return EMBEDDING_CLIENT.embed_sync(
+            "openai", model, texts, url=url, key=key, prefix=prefix, user=user
         )
-        json_data = {"input": texts, "model": model}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        r = requests.post(
-            f"{url}/embeddings",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            json=json_data,
-        )
-        r.raise_for_status()
-        data = r.json()
-        if "data" in data:
-            return [elem["embedding"] for elem in data["data"]]
-        else:
-            raise "Something went wrong :/"
     except Exception as e:
         log.exception(f"Error generating openai batch embeddings: {e}")
         return None
@@ -779,45 +798,16 @@ def generate_azure_openai_batch_embeddings(
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
     try:
-        log.debug(
-            f"generate_azure_openai_batch_embeddings:deployment {model} batch size: {len(texts)}"
+        return EMBEDDING_CLIENT.embed_sync(
+            "azure_openai",
+            model,
+            texts,
+            url=url,
+            key=key,
+            prefix=prefix,
+            user=user,
+            azure_api_version=version,
         )
-        json_data = {"input": texts}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        url = f"{url}/openai/deployments/{model}/embeddings?api-version={version}"
-
-        for _ in range(5):
-            r = requests.post(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    "api-key": key,
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                json=json_data,
-            )
-            if r.status_code == 429:
-                retry = float(r.headers.get("Retry-After", "1"))
-                time.sleep(retry)
-                continue
-            r.raise_for_status()
-            data = r.json()
-            if "data" in data:
-                return [elem["embedding"] for elem in data["data"]]
-            else:
-                raise Exception("Something went wrong :/")
-        return None
     except Exception as e:
         log.exception(f"Error generating azure openai batch embeddings: {e}")
         return None
@@ -832,38 +822,9 @@ def generate_ollama_batch_embeddings(
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
     try:
-        log.debug(
-            f"generate_ollama_batch_embeddings:model {model} batch size: {len(texts)}"
+        return EMBEDDING_CLIENT.embed_sync(
+            "ollama", model, texts, url=url, key=key, prefix=prefix, user=user
         )
-        json_data = {"input": texts, "model": model}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        r = requests.post(
-            f"{url}/api/embed",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS
-                    else {}
-                ),
-            },
-            json=json_data,
-        )
-        r.raise_for_status()
-        data = r.json()
-
-        if "embeddings" in data:
-            return data["embeddings"]
-        else:
-            raise "Something went wrong :/"
     except Exception as e:
         log.exception(f"Error generating ollama batch embeddings: {e}")
         return None
@@ -879,6 +840,7 @@ def generate_embeddings(
     url = kwargs.get("url", "")
     key = kwargs.get("key", "")
     user = kwargs.get("user")
+    batch_size = kwargs.get("batch_size")
 
     if prefix is not None and RAG_EMBEDDING_PREFIX_FIELD_NAME is None:
         if isinstance(text, list):
@@ -886,35 +848,27 @@ def generate_embeddings(
         else:
             text = f"{prefix}{text}"
 
-    if engine == "ollama":
-        embeddings = generate_ollama_batch_embeddings(
-            **{
-                "model": model,
-                "texts": text if isinstance(text, list) else [text],
-                "url": url,
-                "key": key,
-                "prefix": prefix,
-                "user": user,
-            }
-        )
-        return embeddings[0] if isinstance(text, str) else embeddings
-    elif engine == "openai":
-        embeddings = generate_openai_batch_embeddings(
-            model, text if isinstance(text, list) else [text], url, key, prefix, user
-        )
-        return embeddings[0] if isinstance(text, str) else embeddings
-    elif engine == "azure_openai":
-        azure_api_version = kwargs.get("azure_api_version", "")
-        embeddings = generate_azure_openai_batch_embeddings(
+    if engine not in ["ollama", "openai", "azure_openai"]:
+        return None
+
+    try:
+        # Batches are sent concurrently over the shared connection pool
+        embeddings = EMBEDDING_CLIENT.embed_sync(
+            engine,
             model,
             text if isinstance(text, list) else [text],
-            url,
-            key,
-            azure_api_version,
-            prefix,
-            user,
+            batch_size=batch_size,
+            url=url,
+            key=key,
+            prefix=prefix,
+            user=user,
+            azure_api_version=kwargs.get("azure_api_version", ""),
         )
-        return embeddings[0] if isinstance(text, str) else embeddings
+    except Exception as e:
+        log.exception(f"Error generating {engine} embeddings: {e}")
+        return None
+
+    return embeddings[0] if isinstance(text, str) else embeddings
 
 
 import operator
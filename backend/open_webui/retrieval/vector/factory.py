@@ -1,6 +1,11 @@
 from open_webui.retrieval.vector.main import VectorDBBase
 from open_webui.retrieval.vector.type import VectorType
-from open_webui.config import VECTOR_DB, ENABLE_QDRANT_MULTITENANCY_MODE
+from open_webui.env import ENABLE_CHUNK_EMBEDDING_STORE
+from open_webui.config import (
+    VECTOR_DB,
+    ENABLE_QDRANT_MULTITENANCY_MODE,
+    ENABLE_RAG_BM25_INDEX,
+)
 
 
 class Vector:
@@ -53,3 +58,18 @@ class Vector:
 
 
 VECTOR_DB_CLIENT = Vector.get_vector(VECTOR_DB)
+
+if ENABLE_RAG_BM25_INDEX:
+    from open_webui.retrieval.bm25 import BM25_INDEX, BM25IndexedVectorDB
+
+    VECTOR_DB_CLIENT = BM25IndexedVectorDB(VECTOR_DB_CLIENT, BM25_INDEX)
+
+if ENABLE_CHUNK_EMBEDDING_STORE:
+    from open_webui.retrieval.embedding_cache import (
+        CHUNK_EMBEDDING_STORE,
+        ChunkEmbeddingRefVectorDB,
+    )
+
+    VECTOR_DB_CLIENT = ChunkEmbeddingRefVectorDB(
+        VECTOR_DB_CLIENT, CHUNK_EMBEDDING_STORE
+    )
@@ -1,7 +1,6 @@
-import time
 from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
@@ -22,17 +21,18 @@ from open_webui.models.classroom import (
 )
 from open_webui.models.users import Users
 from open_webui.models.files import Files
-from open_webui.retrieval.loaders.main import Loader
-from open_webui.routers.retrieval import save_docs_to_vector_db
-from open_webui.utils.misc import calculate_sha256_string
 from open_webui.constants import ERROR_MESSAGES
-from langchain_core.documents import Document
+from open_webui.utils.classroom_ingestion import (
+    MATERIAL_INGESTION_QUEUE,
+    attach_files_to_knowledge,
+    course_collection_name,
+)
 from open_webui.utils.feature_flags import is_classroom_enabled
 from open_webui.models.knowledge import Knowledges, KnowledgeForm
 from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
 from open_webui.models.classroom import Course as CourseORM, CoursePreset as CoursePresetORM, Material as MaterialORM, Assignment as AssignmentORM, Submission as SubmissionORM
 from open_webui.internal.db import get_db
-from open_webui.routers.retrieval import process_file, ProcessFileForm
+from open_webui.routers.retrieval import BatchProcessFilesResponse
 from open_webui.models.models import Models, ModelForm, ModelMeta, ModelParams
 from open_webui.utils.models import get_all_models
 from open_webui.utils.models import get_all_models
@@ -98,6 +98,8 @@ class Course(BaseModel):
     meta_json: Optional[dict] = None
 
 
+class CourseCreateResponse(Course):
+    files: Optional[BatchProcessFilesResponse] = None
 
 
 class PresetUpsert(BaseModel):
@@ -198,31 +200,33 @@ class ChatProxyRequest(BaseModel):
 
 
 @router.get("/courses", response_model=List[Course])
-def list_courses(user=Depends(get_verified_user)):
+def list_courses(
+    term: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user=Depends(get_verified_user),
+):
+    """
+    List the courses visible to the user, newest first. With `limit` set, pass
+    the id of the last course of a page as `cursor` to get the next page.
+    """
     include_admin = getattr(user, "role", None) == "admin"
-    try:
-        rows = Courses.list_for_user(user.id, include_admin=include_admin)     
-        # Debug: also try getting ALL courses directly to see if any exist
-        with get_db() as db:
-            all_courses = db.query(CourseORM).all()
-        return [
-            Course(
-                id=r.id,
-                title=r.title,
-                description=r.description,
-                status=r.status,
-                created_by=r.created_by,
-                created_at=r.created_at,
-                updated_at=r.updated_at,
-                meta_json=getattr(r, "meta_json", None),
-            )
-            for r in rows
-        ]
-    except Exception as e:
-        print(f"[list_courses] Error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    rows = Courses.list_for_user(
+        user.id, include_admin=include_admin, term=term, limit=limit, cursor=cursor
+    )
+    return [
+        Course(
+            id=r.id,
+            title=r.title,
+            description=r.description,
+            status=r.status,
+            created_by=r.created_by,
+            created_at=r.created_at,
+            updated_at=r.updated_at,
+            meta_json=r.meta_json,
+        )
+        for r in rows
+    ]
 
 
 def _validate_youtube_urls(urls: Optional[List[str]]) -> Tuple[bool, Optional[str]]:
@@ -240,7 +244,7 @@ def _validate_youtube_urls(urls: Optional[List[str]]) -> Tuple[bool, Optional[st
     return True, None
 
 
-@router.post("/courses", response_model=Course)
+@router.post("/courses", response_model=CourseCreateResponse)
 async def create_course(request: Request, form: CourseCreate, user=Depends(get_verified_user)):
     # Only admins/teachers can create. Reuse permission gate: admins ok; otherwise require classroom teacher capability later
     if getattr(user, "role", None) not in {"admin", "teacher"}:
@@ -253,6 +257,9 @@ async def create_course(request: Request, form: CourseCreate, user=Depends(get_v
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT(err or "invalid YouTube link"))
     if not form.doc_file_ids or len(form.doc_file_ids) < 1:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT("at least one document is required"))
+    for fid in form.doc_file_ids:
+        if not Files.get_file_by_id(fid):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT(f"invalid file id: {fid}"))
 
     # Validate model exists (check both Models table and available base models)
     available_models = await get_all_models(request, user=user)
@@ -300,22 +307,11 @@ async def create_course(request: Request, form: CourseCreate, user=Depends(get_v
     if not kb:
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=ERROR_MESSAGES.DEFAULT("failed to create knowledge base"))
 
-    # Attach each file id via existing pipeline
-    for fid in form.doc_file_ids:
-        # Validate file exists
-        f = Files.get_file_by_id(fid)
-        if not f:
-            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT(f"invalid file id: {fid}"))
-        # Use existing processing pipeline to index into KB collection
-        try:
-            process_file(request, ProcessFileForm(file_id=fid, collection_name=kb.id), user=user)
-        except Exception as e:
-            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT(str(e)))
-        # Update KB data with file id
-        data = kb.data or {}
-        file_ids = set(data.get("file_ids", []))
-        file_ids.add(fid)
-        kb = Knowledges.update_knowledge_data_by_id(kb.id, {**data, "file_ids": list(file_ids)}) or kb
+    # Index the files into the KB collection in parallel, then record them on the KB at once
+    kb, files_result = await attach_files_to_knowledge(request, kb, form.doc_file_ids, user)
+    if not files_result.results:
+        errors = "; ".join(f"{r.file_id}: {r.error}" for r in files_result.errors)
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT(errors))
 
     # Create a model clone for the course using safe pipeline with knowledge assignment
     course_model_id = f"course/{course_row.id}"
@@ -377,7 +373,7 @@ async def create_course(request: Request, form: CourseCreate, user=Depends(get_v
     print(f"[CourseCreate] Created preset linking model {course_model_id} to knowledge {kb.id}")
 
     # Return course payload
-    return Course(
+    return CourseCreateResponse(
         id=course_row.id,
         title=course_row.title,
         description=course_row.description,
@@ -386,6 +382,7 @@ async def create_course(request: Request, form: CourseCreate, user=Depends(get_v
         created_at=course_row.created_at,
     updated_at=course_row.updated_at,
     meta_json=getattr(course_row, "meta_json", None),
+        files=files_result,
     )
 
 
@@ -754,8 +751,7 @@ def set_course_preset_default(course_id: str, user=Depends(get_verified_user), _
 
 # Materials
 def _course_collection_name(course_id: str) -> str:
-    # Keep short, vector dbs like Chroma may limit to 63 chars
-    return f"course-{course_id}"[:63]
+    return course_collection_name(course_id)
 
 
 @router.get("/courses/{course_id}/materials", response_model=List[Material])
@@ -775,166 +771,94 @@ def list_materials(course_id: str, user=Depends(get_verified_user)):
     ]
 
 
+def _material_response(row: MaterialModel) -> Material:
+    return Material(
+        id=row.id,
+        course_id=row.course_id,
+        kind=row.kind,
+        title=row.title,
+        uri_or_blob_id=row.uri_or_blob_id,
+        meta_json=row.meta_json,
+        created_at=row.created_at,
+    )
+
+
+def _get_ingestable_material(course_id: str, material_id: str) -> MaterialModel:
+    row = Materials.get_by_id(material_id)
+    if not row or row.course_id != course_id:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail=ERROR_MESSAGES.NOT_FOUND)
+    if row.kind.lower() != "doc" or not row.uri_or_blob_id:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT("material has no document to ingest"))
+    return row
+
+
 @router.post("/courses/{course_id}/materials", response_model=Material)
-def create_material(
+async def create_material(
     request: Request,
     course_id: str,
     form: MaterialCreate,
     user=Depends(get_verified_user),
     _=Depends(requireCourseTeacher),
 ):
-    # Create the DB row first with ingestion status (queued if doc with file)
-    meta = form.meta_json or {}
-    if form.kind.lower() == "doc" and form.uri_or_blob_id:
-        meta = {
-            **meta,
-            "ingestion": {
-                "status": "queued",
-                "started_at": int(time.time()),
-            },
-        }
+    ingest = form.kind.lower() == "doc" and form.uri_or_blob_id
+    if ingest and not Files.get_file_by_id(form.uri_or_blob_id):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid file id")
 
     row = Materials.insert(
         course_id=course_id,
         kind=form.kind,
         title=form.title,
         uri_or_blob_id=form.uri_or_blob_id,
-        meta_json=meta,
+        meta_json=form.meta_json or {},
     )
 
-    # If it's a doc backed by an uploaded file, index it into per-course collection
-    if row and form.kind.lower() == "doc" and form.uri_or_blob_id:
-        try:
-            file = Files.get_file_by_id(form.uri_or_blob_id)
-            if not file:
-                raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid file id")
-
-            # Build docs from file (uploaded docs only). No web/youtube ingestion here.
-            if file.path:
-                file_path = file.path
-                from open_webui.storage.provider import Storage
-
-                file_path = Storage.get_file(file_path)
-                loader = Loader(
-                    engine=request.app.state.config.CONTENT_EXTRACTION_ENGINE,
-                    DATALAB_MARKER_API_KEY=request.app.state.config.DATALAB_MARKER_API_KEY,
-                    DATALAB_MARKER_LANGS=request.app.state.config.DATALAB_MARKER_LANGS,
-                    DATALAB_MARKER_SKIP_CACHE=request.app.state.config.DATALAB_MARKER_SKIP_CACHE,
-                    DATALAB_MARKER_FORCE_OCR=request.app.state.config.DATALAB_MARKER_FORCE_OCR,
-                    DATALAB_MARKER_PAGINATE=request.app.state.config.DATALAB_MARKER_PAGINATE,
-                    DATALAB_MARKER_STRIP_EXISTING_OCR=request.app.state.config.DATALAB_MARKER_STRIP_EXISTING_OCR,
-                    DATALAB_MARKER_DISABLE_IMAGE_EXTRACTION=request.app.state.config.DATALAB_MARKER_DISABLE_IMAGE_EXTRACTION,
-                    DATALAB_MARKER_USE_LLM=request.app.state.config.DATALAB_MARKER_USE_LLM,
-                    DATALAB_MARKER_OUTPUT_FORMAT=request.app.state.config.DATALAB_MARKER_OUTPUT_FORMAT,
-                    EXTERNAL_DOCUMENT_LOADER_URL=request.app.state.config.EXTERNAL_DOCUMENT_LOADER_URL,
-                    EXTERNAL_DOCUMENT_LOADER_API_KEY=request.app.state.config.EXTERNAL_DOCUMENT_LOADER_API_KEY,
-                    TIKA_SERVER_URL=request.app.state.config.TIKA_SERVER_URL,
-                    DOCLING_SERVER_URL=request.app.state.config.DOCLING_SERVER_URL,
-                    DOCLING_PARAMS={
-                        "ocr_engine": request.app.state.config.DOCLING_OCR_ENGINE,
-                        "ocr_lang": request.app.state.config.DOCLING_OCR_LANG,
-                        "do_picture_description": request.app.state.config.DOCLING_DO_PICTURE_DESCRIPTION,
-                        "picture_description_mode": request.app.state.config.DOCLING_PICTURE_DESCRIPTION_MODE,
-                        "picture_description_local": request.app.state.config.DOCLING_PICTURE_DESCRIPTION_LOCAL,
-                        "picture_description_api": request.app.state.config.DOCLING_PICTURE_DESCRIPTION_API,
-                    },
-                    PDF_EXTRACT_IMAGES=request.app.state.config.PDF_EXTRACT_IMAGES,
-                    DOCUMENT_INTELLIGENCE_ENDPOINT=request.app.state.config.DOCUMENT_INTELLIGENCE_ENDPOINT,
-                    DOCUMENT_INTELLIGENCE_KEY=request.app.state.config.DOCUMENT_INTELLIGENCE_KEY,
-                    MISTRAL_OCR_API_KEY=request.app.state.config.MISTRAL_OCR_API_KEY,
-                )
-                content_type = (file.meta or {}).get("content_type") or "application/octet-stream"
-                docs = loader.load(file.filename, content_type, file_path)
-                docs = [
-                    Document(
-                        page_content=doc.page_content,
-                        metadata={
-                            **doc.metadata,
-                            "name": file.filename,
-                            "created_by": file.user_id,
-                            "file_id": file.id,
-                            "source": file.filename,
-                            "course_id": course_id,
-                            "material_id": row.id,
-                        },
-                    )
-                    for doc in docs
-                ]
-            else:
-                text = (file.data or {}).get("content", "")
-                docs = [
-                    Document(
-                        page_content=text,
-                        metadata={
-                            **(file.meta or {}),
-                            "name": file.filename,
-                            "created_by": file.user_id,
-                            "file_id": file.id,
-                            "source": file.filename,
-                            "course_id": course_id,
-                            "material_id": row.id,
-                        },
-                    )
-                ]
-
-            text_content = " ".join([d.page_content for d in docs])
-            file_hash = calculate_sha256_string(text_content)
-            Files.update_file_hash_by_id(file.id, file_hash)
-            Files.update_file_data_by_id(file.id, {"content": text_content})
-
-            collection_name = _course_collection_name(course_id)
-            save_docs_to_vector_db(
-                request,
-                docs=docs,
-                collection_name=collection_name,
-                metadata={
-                    "file_id": file.id,
-                    "name": file.filename,
-                    "hash": file_hash,
-                    "course_id": course_id,
-                    "material_id": row.id,
-                },
-                add=True,
-                user=user,
-            )
-
-            # Mark ingestion done
-            Materials.update_meta(
-                row.id,
-                {
-                    "ingestion": {
-                        "status": "done",
-                        "started_at": (meta.get("ingestion", {}) or {}).get("started_at", int(time.time())),
-                        "completed_at": int(time.time()),
-                        "collection": collection_name,
-                    }
-                },
-            )
-        except Exception as e:
-            Materials.update_meta(
-                row.id,
-                {
-                    "ingestion": {
-                        "status": "error",
-                        "error": str(e),
-                        "completed_at": int(time.time()),
-                    }
-                },
-            )
-            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=ERROR_MESSAGES.DEFAULT(str(e)))
-
     if not row:
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=ERROR_MESSAGES.DEFAULT("material not created"))
 
-    return Material(
-        id=row.id,
-        course_id=row.course_id,
-        kind=row.kind,
-        title=row.title,
-        uri_or_blob_id=row.uri_or_blob_id,
-        meta_json=row.meta_json,
-        created_at=row.created_at,
-    )
+    # Docs backed by an uploaded file are indexed into the per-course collection
+    # in the background, progress is reported in meta_json.ingestion
+    if ingest:
+        await MATERIAL_INGESTION_QUEUE.enqueue(request, row, user)
+        row = Materials.get_by_id(row.id) or row
+
+    return _material_response(row)
+
+
+@router.post("/courses/{course_id}/materials/{material_id}/ingestion/retry", response_model=Material)
+async def retry_material_ingestion(
+    request: Request,
+    course_id: str,
+    material_id: str,
+    use_extraction_cache: bool = True,
+    user=Depends(get_verified_user),
+    _=Depends(requireCourseTeacher),
+):
+    row = _get_ingestable_material(course_id, material_id)
+    if await MATERIAL_INGESTION_QUEUE.is_active(request, material_id):
+        raise HTTPException(status.HTTP_409_CONFLICT, detail=ERROR_MESSAGES.DEFAULT("ingestion already in progress"))
+
+    # Drop chunks left over by a failed or cancelled attempt
+    try:
+        VECTOR_DB_CLIENT.delete(collection_name=_course_collection_name(course_id), filter={"material_id": material_id})
+    except Exception:
+        pass
+
+    # use_extraction_cache=false extracts the document again, e.g. after OCR
+    # results that were wrong
+    await MATERIAL_INGESTION_QUEUE.enqueue(request, row, user, use_extraction_cache=use_extraction_cache)
+    return _material_response(Materials.get_by_id(material_id) or row)
+
+
+@router.post("/courses/{course_id}/materials/{material_id}/ingestion/cancel")
+async def cancel_material_ingestion(
+    request: Request,
+    course_id: str,
+    material_id: str,
+    user=Depends(get_verified_user),
+    _=Depends(requireCourseTeacher),
+):
+    row = _get_ingestable_material(course_id, material_id)
+    return await MATERIAL_INGESTION_QUEUE.cancel(request, row, user)
 
 
 @router.delete("/courses/{course_id}/materials/{material_id}")
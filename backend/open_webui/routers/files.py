@@ -21,6 +21,10 @@ from fastapi import (
 from fastapi.responses import FileResponse, StreamingResponse
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.env import SRC_LOG_LEVELS
+from open_webui.retrieval.extraction_cache import (
+    EXTRACTION_CACHE,
+    delete_cached_extractions,
+)
 from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
 
 from open_webui.models.users import Users
@@ -135,7 +139,7 @@ def upload_file(
             "OpenWebUI-User-Name": user.name,
             "OpenWebUI-File-Id": id,
         }
-        contents, file_path = Storage.upload_file(file.file, filename, tags)
+        file_size, file_hash, file_path = Storage.upload_file(file.file, filename, tags)
 
         file_item = Files.insert_new_file(
             user.id,
@@ -147,7 +151,8 @@ def upload_file(
                     "meta": {
                         "name": name,
                         "content_type": file.content_type,
-                        "size": len(contents),
+                        "size": file_size,
+                        "sha256": file_hash,
                         "data": file_metadata,
                     },
                 }
@@ -288,6 +293,8 @@ async def delete_all_files(user=Depends(get_admin_user)):
         try:
             Storage.delete_all_files()
             VECTOR_DB_CLIENT.reset()
+            if EXTRACTION_CACHE is not None:
+                EXTRACTION_CACHE.clear()
         except Exception as e:
             log.exception(e)
             log.error("Error deleting files")
@@ -611,6 +618,7 @@ async def delete_file_by_id(id: str, user=Depends(get_verified_user)):
             try:
                 Storage.delete_file(file.path)
                 VECTOR_DB_CLIENT.delete(collection_name=f"file-{id}")
+                delete_cached_extractions((file.meta or {}).get("sha256"))
             except Exception as e:
                 log.exception(e)
                 log.error("Error deleting files")
@@ -10,6 +10,7 @@ from open_webui.models.knowledge import (
     KnowledgeUserResponse,
 )
 from open_webui.models.files import Files, FileModel, FileMetadataResponse
+from open_webui.retrieval.extraction_cache import delete_cached_extractions
 from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
 from open_webui.routers.retrieval import (
     process_file,
@@ -539,6 +540,7 @@ def remove_file_from_knowledge_by_id(
 
     # Delete file from database
     Files.delete_file_by_id(form_data.file_id)
+    delete_cached_extractions((file.meta or {}).get("sha256"))
 
     if knowledge:
         data = knowledge.data or {}
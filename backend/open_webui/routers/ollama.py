@@ -51,6 +51,7 @@ from open_webui.utils.payload import (
 )
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
+from open_webui.utils.http_pool import UPSTREAM_POOL
 
 
 from open_webui.config import (
@@ -81,7 +82,7 @@ log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+        async with UPSTREAM_POOL.session(timeout=timeout) as session:
             async with session.get(
                 url,
                 headers={
@@ -129,8 +130,8 @@ async def send_post_request(
 
     r = None
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
+        session = UPSTREAM_POOL.session(
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
         )
 
         r = await session.post(
@@ -241,8 +242,7 @@ async def verify_connection(
     url = form_data.url
     key = form_data.key
 
-    async with aiohttp.ClientSession(
-        trust_env=True,
+    async with UPSTREAM_POOL.session(
         timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST),
     ) as session:
         try:
@@ -1673,7 +1673,7 @@ async def download_file_stream(
 
     timeout = aiohttp.ClientTimeout(total=600)  # Set the timeout
 
-    async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+    async with UPSTREAM_POOL.session(timeout=timeout) as session:
         async with session.get(
             file_url, headers=headers, ssl=AIOHTTP_CLIENT_SESSION_SSL
         ) as response:
@@ -44,6 +44,7 @@ from open_webui.utils.misc import (
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
+from open_webui.utils.http_pool import UPSTREAM_POOL
 
 
 log = logging.getLogger(__name__)
@@ -60,7 +61,7 @@ log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+        async with UPSTREAM_POOL.session(timeout=timeout) as session:
             async with session.get(
                 url,
                 headers={
@@ -470,8 +471,7 @@ async def get_models(
         )
 
         r = None
-        async with aiohttp.ClientSession(
-            trust_env=True,
+        async with UPSTREAM_POOL.session(
             timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST),
         ) as session:
             try:
@@ -565,8 +565,7 @@ async def verify_connection(
 
     api_config = form_data.config or {}
 
-    async with aiohttp.ClientSession(
-        trust_env=True,
+    async with UPSTREAM_POOL.session(
         timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST),
     ) as session:
         try:
@@ -851,8 +850,8 @@ async def generate_chat_completion(
     response = None
 
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
+        session = UPSTREAM_POOL.session(
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
         )
 
         r = await session.request(
@@ -929,7 +928,7 @@ async def embeddings(request: Request, form_data: dict, user):
     session = None
     streaming = False
     try:
-        session = aiohttp.ClientSession(trust_env=True)
+        session = UPSTREAM_POOL.session()
         r = await session.request(
             method="POST",
             url=f"{url}/embeddings",
@@ -1033,7 +1032,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
             headers["Authorization"] = f"Bearer {key}"
             request_url = f"{url}/{path}"
 
-        session = aiohttp.ClientSession(trust_env=True)
+        session = UPSTREAM_POOL.session()
         r = await session.request(
             method=request.method,
             url=request_url,
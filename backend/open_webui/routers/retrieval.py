@@ -7,9 +7,10 @@ import asyncio
 
 
 import uuid
+from array import array
 from datetime import datetime
 from pathlib import Path
-from typing import Iterator, List, Optional, Sequence, Union
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
 
 from fastapi import (
     Depends,
@@ -68,7 +69,12 @@ from open_webui.retrieval.web.sougou import search_sougou
 from open_webui.retrieval.web.firecrawl import search_firecrawl
 from open_webui.retrieval.web.external import search_external
 
+from open_webui.retrieval.embedding_cache import (
+    CHUNK_EMBEDDING_STORE,
+    QUERY_EMBEDDING_CACHE,
+)
 from open_webui.retrieval.utils import (
+    get_bm25_index,
     get_embedding_function,
     get_reranking_function,
     get_model_path,
@@ -92,6 +98,7 @@ from open_webui.config import (
     DEFAULT_LOCALE,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_QUERY_PREFIX,
+    ENABLE_RAG_BM25_INDEX,
 )
 from open_webui.env import (
     SRC_LOG_LEVELS,
@@ -354,8 +361,13 @@ async def update_embedding_config(
                 if request.app.state.config.RAG_EMBEDDING_ENGINE == "azure_openai"
                 else None
             ),
+            cache=QUERY_EMBEDDING_CACHE,
         )
 
+        # Cached query embeddings belong to the previous embedding configuration
+        if QUERY_EMBEDDING_CACHE is not None:
+            QUERY_EMBEDDING_CACHE.clear()
+
         return {
             "status": True,
             "embedding_engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
@@ -1108,6 +1120,169 @@ async def update_rag_config(
 ####################################
 
 
+def split_docs(request: Request, docs: list[Document]) -> list[Document]:
+    """Split documents into chunks with the configured text splitter."""
+    if request.app.state.config.TEXT_SPLITTER in ["", "character"]:
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=request.app.state.config.CHUNK_SIZE,
+            chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
+            add_start_index=True,
+        )
+        docs = text_splitter.split_documents(docs)
+    elif request.app.state.config.TEXT_SPLITTER == "token":
+        log.info(
+            f"Using token text splitter: {request.app.state.config.TIKTOKEN_ENCODING_NAME}"
+        )
+
+        tiktoken.get_encoding(str(request.app.state.config.TIKTOKEN_ENCODING_NAME))
+        text_splitter = TokenTextSplitter(
+            encoding_name=str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
+            chunk_size=request.app.state.config.CHUNK_SIZE,
+            chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
+            add_start_index=True,
+        )
+        docs = text_splitter.split_documents(docs)
+    elif request.app.state.config.TEXT_SPLITTER == "markdown_header":
+        log.info("Using markdown header text splitter")
+
+        # Define headers to split on - covering most common markdown header levels
+        headers_to_split_on = [
+            ("#", "Header 1"),
+            ("##", "Header 2"),
+            ("###", "Header 3"),
+            ("####", "Header 4"),
+            ("#####", "Header 5"),
+            ("######", "Header 6"),
+        ]
+
+        markdown_splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=headers_to_split_on,
+            strip_headers=False,  # Keep headers in content for context
+        )
+
+        md_split_docs = []
+        for doc in docs:
+            md_header_splits = markdown_splitter.split_text(doc.page_content)
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=request.app.state.config.CHUNK_SIZE,
+                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
+                add_start_index=True,
+            )
+            md_header_splits = text_splitter.split_documents(md_header_splits)
+
+            # Convert back to Document objects, preserving original metadata
+            for split_chunk in md_header_splits:
+                headings_list = []
+                # Extract header values in order based on headers_to_split_on
+                for _, header_meta_key_name in headers_to_split_on:
+                    if header_meta_key_name in split_chunk.metadata:
+                        headings_list.append(split_chunk.metadata[header_meta_key_name])
+
+                md_split_docs.append(
+                    Document(
+                        page_content=split_chunk.page_content,
+                        metadata={**doc.metadata, "headings": headings_list},
+                    )
+                )
+
+        docs = md_split_docs
+    else:
+        raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
+
+    return docs
+
+
+def get_chunk_metadatas(
+    request: Request, docs: list[Document], metadata: Optional[dict] = None
+) -> list[dict]:
+    metadatas = [
+        {
+            **doc.metadata,
+            **(metadata if metadata else {}),
+            "embedding_config": json.dumps(
+                {
+                    "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
+                    "model": request.app.state.config.RAG_EMBEDDING_MODEL,
+                }
+            ),
+        }
+        for doc in docs
+    ]
+
+    # ChromaDB does not like datetime formats
+    # for meta-data so convert them to string.
+    for metadata in metadatas:
+        for key, value in metadata.items():
+            if (
+                isinstance(value, datetime)
+                or isinstance(value, list)
+                or isinstance(value, dict)
+            ):
+                metadata[key] = str(value)
+
+    return metadatas
+
+
+def get_docs_embedding_function(request: Request):
+    return get_embedding_function(
+        request.app.state.config.RAG_EMBEDDING_ENGINE,
+        request.app.state.config.RAG_EMBEDDING_MODEL,
+        request.app.state.ef,
+        (
+            request.app.state.config.RAG_OPENAI_API_BASE_URL
+            if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+            else (
+                request.app.state.config.RAG_OLLAMA_BASE_URL
+                if request.app.state.config.RAG_EMBEDDING_ENGINE == "ollama"
+                else request.app.state.config.RAG_AZURE_OPENAI_BASE_URL
+            )
+        ),
+        (
+            request.app.state.config.RAG_OPENAI_API_KEY
+            if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+            else (
+                request.app.state.config.RAG_OLLAMA_API_KEY
+                if request.app.state.config.RAG_EMBEDDING_ENGINE == "ollama"
+                else request.app.state.config.RAG_AZURE_OPENAI_API_KEY
+            )
+        ),
+        request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
+        azure_api_version=(
+            request.app.state.config.RAG_AZURE_OPENAI_API_VERSION
+            if request.app.state.config.RAG_EMBEDDING_ENGINE == "azure_openai"
+            else None
+        ),
+    )
+
+
+def embed_chunks(
+    request: Request, collection_name: str, texts: list[str], embedding_function, user
+) -> tuple[list, Optional[list[str]]]:
+    """Return the embeddings of chunks, and their hashes in the chunk embedding store."""
+    if CHUNK_EMBEDDING_STORE is not None:
+        # Chunks already embedded with this model, in any collection, are reused
+        embeddings, hashes, report = CHUNK_EMBEDDING_STORE.embed(
+            request.app.state.config.RAG_EMBEDDING_ENGINE,
+            request.app.state.config.RAG_EMBEDDING_MODEL,
+            list(map(lambda x: x.replace("\n", " "), texts)),
+            embedding_function,
+            prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+            user=user,
+            batch_size=request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
+        )
+        log.info(
+            f"collection {collection_name}: reused {report['reused']} of {report['chunks']} chunk embeddings, {report['calls_saved']} embedding calls saved"
+        )
+        return embeddings, hashes
+
+    embeddings = embedding_function(
+        list(map(lambda x: x.replace("\n", " "), texts)),
+        prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+        user=user,
+    )
+    return embeddings, None
+
+
 def save_docs_to_vector_db(
     request: Request,
     docs,
@@ -1152,103 +1327,13 @@ def save_docs_to_vector_db(
                 raise ValueError(ERROR_MESSAGES.DUPLICATE_CONTENT)
 
     if split:
-        if request.app.state.config.TEXT_SPLITTER in ["", "character"]:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=request.app.state.config.CHUNK_SIZE,
-                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                add_start_index=True,
-            )
-            docs = text_splitter.split_documents(docs)
-        elif request.app.state.config.TEXT_SPLITTER == "token":
-            log.info(
-                f"Using token text splitter: {request.app.state.config.TIKTOKEN_ENCODING_NAME}"
-            )
-
-            tiktoken.get_encoding(str(request.app.state.config.TIKTOKEN_ENCODING_NAME))
-            text_splitter = TokenTextSplitter(
-                encoding_name=str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
-                chunk_size=request.app.state.config.CHUNK_SIZE,
-                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                add_start_index=True,
-            )
-            docs = text_splitter.split_documents(docs)
-        elif request.app.state.config.TEXT_SPLITTER == "markdown_header":
-            log.info("Using markdown header text splitter")
-
-            # Define headers to split on - covering most common markdown header levels
-            headers_to_split_on = [
-                ("#", "Header 1"),
-                ("##", "Header 2"),
-                ("###", "Header 3"),
-                ("####", "Header 4"),
-                ("#####", "Header 5"),
-                ("######", "Header 6"),
-            ]
-
-            markdown_splitter = MarkdownHeaderTextSplitter(
-                headers_to_split_on=headers_to_split_on,
-                strip_headers=False,  # Keep headers in content for context
-            )
-
-            md_split_docs = []
-            for doc in docs:
-                md_header_splits = markdown_splitter.split_text(doc.page_content)
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=request.app.state.config.CHUNK_SIZE,
-                    chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                    add_start_index=True,
-                )
-                md_header_splits = text_splitter.split_documents(md_header_splits)
-
-                # Convert back to Document objects, preserving original metadata
-                for split_chunk in md_header_splits:
-                    headings_list = []
-                    # Extract header values in order based on headers_to_split_on
-                    for _, header_meta_key_name in headers_to_split_on:
-                        if header_meta_key_name in split_chunk.metadata:
-                            headings_list.append(
-                                split_chunk.metadata[header_meta_key_name]
-                            )
-
-                    md_split_docs.append(
-                        Document(
-                            page_content=split_chunk.page_content,
-                            metadata={**doc.metadata, "headings": headings_list},
-                        )
-                    )
-
-            docs = md_split_docs
-        else:
-            raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
+        docs = split_docs(request, docs)
 
     if len(docs) == 0:
         raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
 
     texts = [doc.page_content for doc in docs]
-    metadatas = [
-        {
-            **doc.metadata,
-            **(metadata if metadata else {}),
-            "embedding_config": json.dumps(
-                {
-                    "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
-                    "model": request.app.state.config.RAG_EMBEDDING_MODEL,
-                }
-            ),
-        }
-        for doc in docs
-    ]
-
-    # ChromaDB does not like datetime formats
-    # for meta-data so convert them to string.
-    for metadata in metadatas:
-        for key, value in metadata.items():
-            if (
-                isinstance(value, datetime)
-                or isinstance(value, list)
-                or isinstance(value, dict)
-            ):
-                metadata[key] = str(value)
+    metadatas = get_chunk_metadatas(request, docs, metadata)
 
     try:
         if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
@@ -1264,40 +1349,9 @@ def save_docs_to_vector_db(
                 return True
 
         log.info(f"adding to collection {collection_name}")
-        embedding_function = get_embedding_function(
-            request.app.state.config.RAG_EMBEDDING_ENGINE,
-            request.app.state.config.RAG_EMBEDDING_MODEL,
-            request.app.state.ef,
-            (
-                request.app.state.config.RAG_OPENAI_API_BASE_URL
-                if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
-                else (
-                    request.app.state.config.RAG_OLLAMA_BASE_URL
-                    if request.app.state.config.RAG_EMBEDDING_ENGINE == "ollama"
-                    else request.app.state.config.RAG_AZURE_OPENAI_BASE_URL
-                )
-            ),
-            (
-                request.app.state.config.RAG_OPENAI_API_KEY
-                if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
-                else (
-                    request.app.state.config.RAG_OLLAMA_API_KEY
-                    if request.app.state.config.RAG_EMBEDDING_ENGINE == "ollama"
-                    else request.app.state.config.RAG_AZURE_OPENAI_API_KEY
-                )
-            ),
-            request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
-            azure_api_version=(
-                request.app.state.config.RAG_AZURE_OPENAI_API_VERSION
-                if request.app.state.config.RAG_EMBEDDING_ENGINE == "azure_openai"
-                else None
-            ),
-        )
-
-        embeddings = embedding_function(
-            list(map(lambda x: x.replace("\n", " "), texts)),
-            prefix=RAG_EMBEDDING_CONTENT_PREFIX,
-            user=user,
+        embedding_function = get_docs_embedding_function(request)
+        embeddings, hashes = embed_chunks(
+            request, collection_name, texts, embedding_function, user
         )
 
         items = [
@@ -1315,17 +1369,160 @@ def save_docs_to_vector_db(
             items=items,
         )
 
+        if CHUNK_EMBEDDING_STORE is not None:
+            CHUNK_EMBEDDING_STORE.add_refs(
+                collection_name,
+                items,
+                request.app.state.config.RAG_EMBEDDING_ENGINE,
+                request.app.state.config.RAG_EMBEDDING_MODEL,
+                hashes,
+            )
+
         return True
     except Exception as e:
         log.exception(e)
         raise e
 
 
+# Chunks of a streamed document that are embedded at a time
+STREAM_EMBEDDING_CHUNKS = 128
+# Chunks a streamed document must reach before any is embedded, smaller ones are
+# checked for duplicate content first
+STREAM_EMBEDDING_MIN_CHUNKS = 512
+# Chunks of a streamed document that are written to the vector DB at a time
+STREAM_INSERT_BATCH_SIZE = 1000
+
+
+def save_docs_stream_to_vector_db(
+    request: Request,
+    docs: Iterable[Document],
+    collection_name: str,
+    metadata: Optional[dict] = None,
+    add: bool = False,
+    user=None,
+) -> str:
+    """
+    Like `save_docs_to_vector_db`, for documents yielded while the file is still
+    being extracted, e.g. the pages of a PDF from `Loader.lazy_load`.
+
+    Every document is split as it arrives. The content hash that is checked for
+    duplicates and stored with the chunks is only known once every document has
+    arrived, so chunks are kept until then and inserted at the end.
+
+    Documents of fewer than STREAM_EMBEDDING_MIN_CHUNKS chunks are only embedded
+    after the duplicate check, like with `save_docs_to_vector_db`. Past that,
+    chunks are embedded in batches of STREAM_EMBEDDING_CHUNKS while extraction
+    goes on, with their vectors packed into arrays: a large document is indexed
+    sooner, at the cost of a wasted embedding pass when it turns out to be a
+    duplicate.
+
+    Returns the text content of the documents, joined by spaces.
+    """
+    log.info(f"save_docs_stream_to_vector_db: {collection_name}")
+
+    # Like save_docs_to_vector_db, an existing collection is only added to with add
+    exists = VECTOR_DB_CLIENT.has_collection(collection_name=collection_name)
+    embed = add or not exists
+    embedding_function = get_docs_embedding_function(request) if embed else None
+
+    contents = []
+    chunk_count = 0
+    pending = []
+    items = []
+    hashes = []
+
+    def embed_pending():
+        embeddings, chunk_hashes = embed_chunks(
+            request,
+            collection_name,
+            [text for text, _ in pending],
+            embedding_function,
+            user,
+        )
+        for (text, chunk_metadata), embedding in zip(pending, embeddings):
+            items.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "text": text,
+                    "vector": array("d", embedding),
+                    "metadata": chunk_metadata,
+                }
+            )
+        if chunk_hashes is not None:
+            hashes.extend(chunk_hashes)
+        pending.clear()
+
+    for doc in docs:
+        contents.append(doc.page_content)
+        chunks = split_docs(request, [doc])
+        chunk_count += len(chunks)
+        if embed:
+            pending.extend(
+                zip(
+                    [chunk.page_content for chunk in chunks],
+                    get_chunk_metadatas(request, chunks, metadata),
+                )
+            )
+            if (
+                chunk_count >= STREAM_EMBEDDING_MIN_CHUNKS
+                and len(pending) >= STREAM_EMBEDDING_CHUNKS
+            ):
+                embed_pending()
+
+    text_content = " ".join(contents)
+    hash = calculate_sha256_string(text_content)
+
+    result = VECTOR_DB_CLIENT.query(
+        collection_name=collection_name, filter={"hash": hash}
+    )
+    if result is not None and result.ids[0]:
+        log.info(f"Document with hash {hash} already exists")
+        raise ValueError(ERROR_MESSAGES.DUPLICATE_CONTENT)
+
+    if chunk_count == 0:
+        raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+
+    if not embed:
+        log.info(
+            f"collection {collection_name} already exists, overwrite is False and add is False"
+        )
+        return text_content
+
+    if pending:
+        embed_pending()
+
+    log.info(f"adding to collection {collection_name}")
+    for item in items:
+        item["metadata"]["hash"] = hash
+
+    for idx in range(0, len(items), STREAM_INSERT_BATCH_SIZE):
+        VECTOR_DB_CLIENT.insert(
+            collection_name=collection_name,
+            items=[
+                {**item, "vector": item["vector"].tolist()}
+                for item in items[idx : idx + STREAM_INSERT_BATCH_SIZE]
+            ],
+        )
+
+    if CHUNK_EMBEDDING_STORE is not None:
+        CHUNK_EMBEDDING_STORE.add_refs(
+            collection_name,
+            items,
+            request.app.state.config.RAG_EMBEDDING_ENGINE,
+            request.app.state.config.RAG_EMBEDDING_MODEL,
+            hashes,
+        )
+
+    return text_content
+
+
 class ProcessFileForm(BaseModel):
     file_id: str
     content: Optional[str] = None
     collection_name: Optional[str] = None
     course_id: Optional[str] = None
+    # Set to False to extract the file again instead of reusing cached documents
+    use_extraction_cache: bool = True
 
 
 @router.post("/process/file")
@@ -1342,6 +1539,9 @@ def process_file(
         if collection_name is None:
             collection_name = f"file-{file.id}"
 
+        # Documents extracted by a loader report whether they came from the cache
+        extraction = None
+
         # Classroom mode: allow routing into per-course index
         try:
             from open_webui.env import CLASSROOM_MODE
@@ -1440,11 +1640,14 @@ def process_file(
                     DOCUMENT_INTELLIGENCE_KEY=request.app.state.config.DOCUMENT_INTELLIGENCE_KEY,
                     MISTRAL_OCR_API_KEY=request.app.state.config.MISTRAL_OCR_API_KEY,
                 )
-                docs = loader.load(
-                    file.filename, file.meta.get("content_type"), file_path
+                docs = loader.lazy_load(
+                    file.filename,
+                    file.meta.get("content_type"),
+                    file_path,
+                    use_cache=form_data.use_extraction_cache,
                 )
 
-                docs = [
+                docs = (
                     Document(
                         page_content=doc.page_content,
                         metadata={
@@ -1456,7 +1659,45 @@ def process_file(
                         },
                     )
                     for doc in docs
-                ]
+                )
+
+                if (
+                    loader.streamed
+                    and not request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL
+                ):
+                    # Pages are split and embedded while the rest of the file is
+                    # still being extracted
+                    text_content = save_docs_stream_to_vector_db(
+                        request,
+                        docs=docs,
+                        collection_name=collection_name,
+                        metadata={
+                            "file_id": file.id,
+                            "name": file.filename,
+                            **({"course_id": form_data.course_id} if form_data.course_id else {}),
+                        },
+                        add=(True if (form_data.collection_name or form_data.course_id) else False),
+                        user=user,
+                    )
+
+                    Files.update_file_data_by_id(file.id, {"content": text_content})
+                    Files.update_file_hash_by_id(
+                        file.id, calculate_sha256_string(text_content)
+                    )
+                    Files.update_file_metadata_by_id(
+                        file.id, {"collection_name": collection_name}
+                    )
+
+                    return {
+                        "status": True,
+                        "collection_name": collection_name,
+                        "filename": file.filename,
+                        "content": text_content,
+                        "extraction": loader.extraction,
+                    }
+
+                docs = list(docs)
+                extraction = loader.extraction
             else:
                 docs = [
                     Document(
@@ -1510,6 +1751,7 @@ def process_file(
                         "collection_name": collection_name,
                         "filename": file.filename,
                         "content": text_content,
+                        "extraction": extraction,
                     }
             except Exception as e:
                 raise e
@@ -1519,6 +1761,7 @@ def process_file(
                 "collection_name": None,
                 "filename": file.filename,
                 "content": text_content,
+                "extraction": extraction,
             }
 
     except Exception as e:
@@ -2052,9 +2295,12 @@ def query_doc_handler(
     try:
         if request.app.state.config.ENABLE_RAG_HYBRID_SEARCH:
             collection_results = {}
-            collection_results[form_data.collection_name] = VECTOR_DB_CLIENT.get(
-                collection_name=form_data.collection_name
-            )
+            if ENABLE_RAG_BM25_INDEX and get_bm25_index(form_data.collection_name):
+                collection_results[form_data.collection_name] = None
+            else:
+                collection_results[form_data.collection_name] = VECTOR_DB_CLIENT.get(
+                    collection_name=form_data.collection_name
+                )
             return query_doc_with_hybrid_search(
                 collection_name=form_data.collection_name,
                 collection_result=collection_results[form_data.collection_name],
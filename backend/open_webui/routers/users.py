@@ -48,7 +48,7 @@ async def get_active_users(
     Get a list of active users.
     """
     return {
-        "user_ids": get_active_user_ids(),
+        "user_ids": await get_active_user_ids(),
     }
 
 
@@ -317,7 +317,7 @@ async def get_user_by_id(user_id: str, user=Depends(get_verified_user)):
             **{
                 "name": user.name,
                 "profile_image_url": user.profile_image_url,
-                "active": get_active_status_by_user_id(user_id),
+                "active": await get_active_status_by_user_id(user_id),
             }
         )
     else:
@@ -335,7 +335,7 @@ async def get_user_by_id(user_id: str, user=Depends(get_verified_user)):
 @router.get("/{user_id}/active", response_model=dict)
 async def get_user_active_status_by_id(user_id: str, user=Depends(get_verified_user)):
     return {
-        "active": get_user_active_status(user_id),
+        "active": await get_user_active_status(user_id),
     }
 
 
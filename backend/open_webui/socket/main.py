@@ -4,10 +4,8 @@ import random
 import socketio
 import logging
 import sys
-import time
 from typing import Dict, Set
 from redis import asyncio as aioredis
-import pycrdt as Y
 
 from open_webui.models.users import Users, UserNameResponse
 from open_webui.models.channels import Channels
@@ -19,15 +17,24 @@ from open_webui.utils.redis import (
 )
 
 from open_webui.env import (
+    CHAT_EVENT_BATCH_INTERVAL,
     ENABLE_WEBSOCKET_SUPPORT,
     WEBSOCKET_MANAGER,
     WEBSOCKET_REDIS_URL,
     WEBSOCKET_REDIS_LOCK_TIMEOUT,
     WEBSOCKET_SENTINEL_PORT,
     WEBSOCKET_SENTINEL_HOSTS,
+    YDOC_COMPACTION_BYTES,
+    YDOC_COMPACTION_UPDATES,
 )
 from open_webui.utils.auth import decode_token
-from open_webui.socket.utils import RedisDict, RedisLock, YdocManager
+from open_webui.socket.utils import (
+    AsyncRedisDict,
+    AsyncUsagePool,
+    AsyncUserPool,
+    RedisLock,
+    YdocManager,
+)
 from open_webui.tasks import create_task, stop_item_tasks
 from open_webui.utils.redis import get_redis_connection
 from open_webui.utils.access_control import has_access, get_users_with_access
@@ -91,21 +98,6 @@ if WEBSOCKET_MANAGER == "redis":
     redis_sentinels = get_sentinels_from_env(
         WEBSOCKET_SENTINEL_HOSTS, WEBSOCKET_SENTINEL_PORT
     )
-    SESSION_POOL = RedisDict(
-        "open-webui:session_pool",
-        redis_url=WEBSOCKET_REDIS_URL,
-        redis_sentinels=redis_sentinels,
-    )
-    USER_POOL = RedisDict(
-        "open-webui:user_pool",
-        redis_url=WEBSOCKET_REDIS_URL,
-        redis_sentinels=redis_sentinels,
-    )
-    USAGE_POOL = RedisDict(
-        "open-webui:usage_pool",
-        redis_url=WEBSOCKET_REDIS_URL,
-        redis_sentinels=redis_sentinels,
-    )
 
     clean_up_lock = RedisLock(
         redis_url=WEBSOCKET_REDIS_URL,
@@ -117,16 +109,51 @@ if WEBSOCKET_MANAGER == "redis":
     renew_func = clean_up_lock.renew_lock
     release_func = clean_up_lock.release_lock
 else:
-    SESSION_POOL = {}
-    USER_POOL = {}
-    USAGE_POOL = {}
 
-    aquire_func = release_func = renew_func = lambda: True
+    async def aquire_func():
+        return True
+
+    renew_func = release_func = aquire_func
+
+
+SESSION_POOL = AsyncRedisDict("open-webui:session_pool", redis=REDIS)
+USER_POOL = AsyncUserPool(
+    "open-webui:user_sessions",
+    redis=REDIS,
+    # Only used by the metrics exporter thread, never on the event loop
+    sync_redis=(
+        get_redis_connection(
+            redis_url=WEBSOCKET_REDIS_URL,
+            redis_sentinels=get_sentinels_from_env(
+                WEBSOCKET_SENTINEL_HOSTS, WEBSOCKET_SENTINEL_PORT
+            ),
+        )
+        if WEBSOCKET_MANAGER == "redis"
+        else None
+    ),
+)
+USAGE_POOL = AsyncUsagePool(
+    "open-webui:models_in_use", redis=REDIS, timeout=TIMEOUT_DURATION
+)
 
 
 YDOC_MANAGER = YdocManager(
     redis=REDIS,
+    binary_redis=(
+        get_redis_connection(
+            redis_url=WEBSOCKET_REDIS_URL,
+            redis_sentinels=get_sentinels_from_env(
+                WEBSOCKET_SENTINEL_HOSTS, WEBSOCKET_SENTINEL_PORT
+            ),
+            async_mode=True,
+            decode_responses=False,
+        )
+        if WEBSOCKET_MANAGER == "redis"
+        else None
+    ),
     redis_key_prefix="open-webui:ydoc:documents",
+    compaction_updates=YDOC_COMPACTION_UPDATES,
+    compaction_bytes=YDOC_COMPACTION_BYTES,
 )
 
 
@@ -136,7 +163,7 @@ async def periodic_usage_pool_cleanup():
         WEBSOCKET_REDIS_LOCK_TIMEOUT / 2, WEBSOCKET_REDIS_LOCK_TIMEOUT
     )
     for attempt in range(max_retries + 1):
-        if aquire_func():
+        if await aquire_func():
             break
         else:
             if attempt < max_retries:
@@ -153,33 +180,17 @@ async def periodic_usage_pool_cleanup():
     log.debug("Running periodic_cleanup")
     try:
         while True:
-            if not renew_func():
+            if not await renew_func():
                 log.error(f"Unable to renew cleanup lock. Exiting usage pool cleanup.")
                 raise Exception("Unable to renew usage pool cleanup lock.")
 
-            now = int(time.time())
-            send_usage = False
-            for model_id, connections in list(USAGE_POOL.items()):
-                # Creating a list of sids to remove if they have timed out
-                expired_sids = [
-                    sid
-                    for sid, details in connections.items()
-                    if now - details["updated_at"] > TIMEOUT_DURATION
-                ]
-
-                for sid in expired_sids:
-                    del connections[sid]
-
-                if not connections:
-                    log.debug(f"Cleaning up model {model_id} from usage pool")
-                    del USAGE_POOL[model_id]
-                else:
-                    USAGE_POOL[model_id] = connections
+            expired = await USAGE_POOL.cleanup()
+            if expired:
+                log.debug(f"Cleaned up {expired} models from usage pool")
 
-                send_usage = True
             await asyncio.sleep(TIMEOUT_DURATION)
     finally:
-        release_func()
+        await release_func()
 
 
 app = socketio.ASGIApp(
@@ -188,24 +199,29 @@ app = socketio.ASGIApp(
 )
 
 
-def get_models_in_use():
+async def get_models_in_use():
     # List models that are currently in use
-    models_in_use = list(USAGE_POOL.keys())
+    models_in_use = await USAGE_POOL.keys()
     return models_in_use
 
 
-def get_active_user_ids():
+async def get_active_user_ids():
     """Get the list of active user IDs."""
-    return list(USER_POOL.keys())
+    return await USER_POOL.keys()
 
 
-def get_user_active_status(user_id):
+def get_active_user_count():
+    """Get the number of active users without awaiting, e.g. from the metrics exporter."""
+    return USER_POOL.count()
+
+
+async def get_user_active_status(user_id):
     """Check if a user is currently active."""
-    return user_id in USER_POOL
+    return await USER_POOL.contains(user_id)
 
 
-def get_user_id_from_session_pool(sid):
-    user = SESSION_POOL.get(sid)
+async def get_user_id_from_session_pool(sid):
+    user = await SESSION_POOL.get(sid)
     if user:
         return user["id"]
     return None
@@ -220,33 +236,30 @@ def get_session_ids_from_room(room):
     return [session_id[0] for session_id in active_session_ids]
 
 
-def get_user_ids_from_room(room):
+async def get_user_ids_from_room(room):
     active_session_ids = get_session_ids_from_room(room)
 
     active_user_ids = list(
-        set([SESSION_POOL.get(session_id)["id"] for session_id in active_session_ids])
+        set(
+            [
+                user["id"]
+                for user in await SESSION_POOL.get_many(active_session_ids)
+                if user
+            ]
+        )
     )
     return active_user_ids
 
 
-def get_active_status_by_user_id(user_id):
-    if user_id in USER_POOL:
-        return True
-    return False
+async def get_active_status_by_user_id(user_id):
+    return await USER_POOL.contains(user_id)
 
 
 @sio.on("usage")
 async def usage(sid, data):
-    if sid in SESSION_POOL:
-        model_id = data["model"]
-        # Record the timestamp for the last update
-        current_time = int(time.time())
-
-        # Store the new usage data and task
-        USAGE_POOL[model_id] = {
-            **(USAGE_POOL[model_id] if model_id in USAGE_POOL else {}),
-            sid: {"updated_at": current_time},
-        }
+    if await SESSION_POOL.contains(sid):
+        # Record the model as in use until the usage report expires
+        await USAGE_POOL.touch(data["model"])
 
 
 @sio.event
@@ -256,14 +269,11 @@ async def connect(sid, environ, auth):
         data = decode_token(auth["token"])
 
         if data is not None and "id" in data:
-            user = Users.get_user_by_id(data["id"])
+            user = Users.get_cached_user_by_id(data["id"])
 
         if user:
-            SESSION_POOL[sid] = user.model_dump()
-            if user.id in USER_POOL:
-                USER_POOL[user.id] = USER_POOL[user.id] + [sid]
-            else:
-                USER_POOL[user.id] = [sid]
+            await SESSION_POOL.set(sid, user.model_dump())
+            await USER_POOL.add(user.id, sid)
 
 
 @sio.on("user-join")
@@ -277,15 +287,12 @@ async def user_join(sid, data):
     if data is None or "id" not in data:
         return
 
-    user = Users.get_user_by_id(data["id"])
+    user = Users.get_cached_user_by_id(data["id"])
     if not user:
         return
 
-    SESSION_POOL[sid] = user.model_dump()
-    if user.id in USER_POOL:
-        USER_POOL[user.id] = USER_POOL[user.id] + [sid]
-    else:
-        USER_POOL[user.id] = [sid]
+    await SESSION_POOL.set(sid, user.model_dump())
+    await USER_POOL.add(user.id, sid)
 
     # Join all the channels
     channels = Channels.get_channels_by_user_id(user.id)
@@ -369,7 +376,7 @@ async def channel_events(sid, data):
                 "channel_id": data["channel_id"],
                 "message_id": data.get("message_id", None),
                 "data": event_data,
-                "user": UserNameResponse(**SESSION_POOL[sid]).model_dump(),
+                "user": UserNameResponse(**(await SESSION_POOL.get(sid))).model_dump(),
             },
             room=room,
         )
@@ -378,7 +385,7 @@ async def channel_events(sid, data):
 @sio.on("ydoc:document:join")
 async def ydoc_document_join(sid, data):
     """Handle user joining a document"""
-    user = SESSION_POOL.get(sid)
+    user = await SESSION_POOL.get(sid)
 
     try:
         document_id = data["document_id"]
@@ -414,14 +421,8 @@ async def ydoc_document_join(sid, data):
 
         active_session_ids = get_session_ids_from_room(f"doc_{document_id}")
 
-        # Get the Yjs document state
-        ydoc = Y.Doc()
-        updates = await YDOC_MANAGER.get_updates(document_id)
-        for update in updates:
-            ydoc.apply_update(bytes(update))
-
         # Encode the entire document state as an update
-        state_update = ydoc.get_update()
+        state_update = await YDOC_MANAGER.get_state(document_id)
         await sio.emit(
             "ydoc:document:state",
             {
@@ -490,14 +491,8 @@ async def yjs_document_state(sid, data):
             log.warning(f"Document {document_id} not found")
             return
 
-        # Get the Yjs document state
-        ydoc = Y.Doc()
-        updates = await YDOC_MANAGER.get_updates(document_id)
-        for update in updates:
-            ydoc.apply_update(bytes(update))
-
         # Encode the entire document state as an update
-        state_update = ydoc.get_update()
+        state_update = await YDOC_MANAGER.get_state(document_id)
 
         await sio.emit(
             "ydoc:document:state",
@@ -548,7 +543,7 @@ async def yjs_document_update(sid, data):
         async def debounced_save():
             await asyncio.sleep(0.5)
             await document_save_handler(
-                document_id, data.get("data", {}), SESSION_POOL.get(sid)
+                document_id, data.get("data", {}), await SESSION_POOL.get(sid)
             )
 
         if data.get("data"):
@@ -581,7 +576,7 @@ async def yjs_document_leave(sid, data):
         )
 
         if (
-            YDOC_MANAGER.document_exists(document_id)
+            await YDOC_MANAGER.document_exists(document_id)
             and len(await YDOC_MANAGER.get_users(document_id)) == 0
         ):
             log.info(f"Cleaning up document {document_id} as no users are left")
@@ -613,15 +608,10 @@ async def yjs_awareness_update(sid, data):
 
 @sio.event
 async def disconnect(sid):
-    if sid in SESSION_POOL:
-        user = SESSION_POOL[sid]
-        del SESSION_POOL[sid]
-
-        user_id = user["id"]
-        USER_POOL[user_id] = [_sid for _sid in USER_POOL[user_id] if _sid != sid]
-
-        if len(USER_POOL[user_id]) == 0:
-            del USER_POOL[user_id]
+    user = await SESSION_POOL.get(sid)
+    if user:
+        await SESSION_POOL.delete(sid)
+        await USER_POOL.remove(user["id"], sid)
 
         await YDOC_MANAGER.remove_user_from_all_documents(sid)
     else:
@@ -629,20 +619,179 @@ async def disconnect(sid):
         # print(f"Unknown session ID {sid} disconnected")
 
 
-def get_event_emitter(request_info, update_db=True):
-    async def __event_emitter__(event_data):
-        user_id = request_info["user_id"]
-
-        session_ids = list(
-            set(
-                USER_POOL.get(user_id, [])
-                + (
-                    [request_info.get("session_id")]
-                    if request_info.get("session_id")
-                    else []
-                )
+async def get_session_ids_for_request(request_info):
+    return list(
+        set(
+            await USER_POOL.get(request_info["user_id"])
+            + (
+                [request_info.get("session_id")]
+                if request_info.get("session_id")
+                else []
+            )
+        )
+    )
+
+
+def update_db_for_events(request_info, events):
+    """
+    Apply the side effects of chat events to the message they belong to, reading
+    and writing the message content once however many events change it.
+    """
+    content = None
+    delta = ""
+    for event_data in events:
+        event_type = event_data.get("type")
+        if event_type == "status":
+            Chats.add_message_status_to_chat_by_id_and_message_id(
+                request_info["chat_id"],
+                request_info["message_id"],
+                event_data.get("data", {}),
             )
+        elif event_type == "message":
+            delta += event_data.get("data", {}).get("content", "")
+        elif event_type == "replace":
+            content = event_data.get("data", {}).get("content", "")
+            delta = ""
+
+    if content is None and delta:
+        message = Chats.get_message_by_id_and_message_id(
+            request_info["chat_id"],
+            request_info["message_id"],
         )
+        if message:
+            content = message.get("content", "")
+
+    if content is not None:
+        Chats.upsert_message_by_id_and_message_id(
+            request_info["chat_id"],
+            request_info["message_id"],
+            {
+                "content": content + delta,
+            },
+        )
+
+
+def coalesce_chat_events(events):
+    """
+    Merge runs of events the client would apply one after the other: message
+    deltas are concatenated, a replace absorbs the deltas that follow it and
+    only the last of consecutive content-only completion updates is kept.
+    """
+    coalesced = []
+    for event_data in events:
+        event_type = event_data.get("type")
+        data = event_data.get("data")
+        previous = coalesced[-1] if coalesced else None
+        previous_type = previous.get("type") if previous else None
+
+        if (
+            event_type in ("message", "chat:message:delta")
+            and previous_type
+            in ("message", "chat:message:delta", "replace", "chat:message")
+            and isinstance(data, dict)
+            and isinstance(previous.get("data"), dict)
+        ):
+            coalesced[-1] = {
+                **previous,
+                "data": {
+                    **previous["data"],
+                    "content": previous["data"].get("content", "")
+                    + data.get("content", ""),
+                },
+            }
+        elif (
+            event_type == "chat:completion"
+            and previous_type == "chat:completion"
+            and isinstance(data, dict)
+            and isinstance(previous.get("data"), dict)
+            and data.keys() == {"content"}
+            and previous["data"].keys() == {"content"}
+        ):
+            coalesced[-1] = event_data
+        else:
+            coalesced.append(event_data)
+    return coalesced
+
+
+class BatchedEventEmitter:
+    """
+    Event emitter for streamed responses. Events emitted within `interval`
+    seconds are coalesced and sent as one `chat-events:batch` frame per session,
+    and their database side effects are applied once per window. `flush` sends
+    the pending events right away, e.g. when the stream ends.
+    """
+
+    def __init__(
+        self, request_info, update_db=True, interval=CHAT_EVENT_BATCH_INTERVAL
+    ):
+        self.request_info = request_info
+        self.update_db = update_db
+        self.interval = interval
+
+        self._events = []
+        self._flush_task = None
+        # Keeps the frames of consecutive windows in order
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, event_data):
+        self._events.append(event_data)
+        if self.interval <= 0:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Nothing awaits this task, its errors would otherwise go unnoticed
+            log.exception(f"Failed to flush batched chat events: {e}")
+
+    async def flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        events, self._events = self._events, []
+        if not events:
+            return
+
+        async with self._lock:
+            frames = coalesce_chat_events(events)
+            if len(frames) == 1:
+                event, payload = "chat-events", {"data": frames[0]}
+            else:
+                event, payload = "chat-events:batch", {"events": frames}
+
+            await asyncio.gather(
+                *[
+                    sio.emit(
+                        event,
+                        {
+                            "chat_id": self.request_info.get("chat_id", None),
+                            "message_id": self.request_info.get("message_id", None),
+                            **payload,
+                        },
+                        to=session_id,
+                    )
+                    for session_id in await get_session_ids_for_request(
+                        self.request_info
+                    )
+                ]
+            )
+
+            if self.update_db:
+                update_db_for_events(self.request_info, events)
+
+
+def get_event_emitter(request_info, update_db=True, batch=False):
+    if batch:
+        return BatchedEventEmitter(request_info, update_db=update_db)
+
+    async def __event_emitter__(event_data):
+        session_ids = await get_session_ids_for_request(request_info)
 
         emit_tasks = [
             sio.emit(
@@ -660,41 +809,7 @@ def get_event_emitter(request_info, update_db=True):
         await asyncio.gather(*emit_tasks)
 
         if update_db:
-            if "type" in event_data and event_data["type"] == "status":
-                Chats.add_message_status_to_chat_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                    event_data.get("data", {}),
-                )
-
-            if "type" in event_data and event_data["type"] == "message":
-                message = Chats.get_message_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                )
-
-                if message:
-                    content = message.get("content", "")
-                    content += event_data.get("data", {}).get("content", "")
-
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
-                        request_info["chat_id"],
-                        request_info["message_id"],
-                        {
-                            "content": content,
-                        },
-                    )
-
-            if "type" in event_data and event_data["type"] == "replace":
-                content = event_data.get("data", {}).get("content", "")
-
-                Chats.upsert_message_to_chat_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                    {
-                        "content": content,
-                    },
-                )
+            update_db_for_events(request_info, [event_data])
 
     return __event_emitter__
 
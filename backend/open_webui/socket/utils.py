@@ -1,4 +1,5 @@
 import json
+import time
 import uuid
 from open_webui.utils.redis import get_redis_connection
 from typing import Optional, List, Tuple
@@ -12,126 +13,331 @@ class RedisLock:
         self.timeout_secs = timeout_secs
         self.lock_obtained = False
         self.redis = get_redis_connection(
-            redis_url, redis_sentinels, decode_responses=True
+            redis_url, redis_sentinels, async_mode=True, decode_responses=True
         )
 
-    def aquire_lock(self):
+    async def aquire_lock(self):
         # nx=True will only set this key if it _hasn't_ already been set
-        self.lock_obtained = self.redis.set(
+        self.lock_obtained = await self.redis.set(
             self.lock_name, self.lock_id, nx=True, ex=self.timeout_secs
         )
         return self.lock_obtained
 
-    def renew_lock(self):
+    async def renew_lock(self):
         # xx=True will only set this key if it _has_ already been set
-        return self.redis.set(
+        return await self.redis.set(
             self.lock_name, self.lock_id, xx=True, ex=self.timeout_secs
         )
 
-    def release_lock(self):
-        lock_value = self.redis.get(self.lock_name)
+    async def release_lock(self):
+        lock_value = await self.redis.get(self.lock_name)
         if lock_value and lock_value == self.lock_id:
-            self.redis.delete(self.lock_name)
+            await self.redis.delete(self.lock_name)
 
 
-class RedisDict:
-    def __init__(self, name, redis_url, redis_sentinels=[]):
+class AsyncRedisDict:
+    """
+    Hash of JSON values read and written through the asyncio Redis client, so
+    socket handlers never block the event loop. Multi-key reads and writes go
+    out as a single command. Without Redis the values are kept in a local dict.
+    """
+
+    def __init__(self, name: str, redis=None):
         self.name = name
-        self.redis = get_redis_connection(
-            redis_url, redis_sentinels, decode_responses=True
-        )
+        self._redis = redis
+        self._local = {}
 
-    def __setitem__(self, key, value):
-        serialized_value = json.dumps(value)
-        self.redis.hset(self.name, key, serialized_value)
+    async def get(self, key: str, default=None):
+        if self._redis:
+            value = await self._redis.hget(self.name, key)
+            return json.loads(value) if value is not None else default
+        return self._local.get(key, default)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[dict]]:
+        if not keys:
+            return []
+        if self._redis:
+            values = await self._redis.hmget(self.name, keys)
+            return [json.loads(v) if v is not None else None for v in values]
+        return [self._local.get(key) for key in keys]
+
+    async def set(self, key: str, value):
+        if self._redis:
+            await self._redis.hset(self.name, key, json.dumps(value))
+        else:
+            self._local[key] = value
+
+    async def set_many(self, mapping: dict):
+        if not mapping:
+            return
+        if self._redis:
+            await self._redis.hset(
+                self.name,
+                mapping={key: json.dumps(value) for key, value in mapping.items()},
+            )
+        else:
+            self._local.update(mapping)
+
+    async def delete(self, key: str) -> bool:
+        if self._redis:
+            return await self._redis.hdel(self.name, key) > 0
+        return self._local.pop(key, None) is not None
+
+    async def contains(self, key: str) -> bool:
+        if self._redis:
+            return await self._redis.hexists(self.name, key)
+        return key in self._local
+
+    async def keys(self) -> List[str]:
+        if self._redis:
+            return await self._redis.hkeys(self.name)
+        return list(self._local.keys())
+
+
+class AsyncUserPool:
+    """
+    Socket sessions of every connected user. Each user's session ids are a Redis
+    set, and the users with at least one session are kept in an index set, so
+    adding or removing a session never rewrites the user's whole entry.
+    """
+
+    # Drop the user from the index only if its last session is gone, atomically
+    # so that a session added concurrently can't be lost from the index.
+    REMOVE_SCRIPT = """
+    redis.call('SREM', KEYS[1], ARGV[1])
+    if redis.call('SCARD', KEYS[1]) == 0 then
+        redis.call('SREM', KEYS[2], ARGV[2])
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, name: str, redis=None, sync_redis=None):
+        self.name = name
+        self._redis = redis
+        self._sync_redis = sync_redis
+        self._local = {}
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.name}:{user_id}"
+
+    async def add(self, user_id: str, sid: str):
+        if self._redis:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.sadd(self._key(user_id), sid)
+                pipe.sadd(self.name, user_id)
+                await pipe.execute()
+        else:
+            self._local.setdefault(user_id, set()).add(sid)
 
-    def __getitem__(self, key):
-        value = self.redis.hget(self.name, key)
-        if value is None:
-            raise KeyError(key)
-        return json.loads(value)
+    async def remove(self, user_id: str, sid: str):
+        if self._redis:
+            await self._redis.eval(
+                self.REMOVE_SCRIPT, 2, self._key(user_id), self.name, sid, user_id
+            )
+        else:
+            sids = self._local.get(user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._local[user_id]
 
-    def __delitem__(self, key):
-        result = self.redis.hdel(self.name, key)
-        if result == 0:
-            raise KeyError(key)
+    async def get(self, user_id: str) -> List[str]:
+        if self._redis:
+            return list(await self._redis.smembers(self._key(user_id)))
+        return list(self._local.get(user_id, ()))
 
-    def __contains__(self, key):
-        return self.redis.hexists(self.name, key)
+    async def contains(self, user_id: str) -> bool:
+        if self._redis:
+            return bool(await self._redis.sismember(self.name, user_id))
+        return user_id in self._local
 
-    def __len__(self):
-        return self.redis.hlen(self.name)
+    async def keys(self) -> List[str]:
+        if self._redis:
+            return list(await self._redis.smembers(self.name))
+        return list(self._local.keys())
 
-    def keys(self):
-        return self.redis.hkeys(self.name)
+    def count(self) -> int:
+        """Blocking count of the active users, for callers outside the event loop."""
+        if self._sync_redis:
+            return self._sync_redis.scard(self.name)
+        return len(self._local)
 
-    def values(self):
-        return [json.loads(v) for v in self.redis.hvals(self.name)]
 
-    def items(self):
-        return [(k, json.loads(v)) for k, v in self.redis.hgetall(self.name).items()]
+class AsyncUsagePool:
+    """
+    Models in use, as a sorted set of model id by the time its latest usage
+    report expires. Reporting usage is a single ZADD, listing the models in use
+    reads only the unexpired range and cleanup removes only the expired range,
+    so neither has to scan or rewrite the entries of the active models.
+    """
 
-    def get(self, key, default=None):
-        try:
-            return self[key]
-        except KeyError:
-            return default
+    def __init__(self, name: str, redis=None, timeout: int = 3):
+        self.name = name
+        self.timeout = timeout
+        self._redis = redis
+        self._local = {}
 
-    def clear(self):
-        self.redis.delete(self.name)
+    async def touch(self, model_id: str):
+        expires_at = time.time() + self.timeout
+        if self._redis:
+            await self._redis.zadd(self.name, {model_id: expires_at})
+        else:
+            self._local[model_id] = expires_at
 
-    def update(self, other=None, **kwargs):
-        if other is not None:
-            for k, v in other.items() if hasattr(other, "items") else other:
-                self[k] = v
-        for k, v in kwargs.items():
-            self[k] = v
+    async def keys(self) -> List[str]:
+        now = time.time()
+        if self._redis:
+            return await self._redis.zrangebyscore(self.name, f"({now}", "+inf")
+        return [
+            model_id for model_id, expires_at in self._local.items() if expires_at > now
+        ]
+
+    async def cleanup(self) -> int:
+        """Remove the models whose usage expired, returns how many were removed."""
+        now = time.time()
+        if self._redis:
+            return await self._redis.zremrangebyscore(self.name, "-inf", now)
 
-    def setdefault(self, key, default=None):
-        if key not in self:
-            self[key] = default
-        return self[key]
+        expired = [
+            model_id
+            for model_id, expires_at in self._local.items()
+            if expires_at <= now
+        ]
+        for model_id in expired:
+            del self._local[model_id]
+        return len(expired)
 
 
 class YdocManager:
+    """
+    Collaborative (Yjs) documents, kept as a compacted snapshot plus a log of
+    the binary updates received since. Once the log reaches
+    `compaction_updates` updates or `compaction_bytes` bytes it is merged into
+    the snapshot, so serving a document's state only merges the snapshot with
+    a short tail instead of replaying its whole history.
+    """
+
+    # Commit a compaction unless another one already did, or the document was
+    # cleared, since the snapshot and log were read.
+    COMPACT_SCRIPT = """
+    local version = redis.call('HGET', KEYS[1], 'version') or '0'
+    if version ~= ARGV[1] or redis.call('LLEN', KEYS[2]) < tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], 'state', ARGV[3], 'version', tonumber(version) + 1)
+    redis.call('LTRIM', KEYS[2], tonumber(ARGV[2]), -1)
+    redis.call('DECRBY', KEYS[3], ARGV[4])
+    return 1
+    """
+
     def __init__(
         self,
         redis=None,
+        binary_redis=None,
         redis_key_prefix: str = "open-webui:ydoc:documents",
+        compaction_updates: int = 200,
+        compaction_bytes: int = 256 * 1024,
     ):
         self._updates = {}
+        self._update_bytes = {}
+        self._snapshots = {}
         self._users = {}
         self._redis = redis
+        # Updates are stored as raw bytes, which the decoding client can't read
+        self._binary_redis = binary_redis
         self._redis_key_prefix = redis_key_prefix
+        self.compaction_updates = compaction_updates
+        self.compaction_bytes = compaction_bytes
+
+    def _keys(self, document_id: str) -> Tuple[str, str, str]:
+        prefix = f"{self._redis_key_prefix}:{document_id}"
+        return f"{prefix}:snapshot", f"{prefix}:log", f"{prefix}:log_bytes"
 
     async def append_to_updates(self, document_id: str, update: bytes):
         document_id = document_id.replace(":", "_")
+        update = bytes(update)
+
         if self._redis:
-            redis_key = f"{self._redis_key_prefix}:{document_id}:updates"
-            await self._redis.rpush(redis_key, json.dumps(list(update)))
+            _, log_key, size_key = self._keys(document_id)
+            async with self._binary_redis.pipeline(transaction=True) as pipe:
+                pipe.rpush(log_key, update)
+                pipe.incrby(size_key, len(update))
+                count, size = await pipe.execute()
         else:
-            if document_id not in self._updates:
-                self._updates[document_id] = []
-            self._updates[document_id].append(update)
-
-    async def get_updates(self, document_id: str) -> List[bytes]:
+            self._updates.setdefault(document_id, []).append(update)
+            self._update_bytes[document_id] = self._update_bytes.get(
+                document_id, 0
+            ) + len(update)
+            count = len(self._updates[document_id])
+            size = self._update_bytes[document_id]
+
+        if count >= self.compaction_updates or size >= self.compaction_bytes:
+            await self.compact(document_id)
+
+    async def _read(self, document_id: str) -> Tuple[Optional[bytes], bytes, list]:
+        """Return the snapshot, its version and the updates logged after it."""
+        if self._redis:
+            snapshot_key, log_key, _ = self._keys(document_id)
+            async with self._binary_redis.pipeline(transaction=True) as pipe:
+                pipe.hmget(snapshot_key, ["state", "version"])
+                pipe.lrange(log_key, 0, -1)
+                (state, version), updates = await pipe.execute()
+            return state, version or b"0", updates
+        else:
+            return (
+                self._snapshots.get(document_id),
+                b"0",
+                list(self._updates.get(document_id, [])),
+            )
+
+    async def compact(self, document_id: str):
+        """Merge the logged updates of a document into its snapshot."""
         document_id = document_id.replace(":", "_")
 
+        state, version, updates = await self._read(document_id)
+        if not updates:
+            return
+
+        merged = Y.merge_updates(*([state] if state else []), *updates)
+        size = sum(len(update) for update in updates)
+
         if self._redis:
-            redis_key = f"{self._redis_key_prefix}:{document_id}:updates"
-            updates = await self._redis.lrange(redis_key, 0, -1)
-            return [bytes(json.loads(update)) for update in updates]
+            await self._binary_redis.eval(
+                self.COMPACT_SCRIPT,
+                3,
+                *self._keys(document_id),
+                version,
+                len(updates),
+                merged,
+                size,
+            )
         else:
-            return self._updates.get(document_id, [])
+            self._snapshots[document_id] = merged
+            del self._updates[document_id][: len(updates)]
+            self._update_bytes[document_id] -= size
+
+    async def get_updates(self, document_id: str) -> List[bytes]:
+        document_id = document_id.replace(":", "_")
+
+        state, _, updates = await self._read(document_id)
+        return ([state] if state else []) + updates
+
+    async def get_state(self, document_id: str) -> bytes:
+        """Encode the whole document as a single update."""
+        updates = await self.get_updates(document_id)
+        if not updates:
+            return Y.Doc().get_update()
+        return Y.merge_updates(*updates)
 
     async def document_exists(self, document_id: str) -> bool:
         document_id = document_id.replace(":", "_")
 
         if self._redis:
-            redis_key = f"{self._redis_key_prefix}:{document_id}:updates"
-            return await self._redis.exists(redis_key) > 0
+            snapshot_key, log_key, _ = self._keys(document_id)
+            return await self._redis.exists(snapshot_key, log_key) > 0
         else:
-            return document_id in self._updates
+            return document_id in self._updates or document_id in self._snapshots
 
     async def get_users(self, document_id: str) -> List[str]:
         document_id = document_id.replace(":", "_")
@@ -188,12 +394,16 @@ class YdocManager:
         document_id = document_id.replace(":", "_")
 
         if self._redis:
-            redis_key = f"{self._redis_key_prefix}:{document_id}:updates"
-            await self._redis.delete(redis_key)
+            await self._redis.delete(
+                *self._keys(document_id),
+                # Update log of the JSON encoded format
+                f"{self._redis_key_prefix}:{document_id}:updates",
+            )
             redis_users_key = f"{self._redis_key_prefix}:{document_id}:users"
             await self._redis.delete(redis_users_key)
         else:
-            if document_id in self._updates:
-                del self._updates[document_id]
+            self._updates.pop(document_id, None)
+            self._update_bytes.pop(document_id, None)
+            self._snapshots.pop(document_id, None)
             if document_id in self._users:
                 del self._users[document_id]
@@ -1,12 +1,18 @@
+import hashlib
 import os
 import shutil
 import json
 import logging
 import re
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Tuple, Dict
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Tuple, Dict, Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from open_webui.config import (
@@ -24,7 +30,10 @@ from open_webui.config import (
     AZURE_STORAGE_ENDPOINT,
     AZURE_STORAGE_CONTAINER_NAME,
     AZURE_STORAGE_KEY,
+    STORAGE_LOCAL_CACHE_MIN_AGE,
+    STORAGE_LOCAL_CACHE_SIZE,
     STORAGE_PROVIDER,
+    STORAGE_UPLOAD_CHUNK_SIZE,
     UPLOAD_DIR,
 )
 from google.cloud import storage
@@ -48,7 +57,8 @@ class StorageProvider(ABC):
     @abstractmethod
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
+        """Store the file, returns its size, SHA-256 hex digest and path."""
         pass
 
     @abstractmethod
@@ -64,14 +74,21 @@ class LocalStorageProvider(StorageProvider):
     @staticmethod
     def upload_file(
         file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
-        contents = file.read()
-        if not contents:
-            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+    ) -> Tuple[int, str, str]:
+        """Copies the file to local storage in chunks, sizing and hashing it on the way."""
         file_path = f"{UPLOAD_DIR}/{filename}"
+        file_hash = hashlib.sha256()
+        file_size = 0
         with open(file_path, "wb") as f:
-            f.write(contents)
-        return contents, file_path
+            while chunk := file.read(STORAGE_UPLOAD_CHUNK_SIZE):
+                file_hash.update(chunk)
+                file_size += len(chunk)
+                f.write(chunk)
+
+        if not file_size:
+            os.remove(file_path)
+            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+        return file_size, file_hash.hexdigest(), file_path
 
     @staticmethod
     def get_file(file_path: str) -> str:
@@ -105,6 +122,117 @@ class LocalStorageProvider(StorageProvider):
             log.warning(f"Directory {UPLOAD_DIR} not found in local storage.")
 
 
+class LocalFileCache:
+    """
+    Local copies of remote storage objects in UPLOAD_DIR, by object file name.
+
+    Each copy records the ETag of the object it came from and is only served
+    while the object still has that ETag. Copies are kept up to `max_size` bytes
+    in total, least recently used ones are evicted beyond it, except those read
+    in the last `min_age` seconds whose path a reader may still be about to
+    open. Concurrent reads of an object wait for a single download.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(
+        self,
+        max_size: int = STORAGE_LOCAL_CACHE_SIZE,
+        min_age: float = STORAGE_LOCAL_CACHE_MIN_AGE,
+    ):
+        self.max_size = max_size
+        self.min_age = min_age
+        # file name -> (etag, size, last read), least recently used first
+        self._entries: OrderedDict[str, Tuple[Optional[str], int, float]] = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._lock = threading.Lock()
+        self._fetch_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes_fetched": 0}
+
+        # Copies left by a previous run count towards the size, they are
+        # downloaded again on first read as their ETags are unknown
+        if self.max_size > 0 and os.path.isdir(UPLOAD_DIR):
+            files = [entry for entry in os.scandir(UPLOAD_DIR) if entry.is_file()]
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                stat = entry.stat()
+                self._entries[entry.name] = (None, stat.st_size, stat.st_mtime)
+                self._size += stat.st_size
+
+    def get(
+        self, filename: str, etag: Optional[str], fetch: Callable[[str], None]
+    ) -> str:
+        """Local path of the object, downloaded with fetch(path) unless cached."""
+        local_file_path = f"{UPLOAD_DIR}/{filename}"
+        with self._fetch_locks[hash(filename) % self.LOCK_STRIPES]:
+            with self._lock:
+                entry = self._entries.get(filename)
+                if (
+                    entry is not None
+                    and etag is not None
+                    and entry[0] == etag
+                    and os.path.exists(local_file_path)
+                ):
+                    self._entries[filename] = (etag, entry[1], time.time())
+                    self._entries.move_to_end(filename)
+                    self.stats["hits"] += 1
+                    return local_file_path
+                self.stats["misses"] += 1
+
+            # Download next to the copy, so that a failed download leaves no
+            # partial file behind and readers never see one
+            temp_file_path = f"{local_file_path}.{uuid.uuid4().hex}.part"
+            try:
+                fetch(temp_file_path)
+                os.replace(temp_file_path, local_file_path)
+            finally:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+
+            self.stats["bytes_fetched"] += os.path.getsize(local_file_path)
+            self.put(filename, etag)
+            return local_file_path
+
+    def put(self, filename: str, etag: Optional[str]):
+        """Record the local copy of an object, evicting others beyond the size."""
+        if self.max_size <= 0:
+            return
+
+        size = os.path.getsize(f"{UPLOAD_DIR}/{filename}")
+        with self._lock:
+            previous = self._entries.pop(filename, None)
+            if previous is not None:
+                self._size -= previous[1]
+            now = time.time()
+            self._entries[filename] = (etag, size, now)
+            self._size += size
+
+            while self._size > self.max_size and len(self._entries) > 1:
+                evicted, (_, evicted_size, used_at) = next(iter(self._entries.items()))
+                if now - used_at < self.min_age:
+                    # Every other copy was read more recently
+                    break
+                del self._entries[evicted]
+                self._size -= evicted_size
+                self.stats["evictions"] += 1
+                try:
+                    os.remove(f"{UPLOAD_DIR}/{evicted}")
+                except FileNotFoundError:
+                    pass
+
+    def discard(self, filename: str):
+        with self._lock:
+            entry = self._entries.pop(filename, None)
+            if entry is not None:
+                self._size -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
 class S3StorageProvider(StorageProvider):
     def __init__(self):
         config = Config(
@@ -136,6 +264,12 @@ class S3StorageProvider(StorageProvider):
 
         self.bucket_name = S3_BUCKET_NAME
         self.key_prefix = S3_KEY_PREFIX if S3_KEY_PREFIX else ""
+        # Files over one chunk are sent as a multipart upload of chunk sized parts
+        self.transfer_config = TransferConfig(
+            multipart_threshold=STORAGE_UPLOAD_CHUNK_SIZE,
+            multipart_chunksize=STORAGE_UPLOAD_CHUNK_SIZE,
+        )
+        self.cache = LocalFileCache()
 
     @staticmethod
     def sanitize_tag_value(s: str) -> str:
@@ -144,12 +278,20 @@ class S3StorageProvider(StorageProvider):
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to S3 storage."""
-        _, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        file_size, file_hash, file_path = LocalStorageProvider.upload_file(
+            file, filename, tags
+        )
         s3_key = os.path.join(self.key_prefix, filename)
         try:
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_key)
+            self.s3_client.upload_file(
+                file_path, self.bucket_name, s3_key, Config=self.transfer_config
+            )
+            self.cache.put(
+                filename,
+                self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)["ETag"],
+            )
             if S3_ENABLE_TAGGING and tags:
                 sanitized_tags = {
                     self.sanitize_tag_value(k): self.sanitize_tag_value(v)
@@ -165,10 +307,7 @@ class S3StorageProvider(StorageProvider):
                     Key=s3_key,
                     Tagging=tagging,
                 )
-            return (
-                open(file_path, "rb").read(),
-                f"s3://{self.bucket_name}/{s3_key}",
-            )
+            return file_size, file_hash, f"s3://{self.bucket_name}/{s3_key}"
         except ClientError as e:
             raise RuntimeError(f"Error uploading file to S3: {e}")
 
@@ -176,9 +315,16 @@ class S3StorageProvider(StorageProvider):
         """Handles downloading of the file from S3 storage."""
         try:
             s3_key = self._extract_s3_key(file_path)
-            local_file_path = self._get_local_file_path(s3_key)
-            self.s3_client.download_file(self.bucket_name, s3_key, local_file_path)
-            return local_file_path
+            etag = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)[
+                "ETag"
+            ]
+            return self.cache.get(
+                s3_key.split("/")[-1],
+                etag,
+                lambda path: self.s3_client.download_file(
+                    self.bucket_name, s3_key, path
+                ),
+            )
         except ClientError as e:
             raise RuntimeError(f"Error downloading file from S3: {e}")
 
@@ -191,6 +337,7 @@ class S3StorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting file from S3: {e}")
 
         # Always delete from local storage
+        self.cache.discard(file_path.split("/")[-1])
         LocalStorageProvider.delete_file(file_path)
 
     def delete_all_files(self) -> None:
@@ -210,6 +357,7 @@ class S3StorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from S3: {e}")
 
         # Always delete from local storage
+        self.cache.clear()
         LocalStorageProvider.delete_all_files()
 
     # The s3 key is the name assigned to an object. It excludes the bucket name, but includes the internal path and the file name.
@@ -234,16 +382,21 @@ class GCSStorageProvider(StorageProvider):
             # if running on a Compute Engine instance, credentials would be from Google Metadata server
             self.gcs_client = storage.Client()
         self.bucket = self.gcs_client.bucket(GCS_BUCKET_NAME)
+        self.cache = LocalFileCache()
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to GCS storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        file_size, file_hash, file_path = LocalStorageProvider.upload_file(
+            file, filename, tags
+        )
         try:
-            blob = self.bucket.blob(filename)
+            # Resumable upload, sent in chunks
+            blob = self.bucket.blob(filename, chunk_size=STORAGE_UPLOAD_CHUNK_SIZE)
             blob.upload_from_filename(file_path)
-            return contents, "gs://" + self.bucket_name + "/" + filename
+            self.cache.put(filename, blob.etag)
+            return file_size, file_hash, "gs://" + self.bucket_name + "/" + filename
         except GoogleCloudError as e:
             raise RuntimeError(f"Error uploading file to GCS: {e}")
 
@@ -251,11 +404,8 @@ class GCSStorageProvider(StorageProvider):
         """Handles downloading of the file from GCS storage."""
         try:
             filename = file_path.removeprefix("gs://").split("/")[1]
-            local_file_path = f"{UPLOAD_DIR}/{filename}"
             blob = self.bucket.get_blob(filename)
-            blob.download_to_filename(local_file_path)
-
-            return local_file_path
+            return self.cache.get(filename, blob.etag, blob.download_to_filename)
         except NotFound as e:
             raise RuntimeError(f"Error downloading file from GCS: {e}")
 
@@ -269,6 +419,7 @@ class GCSStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting file from GCS: {e}")
 
         # Always delete from local storage
+        self.cache.discard(file_path.split("/")[-1])
         LocalStorageProvider.delete_file(file_path)
 
     def delete_all_files(self) -> None:
@@ -283,6 +434,7 @@ class GCSStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from GCS: {e}")
 
         # Always delete from local storage
+        self.cache.clear()
         LocalStorageProvider.delete_all_files()
 
 
@@ -292,30 +444,47 @@ class AzureStorageProvider(StorageProvider):
         self.container_name = AZURE_STORAGE_CONTAINER_NAME
         storage_key = AZURE_STORAGE_KEY
 
+        # Files over one chunk are staged as chunk sized blocks, then committed
+        upload_options = {
+            "max_single_put_size": STORAGE_UPLOAD_CHUNK_SIZE,
+            "max_block_size": STORAGE_UPLOAD_CHUNK_SIZE,
+        }
+
         if storage_key:
             # Configure using the Azure Storage Account Endpoint and Key
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=storage_key
+                account_url=self.endpoint, credential=storage_key, **upload_options
             )
         else:
             # Configure using the Azure Storage Account Endpoint and DefaultAzureCredential
             # If the key is not configured, then the DefaultAzureCredential will be used to support Managed Identity authentication
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=DefaultAzureCredential()
+                account_url=self.endpoint,
+                credential=DefaultAzureCredential(),
+                **upload_options,
             )
         self.container_client = self.blob_service_client.get_container_client(
             self.container_name
         )
+        self.cache = LocalFileCache()
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to Azure Blob Storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        file_size, file_hash, file_path = LocalStorageProvider.upload_file(
+            file, filename, tags
+        )
         try:
             blob_client = self.container_client.get_blob_client(filename)
-            blob_client.upload_blob(contents, overwrite=True)
-            return contents, f"{self.endpoint}/{self.container_name}/{filename}"
+            with open(file_path, "rb") as f:
+                result = blob_client.upload_blob(f, length=file_size, overwrite=True)
+            self.cache.put(filename, result.get("etag"))
+            return (
+                file_size,
+                file_hash,
+                f"{self.endpoint}/{self.container_name}/{filename}",
+            )
         except Exception as e:
             raise RuntimeError(f"Error uploading file to Azure Blob Storage: {e}")
 
@@ -323,11 +492,15 @@ class AzureStorageProvider(StorageProvider):
         """Handles downloading of the file from Azure Blob Storage."""
         try:
             filename = file_path.split("/")[-1]
-            local_file_path = f"{UPLOAD_DIR}/{filename}"
             blob_client = self.container_client.get_blob_client(filename)
-            with open(local_file_path, "wb") as download_file:
-                download_file.write(blob_client.download_blob().readall())
-            return local_file_path
+
+            def fetch(path: str):
+                with open(path, "wb") as download_file:
+                    blob_client.download_blob().readinto(download_file)
+
+            return self.cache.get(
+                filename, blob_client.get_blob_properties().etag, fetch
+            )
         except ResourceNotFoundError as e:
             raise RuntimeError(f"Error downloading file from Azure Blob Storage: {e}")
 
@@ -341,6 +514,7 @@ class AzureStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting file from Azure Blob Storage: {e}")
 
         # Always delete from local storage
+        self.cache.discard(file_path.split("/")[-1])
         LocalStorageProvider.delete_file(file_path)
 
     def delete_all_files(self) -> None:
@@ -353,6 +527,7 @@ class AzureStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from Azure Blob Storage: {e}")
 
         # Always delete from local storage
+        self.cache.clear()
         LocalStorageProvider.delete_all_files()
 
 
@@ -0,0 +1,152 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from open_webui.models import chats
+from open_webui.models.chats import (
+    Chat,
+    ChatForm,
+    ChatMessage,
+    ChatSearchEntry,
+    Chats,
+    merge_chat_message_rows,
+)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for table in (Chat, ChatMessage, ChatSearchEntry):
+        table.__table__.create(engine)
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextmanager
+    def get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setattr(chats, "get_db", get_db)
+    monkeypatch.setattr(chats, "ENABLE_CHAT_MESSAGE_STORE", True)
+    # Shared chats are not part of these tests
+    monkeypatch.setattr(Chats, "delete_shared_chat_by_chat_id", lambda id: True)
+    return get_db
+
+
+def new_chat() -> str:
+    return Chats.insert_new_chat(
+        "user",
+        ChatForm(
+            chat={
+                "title": "Chat",
+                "history": {
+                    "currentId": "a",
+                    "messages": {
+                        "a": {"id": "a", "role": "user", "content": "hi"},
+                        "b": {"id": "b", "role": "assistant", "content": ""},
+                    },
+                },
+            }
+        ),
+    ).id
+
+
+def message_rows(get_db, id: str) -> list[ChatMessage]:
+    with get_db() as db:
+        return db.query(ChatMessage).filter_by(chat_id=id).all()
+
+
+def test_merge_rows_over_document():
+    chat = {
+        "title": "Chat",
+        "history": {
+            "currentId": "a",
+            "messages": {"a": {"content": "hi", "role": "user"}},
+        },
+    }
+    rows = [
+        ChatMessage(message_id="a", data={"done": True}, updated_at=1),
+        ChatMessage(message_id="b", data={"content": "hello"}, updated_at=2),
+    ]
+
+    merged = merge_chat_message_rows(chat, rows)
+    assert merged["history"]["messages"] == {
+        "a": {"content": "hi", "role": "user", "done": True},
+        "b": {"content": "hello"},
+    }
+    assert merged["history"]["currentId"] == "b"
+    # The document is left as it was
+    assert chat["history"]["currentId"] == "a"
+
+
+def test_merge_rows_without_current_write_keeps_current_id():
+    chat = {"history": {"currentId": "b", "messages": {"a": {}, "b": {}}}}
+    rows = [ChatMessage(message_id="a", data={"statusHistory": []}, updated_at=0)]
+
+    assert merge_chat_message_rows(chat, rows)["history"]["currentId"] == "b"
+
+
+def test_upsert_message_is_merged_on_read(db):
+    id = new_chat()
+
+    assert Chats.upsert_message_by_id_and_message_id(id, "b", {"content": "hel"})
+    assert Chats.upsert_message_by_id_and_message_id(id, "b", {"content": "hello"})
+
+    history = Chats.get_chat_by_id(id).chat["history"]
+    assert history["messages"]["b"] == {
+        "id": "b",
+        "role": "assistant",
+        "content": "hello",
+    }
+    assert history["currentId"] == "b"
+    assert len(message_rows(db, id)) == 1
+
+
+def test_status_does_not_move_current_id(db):
+    id = new_chat()
+    Chats.upsert_message_by_id_and_message_id(id, "b", {"content": "hello"})
+
+    Chats.add_message_status_to_chat_by_id_and_message_id(
+        id, "a", {"action": "web_search", "done": True}
+    )
+
+    history = Chats.get_chat_by_id(id).chat["history"]
+    assert history["currentId"] == "b"
+    assert history["messages"]["a"]["statusHistory"] == [
+        {"action": "web_search", "done": True}
+    ]
+
+
+def test_update_chat_folds_rows_back_into_document(db):
+    id = new_chat()
+    Chats.upsert_message_by_id_and_message_id(id, "b", {"content": "hello"})
+
+    chat = Chats.get_chat_by_id(id).chat
+    chat["title"] = "Renamed"
+    Chats.update_chat_by_id(id, chat)
+
+    assert message_rows(db, id) == []
+    history = Chats.get_chat_by_id(id).chat["history"]
+    assert history["messages"]["b"]["content"] == "hello"
+    assert history["currentId"] == "b"
+
+
+def test_delete_chat_deletes_rows(db):
+    id = new_chat()
+    Chats.upsert_message_by_id_and_message_id(id, "b", {"content": "hello"})
+
+    assert Chats.delete_chat_by_id(id)
+
+    assert message_rows(db, id) == []
+    assert Chats.get_chat_by_id(id) is None
+    with db() as session:
+        assert session.query(ChatSearchEntry).filter_by(chat_id=id).count() == 0
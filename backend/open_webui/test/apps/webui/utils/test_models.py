@@ -0,0 +1,99 @@
+import copy
+from types import SimpleNamespace
+
+from open_webui.utils import models
+from open_webui.utils.models import (
+    ModelRegistry,
+    ModelRegistrySnapshot,
+    get_base_models_fingerprint,
+)
+
+
+def make_snapshot(registry: ModelRegistry, base_models: list, arena_config: tuple):
+    registry.snapshot = ModelRegistrySnapshot(
+        registry.version,
+        base_models,
+        get_base_models_fingerprint(base_models),
+        arena_config,
+        [{"id": model["id"]} for model in base_models],
+        {},
+    )
+    return registry.snapshot
+
+
+BASE_MODELS = [
+    {"id": "gpt-4o", "object": "model", "created": 1715367049, "owned_by": "openai"},
+    {"id": "llama3:8b", "object": "model", "created": 1716000000, "owned_by": "ollama"},
+]
+
+
+def test_snapshot_reused_for_equal_base_models():
+    registry = ModelRegistry()
+    snapshot = make_snapshot(registry, BASE_MODELS, (False, []))
+
+    # Refetched base models are a new list of new, equal dicts
+    assert registry.get(copy.deepcopy(BASE_MODELS), (False, [])) is snapshot
+    assert registry.get(BASE_MODELS, (False, [])) is snapshot
+
+
+def test_snapshot_not_reused_when_base_models_change():
+    registry = ModelRegistry()
+    make_snapshot(registry, BASE_MODELS, (False, []))
+
+    changed = copy.deepcopy(BASE_MODELS)
+    changed[1]["created"] += 1
+    assert registry.get(changed, (False, [])) is None
+    assert registry.get(BASE_MODELS[:1], (False, [])) is None
+    assert registry.get(copy.deepcopy(BASE_MODELS), (True, [])) is None
+
+
+def test_snapshot_not_reused_after_invalidate():
+    registry = ModelRegistry()
+    make_snapshot(registry, BASE_MODELS, (False, []))
+
+    registry.invalidate()
+    assert registry.get(copy.deepcopy(BASE_MODELS), (False, [])) is None
+
+
+def test_filter_models_by_read_access(monkeypatch):
+    monkeypatch.setattr(models, "get_user_group_ids", lambda user_id: {"group"})
+    registry = ModelRegistry()
+    registry.snapshot = ModelRegistrySnapshot(
+        registry.version,
+        [],
+        get_base_models_fingerprint([]),
+        (False, []),
+        [],
+        {
+            "public": ("owner", None),
+            "owned": ("user", {}),
+            "shared-with-user": ("owner", {"read": {"user_ids": ["user"]}}),
+            "shared-with-group": ("owner", {"read": {"group_ids": ["group"]}}),
+            "write-only": ("owner", {"write": {"user_ids": ["user"]}}),
+            "private": ("owner", {}),
+        },
+    )
+
+    available = [
+        {"id": model_id}
+        for model_id in [
+            "public",
+            "owned",
+            "shared-with-user",
+            "shared-with-group",
+            "write-only",
+            "private",
+            "no-entry",
+        ]
+    ] + [
+        {"id": "arena", "arena": True, "info": {"meta": {"access_control": None}}},
+        {"id": "arena-private", "arena": True, "info": {"meta": {}}},
+    ]
+    filtered = registry.filter_models(available, SimpleNamespace(id="user"))
+    assert [model["id"] for model in filtered] == [
+        "public",
+        "owned",
+        "shared-with-user",
+        "shared-with-group",
+        "arena",
+    ]
@@ -0,0 +1,97 @@
+import json
+
+import fakeredis
+import pytest
+
+from open_webui.utils import write_behind
+from open_webui.utils.write_behind import ChatMessageWriteBuffer
+
+
+@pytest.fixture
+def upserts(monkeypatch):
+    calls = []
+    result = {"ok": True}
+
+    def upsert_message_by_id_and_message_id(chat_id, message_id, message):
+        calls.append((chat_id, message_id, dict(message)))
+        return result["ok"]
+
+    monkeypatch.setattr(
+        write_behind.Chats,
+        "upsert_message_by_id_and_message_id",
+        upsert_message_by_id_and_message_id,
+    )
+    return calls, result
+
+
+def make_buffer():
+    buffer = ChatMessageWriteBuffer(
+        interval=60,
+        max_bytes=1024 * 1024,
+        redis=fakeredis.FakeAsyncRedis(decode_responses=True),
+        redis_key="test:write_behind",
+        journal_interval=0,
+    )
+    # Recover every journal entry, as if its replica were gone
+    buffer.stale_after = 0
+    return buffer
+
+
+async def get_journal(buffer: ChatMessageWriteBuffer) -> dict:
+    return {
+        tuple(json.loads(field)): json.loads(payload)["message"]
+        for field, payload in (await buffer.redis.hgetall(buffer.redis_key)).items()
+    }
+
+
+@pytest.mark.asyncio
+async def test_flush_clears_journal(upserts):
+    calls, _ = upserts
+    buffer = make_buffer()
+
+    await buffer.write("chat", "message", {"content": "Hello"})
+    assert await get_journal(buffer) == {("chat", "message"): {"content": "Hello"}}
+
+    await buffer.close("chat", "message")
+    assert calls == [("chat", "message", {"content": "Hello"})]
+    assert await get_journal(buffer) == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_message(upserts):
+    calls, result = upserts
+    buffer = make_buffer()
+
+    await buffer.write("chat", "message", {"content": "Hello"})
+    result["ok"] = False
+    assert await buffer.flush("chat", "message") is False
+
+    # Still buffered and journaled
+    assert await get_journal(buffer) == {("chat", "message"): {"content": "Hello"}}
+    await buffer.write("chat", "message", {"content": "Hello world"})
+
+    result["ok"] = True
+    assert await buffer.flush("chat", "message") is True
+    assert calls[-1] == ("chat", "message", {"content": "Hello world"})
+    assert await get_journal(buffer) == {}
+    assert buffer.stats["flushes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_close_leaves_message_to_recover(upserts):
+    calls, result = upserts
+    buffer = make_buffer()
+
+    await buffer.write("chat", "message", {"content": "Hello"})
+    result["ok"] = False
+    await buffer.close("chat", "message")
+    assert await get_journal(buffer) == {("chat", "message"): {"content": "Hello"}}
+
+    # A failed replay leaves the entry for the next run
+    assert await buffer.recover() == 0
+    assert await get_journal(buffer) == {("chat", "message"): {"content": "Hello"}}
+
+    result["ok"] = True
+    assert await buffer.recover() == 1
+    assert calls[-1] == ("chat", "message", {"content": "Hello"})
+    assert await get_journal(buffer) == {}
@@ -0,0 +1,86 @@
+"""
+Benchmark: lexical side of a hybrid search over a large collection.
+
+Compares rebuilding `BM25Retriever.from_texts` over the whole collection, as
+`query_doc_with_hybrid_search` does without ENABLE_RAG_BM25_INDEX, with querying
+the persistent `BM25Index`. Also checks that both return the same documents after
+incremental inserts, upserts and deletes.
+
+    python -m open_webui.test.benchmarks.bm25_index
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/webui.db"
+
+from langchain_community.retrievers import BM25Retriever  # noqa: E402
+
+from open_webui.retrieval.bm25 import BM25Index  # noqa: E402
+
+CHUNKS = 5_000
+QUERIES = 20
+K = 10
+WORDS = [f"term{idx}" for idx in range(3_000)]
+COLLECTION = "course-bench"
+
+
+def chunk(rng: random.Random, idx: int) -> dict:
+    text = " ".join(rng.choices(WORDS, k=rng.randint(50, 200)))
+    return {"id": f"chunk-{idx}", "text": text, "metadata": {"file_id": f"f{idx % 50}"}}
+
+
+def legacy_search(items: list[dict], query: str) -> list[str]:
+    retriever = BM25Retriever.from_texts(
+        texts=[item["text"] for item in items],
+        metadatas=[{"id": item["id"]} for item in items],
+    )
+    retriever.k = K
+    return [doc.metadata["id"] for doc in retriever.invoke(query)]
+
+
+def main():
+    rng = random.Random(0)
+    items = [chunk(rng, idx) for idx in range(CHUNKS)]
+    queries = [" ".join(rng.choices(WORDS, k=4)) for _ in range(QUERIES)]
+
+    index = BM25Index(os.path.join(DATA_DIR, "bm25"))
+    index.build(COLLECTION, items[: CHUNKS // 2])
+    for start in range(CHUNKS // 2, CHUNKS, CHUNKS // 10):
+        index.add(COLLECTION, items[start : start + CHUNKS // 10])
+
+    # Replace some chunks and delete a whole file
+    for idx in range(0, 200, 2):
+        items[idx] = {**chunk(rng, idx), "metadata": items[idx]["metadata"]}
+    index.add(COLLECTION, items[0:200:2])
+    index.delete(COLLECTION, filter={"file_id": "f7"})
+    items = [item for item in items if item["metadata"]["file_id"] != "f7"]
+
+    start = time.perf_counter()
+    legacy = [legacy_search(items, query) for query in queries]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [
+        [result["id"] for result in index.search(COLLECTION, query, K)]
+        for query in queries
+    ]
+    indexed_time = time.perf_counter() - start
+
+    for expected, actual in zip(legacy, indexed):
+        # Ties may be ordered differently, compare the sets of returned chunks
+        assert set(expected) == set(actual), (expected, actual)
+
+    print(f"chunks:  {len(items)}")
+    print(f"legacy:  {legacy_time / QUERIES * 1000:.1f} ms/query")
+    print(f"indexed: {indexed_time / QUERIES * 1000:.1f} ms/query")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Benchmark: chat events of one streamed response.
+
+Streams message deltas through the default event emitter, which sends a frame
+to every session and reads and rewrites the message for each event, and through
+the batched emitter, which coalesces the events of each window into one frame
+per session and one message write. Reports the events accepted per second, the
+socket frames sent and the database writes per streamed response.
+
+    python -m open_webui.test.benchmarks.chat_event_batching
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/webui.db"
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from open_webui.env import OPEN_WEBUI_DIR  # noqa: E402
+from open_webui.internal.db import engine  # noqa: E402
+from open_webui.models.chats import ChatForm, Chats  # noqa: E402
+from open_webui.socket import main as socket_main  # noqa: E402
+from open_webui.socket.main import USER_POOL, get_event_emitter  # noqa: E402
+
+EVENTS = 500
+SESSIONS = 3
+# Delay between tokens from the upstream
+TOKEN_INTERVAL = 0.002
+BATCH_INTERVAL = 0.05
+
+
+def run_migrations():
+    alembic_cfg = Config(OPEN_WEBUI_DIR / "alembic.ini")
+    alembic_cfg.set_main_option("script_location", str(OPEN_WEBUI_DIR / "migrations"))
+    command.upgrade(alembic_cfg, "heads")
+
+
+class Counters:
+    def __init__(self):
+        self.frames = 0
+        self.writes = 0
+
+    def reset(self):
+        self.frames = 0
+        self.writes = 0
+
+
+COUNTERS = Counters()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_writes(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith(("UPDATE", "INSERT")):
+        COUNTERS.writes += 1
+
+
+def count_frames(emit):
+    async def wrapper(*args, **kwargs):
+        COUNTERS.frames += 1
+        return await emit(*args, **kwargs)
+
+    return wrapper
+
+
+def create_message() -> dict:
+    message_id = str(uuid.uuid4())
+    chat = Chats.insert_new_chat(
+        "bench-user",
+        ChatForm(
+            chat={
+                "title": "Benchmark",
+                "history": {
+                    "messages": {
+                        message_id: {
+                            "id": message_id,
+                            "parentId": None,
+                            "childrenIds": [],
+                            "role": "assistant",
+                            "content": "",
+                        }
+                    },
+                    "currentId": message_id,
+                },
+            }
+        ),
+    )
+    return {"user_id": "bench-user", "chat_id": chat.id, "message_id": message_id}
+
+
+async def stream(batch: bool) -> tuple[float, str]:
+    request_info = create_message()
+    event_emitter = get_event_emitter(request_info, batch=batch)
+    if batch:
+        event_emitter.interval = BATCH_INTERVAL
+
+    COUNTERS.reset()
+    start = time.perf_counter()
+    for idx in range(EVENTS):
+        await event_emitter({"type": "message", "data": {"content": f"token{idx} "}})
+        await asyncio.sleep(TOKEN_INTERVAL)
+    if batch:
+        await event_emitter.flush()
+    elapsed = time.perf_counter() - start
+
+    message = Chats.get_message_by_id_and_message_id(
+        request_info["chat_id"], request_info["message_id"]
+    )
+    return elapsed, message["content"]
+
+
+async def main():
+    run_migrations()
+    for idx in range(SESSIONS):
+        await USER_POOL.add("bench-user", f"bench-session-{idx}")
+    socket_main.sio.emit = count_frames(socket_main.sio.emit)
+
+    expected = "".join(f"token{idx} " for idx in range(EVENTS))
+    print(
+        f"{EVENTS} message events, {SESSIONS} sessions, "
+        f"{TOKEN_INTERVAL * 1000:.0f} ms between tokens"
+    )
+    print(f"{'emitter':>22} {'events/s':>10} {'frames':>8} {'db writes':>10}")
+    for label, batch in [
+        ("per event", False),
+        (f"batched ({BATCH_INTERVAL * 1000:.0f} ms window)", True),
+    ]:
+        elapsed, content = await stream(batch)
+        assert content == expected
+        print(
+            f"{label:>22} {EVENTS / elapsed:>10.0f} "
+            f"{COUNTERS.frames:>8} {COUNTERS.writes:>10}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
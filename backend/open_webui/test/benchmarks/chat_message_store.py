@@ -0,0 +1,99 @@
+"""
+Benchmark: cost of a single message upsert as a chat grows.
+
+Compares the legacy path, which rewrites the whole `chat.chat` JSON document on
+every upsert, with ENABLE_CHAT_MESSAGE_STORE, which writes one `chat_message` row.
+
+    python -m open_webui.test.benchmarks.chat_message_store
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/webui.db"
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+
+from open_webui.env import OPEN_WEBUI_DIR  # noqa: E402
+from open_webui.models import chats  # noqa: E402
+from open_webui.models.chats import ChatForm, Chats  # noqa: E402
+
+HISTORY_LENGTHS = [10, 100, 1000]
+UPSERTS = 200
+MESSAGE_CONTENT = "lorem ipsum dolor sit amet " * 40
+
+
+def run_migrations():
+    alembic_cfg = Config(OPEN_WEBUI_DIR / "alembic.ini")
+    alembic_cfg.set_main_option("script_location", str(OPEN_WEBUI_DIR / "migrations"))
+    command.upgrade(alembic_cfg, "heads")
+
+
+def create_chat(history_length: int) -> str:
+    messages = {}
+    parent_id = None
+    for idx in range(history_length):
+        message_id = str(uuid.uuid4())
+        messages[message_id] = {
+            "id": message_id,
+            "parentId": parent_id,
+            "childrenIds": [],
+            "role": "user" if idx % 2 == 0 else "assistant",
+            "content": MESSAGE_CONTENT,
+        }
+        parent_id = message_id
+
+    chat = Chats.insert_new_chat(
+        "bench-user",
+        ChatForm(
+            chat={
+                "title": "Benchmark",
+                "history": {"messages": messages, "currentId": parent_id},
+            }
+        ),
+    )
+    return chat.id
+
+
+def bench(history_length: int) -> float:
+    chat_id = create_chat(history_length)
+    message_id = str(uuid.uuid4())
+
+    content = ""
+    start = time.perf_counter()
+    for idx in range(UPSERTS):
+        content += f"token{idx} "
+        Chats.upsert_message_by_id_and_message_id(
+            chat_id, message_id, {"role": "assistant", "content": content}
+        )
+    elapsed = time.perf_counter() - start
+
+    chat = Chats.get_chat_by_id(chat_id)
+    assert chat.chat["history"]["messages"][message_id]["content"] == content
+    assert chat.chat["history"]["currentId"] == message_id
+
+    return elapsed / UPSERTS * 1000
+
+
+def main():
+    run_migrations()
+
+    print(f"{'history':>8} {'legacy ms/upsert':>18} {'store ms/upsert':>17}")
+    for history_length in HISTORY_LENGTHS:
+        chats.ENABLE_CHAT_MESSAGE_STORE = False
+        legacy = bench(history_length)
+        chats.ENABLE_CHAT_MESSAGE_STORE = True
+        store = bench(history_length)
+        print(f"{history_length:>8} {legacy:>18.3f} {store:>17.3f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
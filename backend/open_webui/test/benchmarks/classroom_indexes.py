@@ -0,0 +1,218 @@
+"""
+Benchmark: classroom lookups with and without the classroom table indexes.
+
+Seeds 100 courses with a preset, 20 materials and 50 assignments each, and a
+submission from each of 300 students to every assignment. Times the access
+methods of the classroom tables on the schema before the indexes are added, and
+again after upgrading, and reports the p50 and p99 latency of each.
+
+    python -m open_webui.test.benchmarks.classroom_indexes
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/webui.db"
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from open_webui.env import OPEN_WEBUI_DIR  # noqa: E402
+from open_webui.internal.db import engine  # noqa: E402
+from open_webui.models.classroom import (  # noqa: E402
+    Assignment,
+    Assignments,
+    Course,
+    CoursePreset,
+    CoursePresets,
+    Material,
+    Materials,
+    Submission,
+    Submissions,
+)
+
+COURSES = 100
+MATERIALS = 20
+ASSIGNMENTS = 50
+STUDENTS = 300
+QUERIES = 200
+WARMUP_QUERIES = 20
+INSERT_BATCH_SIZE = 10000
+
+# Schema before the classroom table indexes
+BASE_REVISION = "b8e4f2a61c93"
+
+
+def alembic_config() -> Config:
+    alembic_cfg = Config(OPEN_WEBUI_DIR / "alembic.ini")
+    alembic_cfg.set_main_option("script_location", str(OPEN_WEBUI_DIR / "migrations"))
+    return alembic_cfg
+
+
+def insert_rows(conn, table, rows):
+    for idx in range(0, len(rows), INSERT_BATCH_SIZE):
+        conn.execute(insert(table), rows[idx : idx + INSERT_BATCH_SIZE])
+
+
+def seed() -> tuple[list[str], list[str], list[str]]:
+    now = int(time.time())
+    course_ids = [str(uuid.uuid4()) for _ in range(COURSES)]
+    student_ids = [str(uuid.uuid4()) for _ in range(STUDENTS)]
+    assignment_ids = []
+
+    with engine.begin() as conn:
+        insert_rows(
+            conn,
+            Course.__table__,
+            [
+                {
+                    "id": course_id,
+                    "title": f"Course {idx}",
+                    "status": "active",
+                    "created_by": "bench-teacher",
+                    "created_at": now,
+                    "visibility": "public",
+                }
+                for idx, course_id in enumerate(course_ids)
+            ],
+        )
+        insert_rows(
+            conn,
+            CoursePreset.__table__,
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "course_id": course_id,
+                    "is_default": True,
+                    "created_at": now,
+                }
+                for course_id in course_ids
+            ],
+        )
+        insert_rows(
+            conn,
+            Material.__table__,
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "course_id": course_id,
+                    "kind": "doc",
+                    "title": f"Material {idx}",
+                    "created_at": now + idx,
+                }
+                for course_id in course_ids
+                for idx in range(MATERIALS)
+            ],
+        )
+
+        assignments = []
+        for course_id in course_ids:
+            for idx in range(ASSIGNMENTS):
+                assignment_id = str(uuid.uuid4())
+                assignment_ids.append(assignment_id)
+                assignments.append(
+                    {
+                        "id": assignment_id,
+                        "course_id": course_id,
+                        "title": f"Assignment {idx}",
+                        "created_at": now + idx,
+                    }
+                )
+        insert_rows(conn, Assignment.__table__, assignments)
+
+        for assignment_id in assignment_ids:
+            insert_rows(
+                conn,
+                Submission.__table__,
+                [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "assignment_id": assignment_id,
+                        "user_id": student_id,
+                        "text": "answer",
+                        "submitted_at": now,
+                        "status": "submitted",
+                    }
+                    for student_id in student_ids
+                ],
+            )
+
+    return course_ids, assignment_ids, student_ids
+
+
+def latencies(call) -> tuple[float, float]:
+    for _ in range(WARMUP_QUERIES):
+        call()
+
+    samples = []
+    for _ in range(QUERIES):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def bench(course_ids, assignment_ids, student_ids) -> dict[str, tuple[float, float]]:
+    rng = random.Random(0)
+    return {
+        "CoursePresets.get_by_course_id": latencies(
+            lambda: CoursePresets.get_by_course_id(rng.choice(course_ids))
+        ),
+        "Materials.list_by_course": latencies(
+            lambda: Materials.list_by_course(rng.choice(course_ids))
+        ),
+        "Assignments.list_by_course": latencies(
+            lambda: Assignments.list_by_course(rng.choice(course_ids))
+        ),
+        "Submissions.list_by_assignment": latencies(
+            lambda: Submissions.list_by_assignment(rng.choice(assignment_ids))
+        ),
+        "Submissions.list_by_assignment_and_user": latencies(
+            lambda: Submissions.list_by_assignment_and_user(
+                rng.choice(assignment_ids), rng.choice(student_ids)
+            )
+        ),
+    }
+
+
+def main():
+    alembic_cfg = alembic_config()
+    command.upgrade(alembic_cfg, BASE_REVISION)
+
+    start = time.perf_counter()
+    ids = seed()
+    print(
+        f"seeded {COURSES} courses x {ASSIGNMENTS} assignments x {STUDENTS} "
+        f"students ({COURSES * ASSIGNMENTS * STUDENTS} submissions) "
+        f"in {time.perf_counter() - start:.1f} s"
+    )
+
+    before = bench(*ids)
+    command.upgrade(alembic_cfg, "heads")
+    after = bench(*ids)
+
+    print(
+        f"{'access method':>40} {'p50 ms':>9} {'p99 ms':>9}"
+        f" {'indexed p50':>12} {'indexed p99':>12}"
+    )
+    for name, (p50, p99) in before.items():
+        indexed_p50, indexed_p99 = after[name]
+        print(
+            f"{name:>40} {p50:>9.3f} {p99:>9.3f}"
+            f" {indexed_p50:>12.3f} {indexed_p99:>12.3f}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Benchmark: serializing content blocks while a response is streamed.
+
+Replays a 20k token response with reasoning, tool calls and a code interpreter
+block the way `process_chat_response` builds it, serializing after every token with
+both `serialize_content_blocks` and `ContentBlockSerializer`, and asserts that the
+output is byte-identical at every step.
+
+    python -m open_webui.test.benchmarks.content_blocks
+"""
+
+import random
+import sys
+import time
+
+from open_webui.utils.content_blocks import (
+    ContentBlockSerializer,
+    serialize_content_blocks,
+)
+
+TOKENS = 20_000
+WORDS = ["the", "student", "asked", "about", "entropy", "so", "we", "derive", "it"]
+
+
+def token(rng: random.Random) -> str:
+    word = rng.choice(WORDS)
+    if rng.random() < 0.05:
+        return f"{word}.\n"
+    if rng.random() < 0.01:
+        return f'{word} <b class="x">&amp;</b> "quoted" '
+    return f"{word} "
+
+
+def stream_steps(rng: random.Random):
+    """Yield the content block list after every streamed token."""
+    content_blocks = [{"type": "text", "content": ""}]
+    per_phase = TOKENS // 5
+
+    # Reasoning
+    content_blocks[-1] = {
+        "type": "reasoning",
+        "start_tag": "think",
+        "end_tag": "/think",
+        "attributes": {"type": "reasoning_content"},
+        "content": "",
+        "started_at": 0,
+    }
+    for _ in range(per_phase):
+        content_blocks[-1]["content"] += token(rng)
+        yield content_blocks
+    content_blocks[-1]["ended_at"] = 12
+    content_blocks[-1]["duration"] = 12
+
+    # Text, then tool calls with results
+    content_blocks.append({"type": "text", "content": ""})
+    for _ in range(per_phase):
+        content_blocks[-1]["content"] += token(rng)
+        yield content_blocks
+    content_blocks[-1]["content"] = content_blocks[-1]["content"].strip()
+
+    tool_calls = [
+        {
+            "id": f"call_{idx}",
+            "function": {
+                "name": "search_course_materials",
+                "arguments": '{"query": "entropy <derivation> & \\"proof\\""}',
+            },
+        }
+        for idx in range(3)
+    ]
+    content_blocks.append({"type": "tool_calls", "content": tool_calls})
+    yield content_blocks
+    content_blocks[-1]["results"] = [
+        {
+            "tool_call_id": tool_call["id"],
+            "content": "<p>" + " ".join(rng.choice(WORDS) for _ in range(400)) + "</p>",
+        }
+        for tool_call in tool_calls
+    ]
+
+    # Text with an opening code fence, then a code interpreter block
+    content_blocks.append({"type": "text", "content": ""})
+    for _ in range(per_phase):
+        content_blocks[-1]["content"] += token(rng)
+        yield content_blocks
+    content_blocks[-1]["content"] += "\n```python"
+    yield content_blocks
+
+    content_blocks.append(
+        {
+            "type": "code_interpreter",
+            "start_tag": "<code_interpreter>",
+            "end_tag": "</code_interpreter>",
+            "attributes": {"type": "code", "lang": "python"},
+            "content": "",
+        }
+    )
+    for _ in range(per_phase):
+        content_blocks[-1]["content"] += token(rng)
+        yield content_blocks
+    content_blocks[-1]["output"] = {"stdout": "S = 1.38e-23 * ln(W)\n"}
+
+    content_blocks.append({"type": "text", "content": ""})
+    for _ in range(TOKENS - 4 * per_phase):
+        content_blocks[-1]["content"] += token(rng)
+        yield content_blocks
+
+    # Final cleanup of the last text block
+    content_blocks[-1]["content"] = content_blocks[-1]["content"].strip()
+    yield content_blocks
+
+
+def run(serialize) -> tuple[float, list[int]]:
+    rng = random.Random(0)
+    checksums = []
+    elapsed = 0.0
+    for content_blocks in stream_steps(rng):
+        start = time.perf_counter()
+        content = serialize(content_blocks)
+        elapsed += time.perf_counter() - start
+        checksums.append(hash(content))
+    return elapsed, checksums
+
+
+def main():
+    legacy_time, legacy = run(serialize_content_blocks)
+    incremental_time, incremental = run(ContentBlockSerializer().serialize)
+
+    assert legacy == incremental, "incremental serializer output differs"
+
+    # Compare every step byte for byte, not just by hash
+    rng = random.Random(0)
+    serializer = ContentBlockSerializer()
+    for content_blocks in stream_steps(rng):
+        assert serializer.serialize(content_blocks) == serialize_content_blocks(
+            content_blocks
+        )
+
+    print(f"steps:       {len(legacy)}")
+    print(f"legacy:      {legacy_time:.2f}s")
+    print(f"incremental: {incremental_time:.2f}s")
+    print(f"speedup:     {legacy_time / incremental_time:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
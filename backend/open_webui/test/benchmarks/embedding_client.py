@@ -0,0 +1,110 @@
+"""
+Benchmark: embedding a large document through an openai-compatible backend.
+
+Starts a local stub embedding server that answers after a fixed latency and
+rate limits every tenth request with a 429, then embeds the same chunks with
+the previous serial `requests.post` loop and with `EmbeddingClient`, checking
+that the embeddings come back in input order.
+
+    python -m open_webui.test.benchmarks.embedding_client
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/webui.db"
+
+import requests  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from open_webui.retrieval.embedding_client import EmbeddingClient  # noqa: E402
+
+CHUNKS = 2_000
+BATCH_SIZE = 32
+LATENCY = 0.05
+RATE_LIMIT_EVERY = 10
+
+
+def embedding(text: str) -> list[float]:
+    return [float(int(text.split("-")[1])), 1.0]
+
+
+def start_stub_server() -> str:
+    requests_seen = 0
+
+    async def embeddings(request: web.Request) -> web.Response:
+        nonlocal requests_seen
+        requests_seen += 1
+        await asyncio.sleep(LATENCY)
+        if requests_seen % RATE_LIMIT_EVERY == 0:
+            return web.Response(status=429, headers={"Retry-After": "0.05"})
+
+        data = await request.json()
+        return web.json_response(
+            {"data": [{"embedding": embedding(text)} for text in data["input"]]}
+        )
+
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_post("/v1/embeddings", embeddings)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def legacy_embed(url: str, texts: list[str]) -> list[list[float]]:
+    embeddings = []
+    for i in range(0, len(texts), BATCH_SIZE):
+        while True:
+            r = requests.post(
+                f"{url}/embeddings",
+                json={"input": texts[i : i + BATCH_SIZE], "model": "stub"},
+            )
+            if r.status_code == 429:
+                time.sleep(float(r.headers.get("Retry-After", "1")))
+                continue
+            r.raise_for_status()
+            embeddings.extend(elem["embedding"] for elem in r.json()["data"])
+            break
+    return embeddings
+
+
+def main():
+    url = start_stub_server()
+    texts = [f"chunk-{idx}" for idx in range(CHUNKS)]
+    expected = [embedding(text) for text in texts]
+
+    start = time.perf_counter()
+    legacy = legacy_embed(url, texts)
+    legacy_time = time.perf_counter() - start
+    assert legacy == expected
+
+    print(f"chunks: {CHUNKS}, batch size: {BATCH_SIZE}, latency: {LATENCY * 1000}ms")
+    print(f"{'legacy serial':>22}: {legacy_time:.2f}s")
+
+    for concurrency in [1, 4, 8]:
+        client = EmbeddingClient(concurrency=concurrency)
+        start = time.perf_counter()
+        pooled = client.embed_sync(
+            "openai", "stub", texts, batch_size=BATCH_SIZE, url=url
+        )
+        pooled_time = time.perf_counter() - start
+        client.close()
+        assert pooled == expected, "embeddings out of order"
+        print(f"{f'pooled concurrency={concurrency}':>22}: {pooled_time:.2f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
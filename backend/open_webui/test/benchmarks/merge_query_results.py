@@ -0,0 +1,113 @@
+"""
+Benchmark: merging the query results of a chat turn.
+
+Merges 5 queries x 10 collections x k=50 results, with chunks repeated across
+queries and collections, using the previous SHA-256 dedupe and full sort and
+the current `merge_and_sort_query_results`, and checks that both return the
+same results.
+
+    python -m open_webui.test.benchmarks.merge_query_results
+"""
+
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/webui.db"
+
+from open_webui.retrieval.utils import merge_and_sort_query_results  # noqa: E402
+
+QUERIES = 5
+COLLECTIONS = 10
+K = 50
+CHUNKS_PER_COLLECTION = 120
+CHUNK_SIZE = 1_000
+ROUNDS = 200
+
+
+def legacy_merge(query_results: list[dict], k: int) -> dict:
+    combined = dict()
+    for data in query_results:
+        for distance, document, metadata in zip(
+            data["distances"][0], data["documents"][0], data["metadatas"][0]
+        ):
+            if isinstance(document, str):
+                doc_hash = hashlib.sha256(document.encode()).hexdigest()
+                if doc_hash not in combined.keys():
+                    combined[doc_hash] = (distance, document, metadata)
+                    continue
+                if distance > combined[doc_hash][0]:
+                    combined[doc_hash] = (distance, document, metadata)
+
+    combined = list(combined.values())
+    combined.sort(key=lambda x: x[0], reverse=True)
+    sorted_distances, sorted_documents, sorted_metadatas = (
+        zip(*combined[:k]) if combined else ([], [], [])
+    )
+    return {
+        "distances": [list(sorted_distances)],
+        "documents": [list(sorted_documents)],
+        "metadatas": [list(sorted_metadatas)],
+    }
+
+
+def query_results(rng: random.Random) -> list[dict]:
+    # Every collection shares a fifth of its chunks with the next one
+    chunks = [
+        [
+            (
+                f"c{(c + (i < CHUNKS_PER_COLLECTION // 5)) % COLLECTIONS}-{i} "
+                + "x" * CHUNK_SIZE
+            )
+            for i in range(CHUNKS_PER_COLLECTION)
+        ]
+        for c in range(COLLECTIONS)
+    ]
+
+    results = []
+    for _ in range(QUERIES):
+        for c in range(COLLECTIONS):
+            documents = rng.sample(chunks[c], K)
+            distances = sorted(
+                (round(rng.random(), 3) for _ in documents), reverse=True
+            )
+            results.append(
+                {
+                    "ids": [[f"id-{c}-{doc[:12]}" for doc in documents]],
+                    "distances": [distances],
+                    "documents": [documents],
+                    "metadatas": [[{"collection": c} for _ in documents]],
+                }
+            )
+    return results
+
+
+def main():
+    rng = random.Random(0)
+    results = query_results(rng)
+
+    assert merge_and_sort_query_results(results, K) == legacy_merge(results, K)
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        legacy_merge(results, K)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        merge_and_sort_query_results(results, K)
+    merged_time = time.perf_counter() - start
+
+    print(f"results: {QUERIES} queries x {COLLECTIONS} collections x k={K}")
+    print(f"legacy: {legacy_time / ROUNDS * 1000:.2f} ms/merge")
+    print(f"merged: {merged_time / ROUNDS * 1000:.2f} ms/merge")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
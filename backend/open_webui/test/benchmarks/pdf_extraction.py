@@ -0,0 +1,141 @@
+"""
+Benchmark: extracting a large PDF and embedding its pages.
+
+Generates a 600 page PDF and loads it with PyPDFLoader, which returns every page
+once the whole document is extracted, and with ParallelPDFLoader, which
+extracts shards of pages on a pool of worker processes and yields them in order
+as they are extracted. Each page is then handed to a simulated embedding call,
+after the whole document is loaded for PyPDFLoader, and as each page arrives
+for ParallelPDFLoader. Each run happens in a fresh process, with the pool of
+ParallelPDFLoader already started, and reports the time to the first page, the
+total time, and how far the peak RSS of the process consuming the pages grew.
+
+    python -m open_webui.test.benchmarks.pdf_extraction
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+
+PAGES = 600
+LINES_PER_PAGE = 45
+WORKERS = [2, 4]
+PAGES_PER_SHARD = 32
+# Simulated embedding latency of the chunks of one page
+EMBED_SECONDS_PER_PAGE = 0.005
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate_pdf(path: str):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_font("helvetica", size=10)
+    for page in range(PAGES):
+        pdf.add_page()
+        for line in range(LINES_PER_PAGE):
+            pdf.cell(
+                0,
+                5,
+                f"Page {page} line {line}: the quick brown fox jumps over the lazy "
+                f"dog while {page * line} students read chapter {line % 12}.",
+                new_x="LMARGIN",
+                new_y="NEXT",
+            )
+    pdf.output(path)
+
+
+def run(mode: str, workers: int, path: str, results):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    from open_webui.retrieval.loaders.parallel_pdf import (
+        ParallelPDFLoader,
+        extract_pages,
+        get_pdf_executor,
+        shutdown_pdf_executor,
+    )
+
+    if mode != "PyPDFLoader":
+        # The pool is started once per server worker, not for every document
+        executor = get_pdf_executor(workers)
+        futures = [
+            executor.submit(extract_pages, path, 0, ["1"], False)
+            for _ in range(workers)
+        ]
+        for future in futures:
+            future.result()
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    first_page = None
+
+    if mode == "PyPDFLoader":
+        pages = PyPDFLoader(path).load()
+        first_page = time.perf_counter() - start
+    else:
+        pages = ParallelPDFLoader(
+            path, workers=workers, pages_per_shard=PAGES_PER_SHARD
+        ).lazy_load()
+
+    contents = []
+    for page in pages:
+        if first_page is None:
+            first_page = time.perf_counter() - start
+        contents.append(page.page_content)
+        time.sleep(EMBED_SECONDS_PER_PAGE)
+
+    elapsed = time.perf_counter() - start
+    shutdown_pdf_executor()
+    results[(mode, workers)] = (
+        contents,
+        first_page,
+        elapsed,
+        peak_rss_mb() - baseline,
+    )
+
+
+def main():
+    path = os.path.join(DATA_DIR, "reader.pdf")
+    generate_pdf(path)
+    print(f"{PAGES} pages, {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+
+    results = multiprocessing.Manager().dict()
+    runs = [("PyPDFLoader", 1)] + [("ParallelPDFLoader", w) for w in WORKERS]
+
+    print(
+        f"{'loader':>18} {'workers':>8} {'first page s':>13} {'total s':>8}"
+        f" {'peak RSS +MiB':>14}"
+    )
+    expected = None
+    for mode, workers in runs:
+        process = multiprocessing.Process(
+            target=run, args=(mode, workers, path, results)
+        )
+        process.start()
+        process.join()
+
+        contents, first_page, elapsed, rss = results[(mode, workers)]
+        if expected is None:
+            expected = contents
+        assert contents == expected
+        print(
+            f"{mode:>18} {workers:>8} {first_page:>13.2f} {elapsed:>8.2f}"
+            f" {rss:>14.0f}"
+        )
+
+    os.remove(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
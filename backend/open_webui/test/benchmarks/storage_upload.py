@@ -0,0 +1,84 @@
+"""
+Benchmark: worker memory while storing a large upload.
+
+Stores a 1 GiB file through the previous upload path, which read the whole file
+into memory and, for S3, read it back from disk after uploading, and through
+LocalStorageProvider.upload_file, which copies it in chunks and returns its
+size and digest. Each run happens in a fresh process, and reports how far the
+peak RSS of that process grew during the upload.
+
+    python -m open_webui.test.benchmarks.storage_upload
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+
+FILE_SIZE = 1024 * 1024 * 1024
+WRITE_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def legacy_upload(source: str, file_path: str, read_back: bool):
+    with open(source, "rb") as file:
+        contents = file.read()
+    with open(file_path, "wb") as f:
+        f.write(contents)
+    if read_back:
+        contents = open(file_path, "rb").read()
+    return len(contents)
+
+
+def run(mode: str, source: str, results):
+    from open_webui.storage import provider
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    file_path = f"{provider.UPLOAD_DIR}/{mode}.bin"
+    if mode == "streamed":
+        with open(source, "rb") as file:
+            size, _, _ = provider.LocalStorageProvider.upload_file(
+                file, f"{mode}.bin", {}
+            )
+    else:
+        size = legacy_upload(source, file_path, read_back=mode == "buffered (s3)")
+    elapsed = time.perf_counter() - start
+
+    os.remove(file_path)
+    results[mode] = (size, elapsed, peak_rss_mb() - baseline)
+
+
+def main():
+    source = os.path.join(DATA_DIR, "source.bin")
+    block = os.urandom(WRITE_CHUNK_SIZE)
+    with open(source, "wb") as f:
+        for _ in range(FILE_SIZE // WRITE_CHUNK_SIZE):
+            f.write(block)
+
+    results = multiprocessing.Manager().dict()
+    print(f"{'upload path':>16} {'size MiB':>9} {'seconds':>8} {'peak RSS +MiB':>14}")
+    for mode in ["buffered", "buffered (s3)", "streamed"]:
+        process = multiprocessing.Process(target=run, args=(mode, source, results))
+        process.start()
+        process.join()
+
+        size, elapsed, rss = results[mode]
+        assert size == FILE_SIZE
+        print(f"{mode:>16} {size / 1024 / 1024:>9.0f} {elapsed:>8.2f} {rss:>14.0f}")
+
+    os.remove(source)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
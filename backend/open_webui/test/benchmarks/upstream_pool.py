@@ -0,0 +1,93 @@
+"""
+Benchmark: chat completion requests to an upstream.
+
+Starts a local stub upstream and sends the same requests with a new
+`aiohttp.ClientSession` per request, as the OpenAI and Ollama routers did, and
+with sessions from `UpstreamConnectionPool`, reporting the connections opened.
+Over TLS every opened connection is also a handshake.
+
+    python -m open_webui.test.benchmarks.upstream_pool
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="owui-bench-")
+os.environ["DATA_DIR"] = DATA_DIR
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/webui.db"
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from open_webui.utils.http_pool import UpstreamConnectionPool  # noqa: E402
+
+REQUESTS = 500
+CONCURRENCY = 20
+
+
+async def start_stub_server() -> str:
+    async def chat_completions(request: web.Request) -> web.Response:
+        await request.read()
+        return web.json_response({"choices": [{"message": {"content": "ok"}}]})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+async def run(url: str, get_session) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def request():
+        async with semaphore:
+            async with get_session() as session:
+                async with session.post(
+                    f"{url}/chat/completions", json={"messages": []}
+                ) as r:
+                    await r.json()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[request() for _ in range(REQUESTS)])
+    return time.perf_counter() - start
+
+
+async def main():
+    url = await start_stub_server()
+
+    legacy_connections = 0
+
+    async def on_connection_create_end(session, context, params):
+        nonlocal legacy_connections
+        legacy_connections += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    legacy_time = await run(
+        url,
+        lambda: aiohttp.ClientSession(trust_env=True, trace_configs=[trace_config]),
+    )
+
+    pool = UpstreamConnectionPool()
+    pooled_time = await run(url, pool.session)
+    await pool.close()
+
+    print(f"requests: {REQUESTS}, concurrency: {CONCURRENCY}")
+    print(f"session per request: {legacy_time:.2f}s, {legacy_connections} connections")
+    print(
+        f"pooled:              {pooled_time:.2f}s,"
+        f" {pool.stats['connections_created']} connections,"
+        f" reuse rate {pool.reuse_rate():.1%}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
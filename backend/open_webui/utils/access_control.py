@@ -1,10 +1,11 @@
-from typing import Optional, Union, List, Dict, Any
+from typing import Optional, Union, List, Dict, Any, Iterable, TypeVar
 from open_webui.models.users import Users, UserModel
-from open_webui.models.groups import Groups
+from open_webui.models.groups import GROUP_MEMBERSHIP_CACHE, Groups
 
 
 from open_webui.config import DEFAULT_USER_PERMISSIONS
-import json
+
+T = TypeVar("T")
 
 
 def fill_missing_permissions(
@@ -25,6 +26,24 @@ def fill_missing_permissions(
     return permissions
 
 
+def copy_permissions(permissions: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: copy_permissions(value) if isinstance(value, dict) else value
+        for key, value in permissions.items()
+    }
+
+
+def get_user_group_ids(user_id: str) -> set[str]:
+    group_ids = GROUP_MEMBERSHIP_CACHE.get(user_id, "group_ids")
+    if group_ids is None:
+        version = GROUP_MEMBERSHIP_CACHE.version
+        group_ids = {
+            group.id for group in Groups.get_cached_groups_by_member_id(user_id)
+        }
+        GROUP_MEMBERSHIP_CACHE.set(user_id, group_ids, version, "group_ids")
+    return group_ids
+
+
 def get_permissions(
     user_id: str,
     default_permissions: Dict[str, Any],
@@ -53,10 +72,16 @@ def get_permissions(
                     )  # Use the most permissive value (True > False)
         return permissions
 
-    user_groups = Groups.get_groups_by_member_id(user_id)
+    # Merged permissions are reused while the groups and the defaults are unchanged
+    cached = GROUP_MEMBERSHIP_CACHE.get(user_id, "permissions")
+    if cached is not None and cached[0] == default_permissions:
+        return copy_permissions(cached[1])
+
+    version = GROUP_MEMBERSHIP_CACHE.version
+    user_groups = Groups.get_cached_groups_by_member_id(user_id)
 
     # Deep copy default permissions to avoid modifying the original dict
-    permissions = json.loads(json.dumps(default_permissions))
+    permissions = copy_permissions(default_permissions)
 
     # Combine permissions from all user groups
     for group in user_groups:
@@ -66,6 +91,12 @@ def get_permissions(
     # Ensure all fields from default_permissions are present and filled in
     permissions = fill_missing_permissions(permissions, default_permissions)
 
+    GROUP_MEMBERSHIP_CACHE.set(
+        user_id,
+        (copy_permissions(default_permissions), copy_permissions(permissions)),
+        version,
+        "permissions",
+    )
     return permissions
 
 
@@ -93,7 +124,7 @@ def has_permission(
     permission_hierarchy = permission_key.split(".")
 
     # Retrieve user group permissions
-    user_groups = Groups.get_groups_by_member_id(user_id)
+    user_groups = Groups.get_cached_groups_by_member_id(user_id)
 
     for group in user_groups:
         group_permissions = group.permissions
@@ -115,17 +146,42 @@ def has_access(
     if access_control is None:
         return type == "read"
 
-    user_groups = Groups.get_groups_by_member_id(user_id)
-    user_group_ids = [group.id for group in user_groups]
+    return _has_group_access(user_id, get_user_group_ids(user_id), type, access_control)
+
+
+def _has_group_access(
+    user_id: str, user_group_ids: set[str], type: str, access_control: dict
+) -> bool:
     permission_access = access_control.get(type, {})
     permitted_group_ids = permission_access.get("group_ids", [])
     permitted_user_ids = permission_access.get("user_ids", [])
 
     return user_id in permitted_user_ids or any(
-        group_id in permitted_group_ids for group_id in user_group_ids
+        group_id in user_group_ids for group_id in permitted_group_ids
     )
 
 
+def filter_accessible(user_id: str, items: Iterable[T], type: str = "write") -> List[T]:
+    """
+    Keep the items (with `user_id` and `access_control` attributes) that a user
+    owns or has `type` access to, looking up the user's groups once.
+    """
+    user_group_ids = None
+    accessible = []
+    for item in items:
+        if item.user_id == user_id:
+            accessible.append(item)
+        elif item.access_control is None:
+            if type == "read":
+                accessible.append(item)
+        else:
+            if user_group_ids is None:
+                user_group_ids = get_user_group_ids(user_id)
+            if _has_group_access(user_id, user_group_ids, type, item.access_control):
+                accessible.append(item)
+    return accessible
+
+
 # Get all users with access to a resource
 def get_users_with_access(
     type: str = "write", access_control: Optional[dict] = None
@@ -272,7 +272,7 @@ def get_current_user(
         )
 
     if data is not None and "id" in data:
-        user = Users.get_user_by_id(data["id"])
+        user = Users.get_cached_user_by_id(data["id"])
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -302,10 +302,8 @@ def get_current_user(
                 current_span.set_attribute("client.user.role", user.role)
                 current_span.set_attribute("client.auth.type", "jwt")
 
-            # Refresh the user's last active timestamp asynchronously
-            # to prevent blocking the request
-            if background_tasks:
-                background_tasks.add_task(Users.update_user_last_active_by_id, user.id)
+            # Refresh the user's last active timestamp, written in batches
+            Users.mark_user_active_by_id(user.id)
         return user
     else:
         raise HTTPException(
@@ -315,7 +313,7 @@ def get_current_user(
 
 
 def get_current_user_by_api_key(api_key: str):
-    user = Users.get_user_by_api_key(api_key)
+    user = Users.get_cached_user_by_api_key(api_key)
 
     if user is None:
         raise HTTPException(
@@ -331,7 +329,7 @@ def get_current_user_by_api_key(api_key: str):
             current_span.set_attribute("client.user.role", user.role)
             current_span.set_attribute("client.auth.type", "api_key")
 
-        Users.update_user_last_active_by_id(user.id)
+        Users.mark_user_active_by_id(user.id)
 
     return user
 
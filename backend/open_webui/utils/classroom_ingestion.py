@@ -0,0 +1,548 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+from fastapi import HTTPException, Request
+from langchain_core.documents import Document
+
+from open_webui.env import (
+    CLASSROOM_INGESTION_WORKERS,
+    REDIS_KEY_PREFIX,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.classroom import Materials, MaterialModel
+from open_webui.models.files import Files
+from open_webui.models.knowledge import Knowledges, KnowledgeModel
+from open_webui.retrieval.loaders.main import Loader
+from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
+from open_webui.routers.retrieval import (
+    BatchProcessFilesResponse,
+    BatchProcessFilesResult,
+    ProcessFileForm,
+    process_file,
+    save_docs_stream_to_vector_db,
+    save_docs_to_vector_db,
+)
+from open_webui.socket.main import sio, USER_POOL
+from open_webui.tasks import create_task, list_task_ids_by_item_id, stop_item_tasks
+from open_webui.utils.misc import calculate_sha256_string
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Smallest progress change reported while the pages of a document stream in
+PAGE_PROGRESS_STEP = 0.05
+
+# With Redis, every job refreshes a heartbeat each INGESTION_HEARTBEAT_INTERVAL
+# seconds; a job whose heartbeat is older than INGESTION_HEARTBEAT_TTL is lost
+INGESTION_HEARTBEAT_INTERVAL = 10
+INGESTION_HEARTBEAT_TTL = 60
+
+
+class IngestionCancelled(Exception):
+    pass
+
+
+def course_collection_name(course_id: str) -> str:
+    # Keep short, vector dbs like Chroma may limit to 63 chars
+    return f"course-{course_id}"[:63]
+
+
+def report_page_progress(
+    docs: Iterable[Document], update, start: float = 0.1, end: float = 0.9
+) -> Iterator[Document]:
+    """
+    Yield the pages of a streamed document, reporting the ingestion progress
+    from their page numbers in steps of at least PAGE_PROGRESS_STEP.
+    """
+    reported = start
+    for doc in docs:
+        total_pages = doc.metadata.get("total_pages")
+        if total_pages:
+            progress = start + (end - start) * (
+                (doc.metadata.get("page", 0) + 1) / total_pages
+            )
+            if progress - reported >= PAGE_PROGRESS_STEP:
+                update({"progress": round(progress, 2)})
+                reported = progress
+        yield doc
+
+
+def get_material_task_item_id(material_id: str) -> str:
+    return f"material:{material_id}"
+
+
+def get_loader(request: Request) -> Loader:
+    return Loader(
+        engine=request.app.state.config.CONTENT_EXTRACTION_ENGINE,
+        DATALAB_MARKER_API_KEY=request.app.state.config.DATALAB_MARKER_API_KEY,
+        DATALAB_MARKER_LANGS=request.app.state.config.DATALAB_MARKER_LANGS,
+        DATALAB_MARKER_SKIP_CACHE=request.app.state.config.DATALAB_MARKER_SKIP_CACHE,
+        DATALAB_MARKER_FORCE_OCR=request.app.state.config.DATALAB_MARKER_FORCE_OCR,
+        DATALAB_MARKER_PAGINATE=request.app.state.config.DATALAB_MARKER_PAGINATE,
+        DATALAB_MARKER_STRIP_EXISTING_OCR=request.app.state.config.DATALAB_MARKER_STRIP_EXISTING_OCR,
+        DATALAB_MARKER_DISABLE_IMAGE_EXTRACTION=request.app.state.config.DATALAB_MARKER_DISABLE_IMAGE_EXTRACTION,
+        DATALAB_MARKER_USE_LLM=request.app.state.config.DATALAB_MARKER_USE_LLM,
+        DATALAB_MARKER_OUTPUT_FORMAT=request.app.state.config.DATALAB_MARKER_OUTPUT_FORMAT,
+        EXTERNAL_DOCUMENT_LOADER_URL=request.app.state.config.EXTERNAL_DOCUMENT_LOADER_URL,
+        EXTERNAL_DOCUMENT_LOADER_API_KEY=request.app.state.config.EXTERNAL_DOCUMENT_LOADER_API_KEY,
+        TIKA_SERVER_URL=request.app.state.config.TIKA_SERVER_URL,
+        DOCLING_SERVER_URL=request.app.state.config.DOCLING_SERVER_URL,
+        DOCLING_PARAMS={
+            "ocr_engine": request.app.state.config.DOCLING_OCR_ENGINE,
+            "ocr_lang": request.app.state.config.DOCLING_OCR_LANG,
+            "do_picture_description": request.app.state.config.DOCLING_DO_PICTURE_DESCRIPTION,
+            "picture_description_mode": request.app.state.config.DOCLING_PICTURE_DESCRIPTION_MODE,
+            "picture_description_local": request.app.state.config.DOCLING_PICTURE_DESCRIPTION_LOCAL,
+            "picture_description_api": request.app.state.config.DOCLING_PICTURE_DESCRIPTION_API,
+        },
+        PDF_EXTRACT_IMAGES=request.app.state.config.PDF_EXTRACT_IMAGES,
+        DOCUMENT_INTELLIGENCE_ENDPOINT=request.app.state.config.DOCUMENT_INTELLIGENCE_ENDPOINT,
+        DOCUMENT_INTELLIGENCE_KEY=request.app.state.config.DOCUMENT_INTELLIGENCE_KEY,
+        MISTRAL_OCR_API_KEY=request.app.state.config.MISTRAL_OCR_API_KEY,
+    )
+
+
+async def emit_ingestion_event(user_id: str, material: MaterialModel):
+    """Send the ingestion state of a material to every session of a user."""
+    await asyncio.gather(
+        *[
+            sio.emit(
+                "classroom-events",
+                {
+                    "type": "material:ingestion",
+                    "data": {
+                        "course_id": material.course_id,
+                        "material_id": material.id,
+                        "ingestion": (material.meta_json or {}).get("ingestion"),
+                    },
+                },
+                to=session_id,
+            )
+            for session_id in await USER_POOL.get(user_id)
+        ]
+    )
+
+
+async def attach_files_to_knowledge(
+    request: Request,
+    knowledge: KnowledgeModel,
+    file_ids: list[str],
+    user,
+    workers: int = CLASSROOM_INGESTION_WORKERS,
+) -> tuple[KnowledgeModel, BatchProcessFilesResponse]:
+    """
+    Extract and embed files into the collection of a knowledge base on up to
+    `workers` threads, then add the processed files to the knowledge base in a
+    single update. Failed files are reported and left out of the knowledge base.
+    """
+    file_ids = list(dict.fromkeys(file_ids))
+
+    def attach(file_id: str) -> BatchProcessFilesResult:
+        try:
+            process_file(
+                request,
+                ProcessFileForm(file_id=file_id, collection_name=knowledge.id),
+                user=user,
+            )
+            return BatchProcessFilesResult(file_id=file_id, status="completed")
+        except Exception as e:
+            log.error(f"Error attaching file {file_id} to {knowledge.id}: {e}")
+            return BatchProcessFilesResult(
+                file_id=file_id,
+                status="failed",
+                error=e.detail if isinstance(e, HTTPException) else str(e),
+            )
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(
+        max_workers=max(min(workers, len(file_ids)), 1),
+        thread_name_prefix="knowledge-attach",
+    ) as executor:
+        results = await asyncio.gather(
+            *[loop.run_in_executor(executor, attach, file_id) for file_id in file_ids]
+        )
+
+    attached = [result.file_id for result in results if result.status == "completed"]
+    if attached:
+        data = knowledge.data or {}
+        knowledge = (
+            Knowledges.update_knowledge_data_by_id(
+                knowledge.id,
+                {
+                    **data,
+                    "file_ids": list(
+                        dict.fromkeys([*data.get("file_ids", []), *attached])
+                    ),
+                },
+            )
+            or knowledge
+        )
+
+    return knowledge, BatchProcessFilesResponse(
+        results=[result for result in results if result.status == "completed"],
+        errors=[result for result in results if result.status == "failed"],
+    )
+
+
+class MaterialIngestionQueue:
+    """
+    Background ingestion of classroom materials.
+
+    Every material is one job registered through `tasks.create_task`, so it can
+    be listed and cancelled like any other task. Jobs extract, split and embed
+    on a pool of CLASSROOM_INGESTION_WORKERS threads; jobs beyond that wait in
+    the pool queue with the status "queued". The job state is kept in the
+    `ingestion` block of the material meta and every change is sent to the
+    socket sessions of the user that queued it.
+
+    Jobs lost with a stopped worker are failed by `run`, so that they can be
+    retried. With Redis, the task ids of a crashed replica are never cleaned up,
+    so a job counts as alive only while its heartbeat has not expired.
+    """
+
+    def __init__(self, workers: int = CLASSROOM_INGESTION_WORKERS):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="classroom-ingestion"
+        )
+
+    async def enqueue(
+        self,
+        request: Request,
+        material: MaterialModel,
+        user,
+        use_extraction_cache: bool = True,
+    ) -> str:
+        redis = request.app.state.redis
+        if redis:
+            # Alive before it is queued, so that `recover` never fails it
+            await self._beat(redis, material.id)
+
+        ingestion = (material.meta_json or {}).get("ingestion") or {}
+        material = Materials.update_ingestion(
+            material.id,
+            {
+                "status": "queued",
+                "stage": None,
+                "progress": 0,
+                "error": None,
+                "attempts": ingestion.get("attempts", 0) + 1,
+                "queued_at": int(time.time()),
+                "started_at": None,
+                "completed_at": None,
+            },
+        )
+
+        # The job waits until its task id is stored, so that its own updates
+        # cannot be overwritten by this one
+        ready = asyncio.Event()
+        task_id, _ = await create_task(
+            redis,
+            self._run(request, material, user, ready, use_extraction_cache),
+            id=get_material_task_item_id(material.id),
+        )
+        material = Materials.update_ingestion(material.id, {"task_id": task_id})
+        ready.set()
+
+        await emit_ingestion_event(user.id, material)
+        return task_id
+
+    async def is_active(self, request: Request, material_id: str) -> bool:
+        return await self._is_alive(request.app.state.redis, material_id)
+
+    def _heartbeat_key(self, material_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:classroom:ingestion:{material_id}"
+
+    async def _beat(self, redis, material_id: str):
+        await redis.set(
+            self._heartbeat_key(material_id), "1", ex=INGESTION_HEARTBEAT_TTL
+        )
+
+    async def _heartbeat(self, redis, material_id: str):
+        while True:
+            try:
+                await self._beat(redis, material_id)
+            except Exception as e:
+                log.warning(f"Failed to refresh ingestion heartbeat: {e}")
+            await asyncio.sleep(INGESTION_HEARTBEAT_INTERVAL)
+
+    async def _is_alive(self, redis, material_id: str) -> bool:
+        if redis:
+            return bool(await redis.exists(self._heartbeat_key(material_id)))
+        return bool(
+            await list_task_ids_by_item_id(
+                redis, get_material_task_item_id(material_id)
+            )
+        )
+
+    async def cancel(self, request: Request, material: MaterialModel, user) -> dict:
+        result = await stop_item_tasks(
+            request.app.state.redis, get_material_task_item_id(material.id)
+        )
+
+        # Jobs lost with a restarted worker have no task left to cancel
+        ingestion = (material.meta_json or {}).get("ingestion") or {}
+        if ingestion.get("status") in [
+            "queued",
+            "running",
+        ] and not await self.is_active(request, material.id):
+            material = Materials.update_ingestion(
+                material.id,
+                {"status": "cancelled", "completed_at": int(time.time())},
+            )
+            await emit_ingestion_event(user.id, material)
+
+        return result
+
+    async def recover(self, redis) -> int:
+        """
+        Fail the jobs left queued or running by a worker that stopped, which no
+        task will ever complete.
+        """
+        recovered = 0
+        for material in Materials.list_by_ingestion_status(["queued", "running"]):
+            if await self._is_alive(redis, material.id):
+                continue
+            # Unless it completed since it was listed
+            material = Materials.get_by_id(material.id)
+            ingestion = ((material and material.meta_json) or {}).get("ingestion") or {}
+            if ingestion.get("status") not in ["queued", "running"]:
+                continue
+            Materials.update_ingestion(
+                material.id,
+                {
+                    "status": "error",
+                    "error": "Ingestion was interrupted by a server restart",
+                    "completed_at": int(time.time()),
+                },
+            )
+            recovered += 1
+
+        if recovered:
+            log.info(f"Marked {recovered} interrupted material ingestion(s) as failed")
+        return recovered
+
+    async def run(self, redis):
+        """Recover lost jobs at startup, then every INGESTION_HEARTBEAT_TTL seconds."""
+        while True:
+            try:
+                await self.recover(redis)
+            except Exception as e:
+                log.warning(f"Failed to recover interrupted material ingestions: {e}")
+            await asyncio.sleep(INGESTION_HEARTBEAT_TTL)
+
+    async def _run(
+        self,
+        request: Request,
+        material: MaterialModel,
+        user,
+        ready: asyncio.Event,
+        use_extraction_cache: bool,
+    ):
+        await ready.wait()
+
+        redis = request.app.state.redis
+        heartbeat = (
+            asyncio.create_task(self._heartbeat(redis, material.id)) if redis else None
+        )
+        try:
+            await self._ingest_in_executor(
+                request, material, user, use_extraction_cache
+            )
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+                try:
+                    await redis.delete(self._heartbeat_key(material.id))
+                except Exception as e:
+                    log.warning(f"Failed to clear ingestion heartbeat: {e}")
+
+    async def _ingest_in_executor(
+        self,
+        request: Request,
+        material: MaterialModel,
+        user,
+        use_extraction_cache: bool,
+    ):
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+
+        def update(patch: dict):
+            if cancelled.is_set():
+                raise IngestionCancelled()
+            updated = Materials.update_ingestion(material.id, patch)
+            if updated:
+                asyncio.run_coroutine_threadsafe(
+                    emit_ingestion_event(user.id, updated), loop
+                )
+
+        try:
+            await loop.run_in_executor(
+                self.executor,
+                self._ingest,
+                request,
+                material,
+                user,
+                update,
+                cancelled,
+                use_extraction_cache,
+            )
+        except asyncio.CancelledError:
+            cancelled.set()
+            updated = Materials.update_ingestion(
+                material.id, {"status": "cancelled", "completed_at": int(time.time())}
+            )
+            if updated:
+                await emit_ingestion_event(user.id, updated)
+            raise
+        except IngestionCancelled:
+            pass
+        except Exception as e:
+            log.exception(f"Error ingesting material {material.id}: {e}")
+            updated = Materials.update_ingestion(
+                material.id,
+                {
+                    "status": "error",
+                    "error": str(e),
+                    "completed_at": int(time.time()),
+                },
+            )
+            if updated:
+                await emit_ingestion_event(user.id, updated)
+
+    def _ingest(
+        self,
+        request: Request,
+        material: MaterialModel,
+        user,
+        update,
+        cancelled: threading.Event,
+        use_extraction_cache: bool,
+    ):
+        update(
+            {
+                "status": "running",
+                "stage": "extracting",
+                "progress": 0.1,
+                "started_at": int(time.time()),
+                "extraction": None,
+            }
+        )
+
+        course_id = material.course_id
+        file = Files.get_file_by_id(material.uri_or_blob_id)
+        if not file:
+            raise ValueError("Invalid file id")
+
+        metadata = {
+            "name": file.filename,
+            "created_by": file.user_id,
+            "file_id": file.id,
+            "source": file.filename,
+            "course_id": course_id,
+            "material_id": material.id,
+        }
+
+        # Build docs from file (uploaded docs only). No web/youtube ingestion here.
+        extraction = None
+        streamed = False
+        if file.path:
+            from open_webui.storage.provider import Storage
+
+            file_path = Storage.get_file(file.path)
+            content_type = (file.meta or {}).get(
+                "content_type"
+            ) or "application/octet-stream"
+            loader = get_loader(request)
+            docs = loader.lazy_load(
+                file.filename, content_type, file_path, use_cache=use_extraction_cache
+            )
+            docs = (
+                Document(
+                    page_content=doc.page_content,
+                    metadata={**doc.metadata, **metadata},
+                )
+                for doc in docs
+            )
+            streamed = loader.streamed
+            if not streamed:
+                docs = list(docs)
+                extraction = loader.extraction
+        else:
+            text = (file.data or {}).get("content", "")
+            docs = [
+                Document(
+                    page_content=text,
+                    metadata={**(file.meta or {}), **metadata},
+                )
+            ]
+
+        collection_name = course_collection_name(course_id)
+        if streamed:
+            # Pages are split and embedded while the rest of the file is still
+            # being extracted
+            update({"stage": "embedding"})
+            text_content = save_docs_stream_to_vector_db(
+                request,
+                docs=report_page_progress(docs, update),
+                collection_name=collection_name,
+                metadata={
+                    "file_id": file.id,
+                    "name": file.filename,
+                    "course_id": course_id,
+                    "material_id": material.id,
+                },
+                add=True,
+                user=user,
+            )
+            extraction = loader.extraction
+            Files.update_file_hash_by_id(file.id, calculate_sha256_string(text_content))
+            Files.update_file_data_by_id(file.id, {"content": text_content})
+        else:
+            text_content = " ".join([d.page_content for d in docs])
+            file_hash = calculate_sha256_string(text_content)
+            Files.update_file_hash_by_id(file.id, file_hash)
+            Files.update_file_data_by_id(file.id, {"content": text_content})
+
+            update({"stage": "embedding", "progress": 0.5, "extraction": extraction})
+
+            save_docs_to_vector_db(
+                request,
+                docs=docs,
+                collection_name=collection_name,
+                metadata={
+                    "file_id": file.id,
+                    "name": file.filename,
+                    "hash": file_hash,
+                    "course_id": course_id,
+                    "material_id": material.id,
+                },
+                add=True,
+                user=user,
+            )
+
+        if cancelled.is_set():
+            # Cancelled while embedding, drop what was just indexed
+            VECTOR_DB_CLIENT.delete(
+                collection_name=collection_name, filter={"material_id": material.id}
+            )
+            raise IngestionCancelled()
+
+        update(
+            {
+                "status": "done",
+                "stage": None,
+                "progress": 1,
+                "completed_at": int(time.time()),
+                "collection": collection_name,
+                "extraction": extraction,
+            }
+        )
+
+
+MATERIAL_INGESTION_QUEUE = MaterialIngestionQueue()
@@ -0,0 +1,184 @@
+import html
+import json
+
+
+def split_content_and_whitespace(content):
+    content_stripped = content.rstrip()
+    original_whitespace = (
+        content[len(content_stripped) :] if len(content) > len(content_stripped) else ""
+    )
+    return content_stripped, original_whitespace
+
+
+def is_opening_code_block(content):
+    backtick_segments = content.split("```")
+    # Even number of segments means the last backticks are opening a new block
+    return len(backtick_segments) > 1 and len(backtick_segments) % 2 == 0
+
+
+def serialize_content_block(content: str, block: dict, raw: bool = False) -> str:
+    """Append the rendering of a single content block to the serialized `content`."""
+    if block["type"] == "text":
+        content = f"{content}{block['content'].strip()}\n"
+    elif block["type"] == "tool_calls":
+        attributes = block.get("attributes", {})
+
+        tool_calls = block.get("content", [])
+        results = block.get("results", [])
+
+        if results:
+
+            tool_calls_display_content = ""
+            for tool_call in tool_calls:
+
+                tool_call_id = tool_call.get("id", "")
+                tool_name = tool_call.get("function", {}).get("name", "")
+                tool_arguments = tool_call.get("function", {}).get("arguments", "")
+
+                tool_result = None
+                tool_result_files = None
+                for result in results:
+                    if tool_call_id == result.get("tool_call_id", ""):
+                        tool_result = result.get("content", None)
+                        tool_result_files = result.get("files", None)
+                        break
+
+                if tool_result:
+                    tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="true" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}" result="{html.escape(json.dumps(tool_result, ensure_ascii=False))}" files="{html.escape(json.dumps(tool_result_files)) if tool_result_files else ""}">\n<summary>Tool Executed</summary>\n</details>\n'
+                else:
+                    tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>'
+
+            if not raw:
+                content = f"{content}\n{tool_calls_display_content}\n\n"
+        else:
+            tool_calls_display_content = ""
+
+            for tool_call in tool_calls:
+                tool_call_id = tool_call.get("id", "")
+                tool_name = tool_call.get("function", {}).get("name", "")
+                tool_arguments = tool_call.get("function", {}).get("arguments", "")
+
+                tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>'
+
+            if not raw:
+                content = f"{content}\n{tool_calls_display_content}\n\n"
+
+    elif block["type"] == "reasoning":
+        reasoning_display_content = "\n".join(
+            (f"> {line}" if not line.startswith(">") else line)
+            for line in block["content"].splitlines()
+        )
+
+        reasoning_duration = block.get("duration", None)
+
+        if reasoning_duration is not None:
+            if raw:
+                content = f'{content}\n{block["start_tag"]}{block["content"]}{block["end_tag"]}\n'
+            else:
+                content = f'{content}\n<details type="reasoning" done="true" duration="{reasoning_duration}">\n<summary>Thought for {reasoning_duration} seconds</summary>\n{reasoning_display_content}\n</details>\n'
+        else:
+            if raw:
+                content = f'{content}\n{block["start_tag"]}{block["content"]}{block["end_tag"]}\n'
+            else:
+                content = f'{content}\n<details type="reasoning" done="false">\n<summary>Thinking…</summary>\n{reasoning_display_content}\n</details>\n'
+
+    elif block["type"] == "code_interpreter":
+        attributes = block.get("attributes", {})
+        output = block.get("output", None)
+        lang = attributes.get("lang", "")
+
+        content_stripped, original_whitespace = split_content_and_whitespace(content)
+        if is_opening_code_block(content_stripped):
+            # Remove trailing backticks that would open a new block
+            content = content_stripped.rstrip("`").rstrip() + original_whitespace
+        else:
+            # Keep content as is - either closing backticks or no backticks
+            content = content_stripped + original_whitespace
+
+        if output:
+            output = html.escape(json.dumps(output))
+
+            if raw:
+                content = f'{content}\n<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n```output\n{output}\n```\n'
+            else:
+                content = f'{content}\n<details type="code_interpreter" done="true" output="{output}">\n<summary>Analyzed</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+        else:
+            if raw:
+                content = f'{content}\n<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n'
+            else:
+                content = f'{content}\n<details type="code_interpreter" done="false">\n<summary>Analyzing...</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+
+    else:
+        block_content = str(block["content"]).strip()
+        content = f"{content}{block['type']}: {block_content}\n"
+
+    return content
+
+
+def serialize_content_blocks(content_blocks: list[dict], raw: bool = False) -> str:
+    content = ""
+
+    for block in content_blocks:
+        content = serialize_content_block(content, block, raw)
+
+    return content.strip()
+
+
+class ContentBlockSerializer:
+    """
+    Incremental `serialize_content_blocks` for a single streamed response.
+
+    While streaming only the last content block is mutated, every block before it is
+    finished. The serialized prefix of finished blocks is cached so that each call
+    only renders the open tail block, instead of re-rendering (and re-escaping) the
+    whole response on every token. The output is identical to `serialize_content_blocks`.
+    """
+
+    def __init__(self, raw: bool = False):
+        self.raw = raw
+
+        self._blocks: list[dict] = []
+        self._fingerprints: list[tuple] = []
+        # _prefixes[i] is the serialized content after the first i cached blocks
+        self._prefixes: list[str] = [""]
+
+    @staticmethod
+    def _fingerprint(block: dict) -> tuple:
+        content = block.get("content")
+        return (
+            block.get("type"),
+            len(content) if isinstance(content, (str, list)) else None,
+            len(block.get("results") or []),
+            block.get("output") is not None,
+            block.get("duration"),
+        )
+
+    def serialize(self, content_blocks: list[dict]) -> str:
+        finished = len(content_blocks) - 1 if content_blocks else 0
+
+        # Drop cached blocks that were popped, replaced or modified in place
+        cached = 0
+        while (
+            cached < len(self._blocks)
+            and cached < finished
+            and self._blocks[cached] is content_blocks[cached]
+            and self._fingerprints[cached] == self._fingerprint(content_blocks[cached])
+        ):
+            cached += 1
+
+        del self._blocks[cached:]
+        del self._fingerprints[cached:]
+        del self._prefixes[cached + 1 :]
+
+        for block in content_blocks[cached:finished]:
+            self._blocks.append(block)
+            self._fingerprints.append(self._fingerprint(block))
+            self._prefixes.append(
+                serialize_content_block(self._prefixes[-1], block, self.raw)
+            )
+
+        content = self._prefixes[-1]
+        if content_blocks:
+            content = serialize_content_block(content, content_blocks[-1], self.raw)
+
+        return content.strip()
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+from open_webui.env import (
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_POOL_LIMIT,
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class UpstreamConnectionPool:
+    """
+    Keep-alive connection pool shared by the requests to the OpenAI and Ollama
+    upstreams for the lifetime of the app.
+
+    Connections are pooled per upstream (host, port and TLS) by one connector,
+    which caps them at `limit` in total and `limit_per_host` per upstream; requests
+    over the cap wait for a free connection. `session` returns a light session on
+    top of the connector, closing it releases its connections back to the pool.
+    """
+
+    def __init__(
+        self,
+        limit: int = AIOHTTP_CLIENT_POOL_LIMIT,
+        limit_per_host: int = AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+        }
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._count("requests"))
+        self.trace_config.on_connection_create_end.append(
+            self._count("connections_created")
+        )
+        self.trace_config.on_connection_reuseconn.append(
+            self._count("connections_reused")
+        )
+
+    def _count(self, stat: str):
+        async def callback(session, context, params):
+            self.stats[stat] += 1
+
+        return callback
+
+    def _get_connector(self) -> aiohttp.TCPConnector:
+        loop = asyncio.get_running_loop()
+        if self._connector is None or self._connector.closed or self._loop is not loop:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._loop = loop
+        return self._connector
+
+    def session(
+        self, timeout: Optional[aiohttp.ClientTimeout] = None
+    ) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            connector=self._get_connector(),
+            connector_owner=False,
+            trust_env=True,
+            trace_configs=[self.trace_config],
+            **({"timeout": timeout} if timeout else {}),
+        )
+
+    def reuse_rate(self) -> float:
+        connections = (
+            self.stats["connections_created"] + self.stats["connections_reused"]
+        )
+        return self.stats["connections_reused"] / connections if connections else 0.0
+
+    async def close(self):
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+        self._connector = None
+
+
+UPSTREAM_POOL = UpstreamConnectionPool()
@@ -9,7 +9,6 @@ from aiocache import cached
 from typing import Any, Optional
 import random
 import json
-import html
 import inspect
 import re
 import ast
@@ -83,6 +82,11 @@ from open_webui.utils.filter import (
     process_filter_functions,
 )
 from open_webui.utils.code_interpreter import execute_code_jupyter
+from open_webui.utils.content_blocks import (
+    ContentBlockSerializer,
+    serialize_content_blocks,
+)
+from open_webui.utils.write_behind import CHAT_MESSAGE_WRITE_BUFFER
 
 from open_webui.tasks import create_task
 
@@ -1113,7 +1117,7 @@ async def process_chat_response(
                                 "follow_ups", []
                             )
 
-                            Chats.upsert_message_to_chat_by_id_and_message_id(
+                            Chats.upsert_message_by_id_and_message_id(
                                 metadata["chat_id"],
                                 metadata["message_id"],
                                 {
@@ -1253,7 +1257,7 @@ async def process_chat_response(
         if event_emitter:
             if "error" in response:
                 error = response["error"].get("detail", response["error"])
-                Chats.upsert_message_to_chat_by_id_and_message_id(
+                Chats.upsert_message_by_id_and_message_id(
                     metadata["chat_id"],
                     metadata["message_id"],
                     {
@@ -1262,7 +1266,7 @@ async def process_chat_response(
                 )
 
             if "selected_model_id" in response:
-                Chats.upsert_message_to_chat_by_id_and_message_id(
+                Chats.upsert_message_by_id_and_message_id(
                     metadata["chat_id"],
                     metadata["message_id"],
                     {
@@ -1297,7 +1301,7 @@ async def process_chat_response(
                     )
 
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    Chats.upsert_message_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -1307,7 +1311,7 @@ async def process_chat_response(
                     )
 
                     # Send a webhook notification if the user is not active
-                    if not get_active_status_by_user_id(user.id):
+                    if not await get_active_status_by_user_id(user.id):
                         webhook_url = Users.get_user_webhook_url_by_id(user.id)
                         if webhook_url:
                             post_webhook(
@@ -1378,10 +1382,14 @@ async def process_chat_response(
 
     # Streaming response
     if event_emitter and event_caller:
+        # Events of the stream are sent in batches, flushed when it ends
+        event_emitter = get_event_emitter(metadata, batch=True)
+        extra_params["__event_emitter__"] = event_emitter
+
         task_id = str(uuid4())  # Create a unique task ID.
         model_id = form_data.get("model", "")
 
-        Chats.upsert_message_to_chat_by_id_and_message_id(
+        Chats.upsert_message_by_id_and_message_id(
             metadata["chat_id"],
             metadata["message_id"],
             {
@@ -1389,135 +1397,8 @@ async def process_chat_response(
             },
         )
 
-        def split_content_and_whitespace(content):
-            content_stripped = content.rstrip()
-            original_whitespace = (
-                content[len(content_stripped) :]
-                if len(content) > len(content_stripped)
-                else ""
-            )
-            return content_stripped, original_whitespace
-
-        def is_opening_code_block(content):
-            backtick_segments = content.split("```")
-            # Even number of segments means the last backticks are opening a new block
-            return len(backtick_segments) > 1 and len(backtick_segments) % 2 == 0
-
         # Handle as a background task
         async def response_handler(response, events):
-            def serialize_content_blocks(content_blocks, raw=False):
-                content = ""
-
-                for block in content_blocks:
-                    if block["type"] == "text":
-                        content = f"{content}{block['content'].strip()}\n"
-                    elif block["type"] == "tool_calls":
-                        attributes = block.get("attributes", {})
-
-                        tool_calls = block.get("content", [])
-                        results = block.get("results", [])
-
-                        if results:
-
-                            tool_calls_display_content = ""
-                            for tool_call in tool_calls:
-
-                                tool_call_id = tool_call.get("id", "")
-                                tool_name = tool_call.get("function", {}).get(
-                                    "name", ""
-                                )
-                                tool_arguments = tool_call.get("function", {}).get(
-                                    "arguments", ""
-                                )
-
-                                tool_result = None
-                                tool_result_files = None
-                                for result in results:
-                                    if tool_call_id == result.get("tool_call_id", ""):
-                                        tool_result = result.get("content", None)
-                                        tool_result_files = result.get("files", None)
-                                        break
-
-                                if tool_result:
-                                    tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="true" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}" result="{html.escape(json.dumps(tool_result, ensure_ascii=False))}" files="{html.escape(json.dumps(tool_result_files)) if tool_result_files else ""}">\n<summary>Tool Executed</summary>\n</details>\n'
-                                else:
-                                    tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>'
-
-                            if not raw:
-                                content = f"{content}\n{tool_calls_display_content}\n\n"
-                        else:
-                            tool_calls_display_content = ""
-
-                            for tool_call in tool_calls:
-                                tool_call_id = tool_call.get("id", "")
-                                tool_name = tool_call.get("function", {}).get(
-                                    "name", ""
-                                )
-                                tool_arguments = tool_call.get("function", {}).get(
-                                    "arguments", ""
-                                )
-
-                                tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>'
-
-                            if not raw:
-                                content = f"{content}\n{tool_calls_display_content}\n\n"
-
-                    elif block["type"] == "reasoning":
-                        reasoning_display_content = "\n".join(
-                            (f"> {line}" if not line.startswith(">") else line)
-                            for line in block["content"].splitlines()
-                        )
-
-                        reasoning_duration = block.get("duration", None)
-
-                        if reasoning_duration is not None:
-                            if raw:
-                                content = f'{content}\n{block["start_tag"]}{block["content"]}{block["end_tag"]}\n'
-                            else:
-                                content = f'{content}\n<details type="reasoning" done="true" duration="{reasoning_duration}">\n<summary>Thought for {reasoning_duration} seconds</summary>\n{reasoning_display_content}\n</details>\n'
-                        else:
-                            if raw:
-                                content = f'{content}\n{block["start_tag"]}{block["content"]}{block["end_tag"]}\n'
-                            else:
-                                content = f'{content}\n<details type="reasoning" done="false">\n<summary>Thinking…</summary>\n{reasoning_display_content}\n</details>\n'
-
-                    elif block["type"] == "code_interpreter":
-                        attributes = block.get("attributes", {})
-                        output = block.get("output", None)
-                        lang = attributes.get("lang", "")
-
-                        content_stripped, original_whitespace = (
-                            split_content_and_whitespace(content)
-                        )
-                        if is_opening_code_block(content_stripped):
-                            # Remove trailing backticks that would open a new block
-                            content = (
-                                content_stripped.rstrip("`").rstrip()
-                                + original_whitespace
-                            )
-                        else:
-                            # Keep content as is - either closing backticks or no backticks
-                            content = content_stripped + original_whitespace
-
-                        if output:
-                            output = html.escape(json.dumps(output))
-
-                            if raw:
-                                content = f'{content}\n<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n```output\n{output}\n```\n'
-                            else:
-                                content = f'{content}\n<details type="code_interpreter" done="true" output="{output}">\n<summary>Analyzed</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
-                        else:
-                            if raw:
-                                content = f'{content}\n<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n'
-                            else:
-                                content = f'{content}\n<details type="code_interpreter" done="false">\n<summary>Analyzing...</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
-
-                    else:
-                        block_content = str(block["content"]).strip()
-                        content = f"{content}{block['type']}: {block_content}\n"
-
-                return content.strip()
-
             def convert_content_blocks_to_messages(content_blocks):
                 messages = []
 
@@ -1757,6 +1638,7 @@ async def process_chat_response(
                     "content": content,
                 }
             ]
+            content_serializer = ContentBlockSerializer()
 
             # We might want to disable this by default
             DETECT_REASONING = True
@@ -1790,7 +1672,7 @@ async def process_chat_response(
                     )
 
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    Chats.upsert_message_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -1836,7 +1718,7 @@ async def process_chat_response(
 
                                 if "selected_model_id" in data:
                                     model_id = data["selected_model_id"]
-                                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                                    Chats.upsert_message_by_id_and_message_id(
                                         metadata["chat_id"],
                                         metadata["message_id"],
                                         {
@@ -1958,7 +1840,7 @@ async def process_chat_response(
                                         reasoning_block["content"] += reasoning_content
 
                                         data = {
-                                            "content": serialize_content_blocks(
+                                            "content": content_serializer.serialize(
                                                 content_blocks
                                             )
                                         }
@@ -2034,19 +1916,19 @@ async def process_chat_response(
                                             )
 
                                         if ENABLE_REALTIME_CHAT_SAVE:
-                                            # Save message in the database
-                                            Chats.upsert_message_to_chat_by_id_and_message_id(
+                                            # Buffer the message, it is flushed to the database periodically
+                                            await CHAT_MESSAGE_WRITE_BUFFER.write(
                                                 metadata["chat_id"],
                                                 metadata["message_id"],
                                                 {
-                                                    "content": serialize_content_blocks(
+                                                    "content": content_serializer.serialize(
                                                         content_blocks
                                                     ),
                                                 },
                                             )
                                         else:
                                             data = {
-                                                "content": serialize_content_blocks(
+                                                "content": content_serializer.serialize(
                                                     content_blocks
                                                 ),
                                             }
@@ -2110,7 +1992,7 @@ async def process_chat_response(
                         {
                             "type": "chat:completion",
                             "data": {
-                                "content": serialize_content_blocks(content_blocks),
+                                "content": content_serializer.serialize(content_blocks),
                             },
                         }
                     )
@@ -2170,6 +2052,7 @@ async def process_chat_response(
                                 }
 
                                 if tool.get("direct", False):
+                                    await event_emitter.flush()
                                     tool_result = await event_caller(
                                         {
                                             "type": "execute:tool",
@@ -2234,7 +2117,7 @@ async def process_chat_response(
                         {
                             "type": "chat:completion",
                             "data": {
-                                "content": serialize_content_blocks(content_blocks),
+                                "content": content_serializer.serialize(content_blocks),
                             },
                         }
                     )
@@ -2277,7 +2160,9 @@ async def process_chat_response(
                             {
                                 "type": "chat:completion",
                                 "data": {
-                                    "content": serialize_content_blocks(content_blocks),
+                                    "content": content_serializer.serialize(
+                                        content_blocks
+                                    ),
                                 },
                             }
                         )
@@ -2294,6 +2179,7 @@ async def process_chat_response(
                                     request.app.state.config.CODE_INTERPRETER_ENGINE
                                     == "pyodide"
                                 ):
+                                    await event_emitter.flush()
                                     output = await event_caller(
                                         {
                                             "type": "execute:python",
@@ -2399,7 +2285,9 @@ async def process_chat_response(
                             {
                                 "type": "chat:completion",
                                 "data": {
-                                    "content": serialize_content_blocks(content_blocks),
+                                    "content": content_serializer.serialize(
+                                        content_blocks
+                                    ),
                                 },
                             }
                         )
@@ -2436,22 +2324,30 @@ async def process_chat_response(
                 title = Chats.get_chat_title_by_id(metadata["chat_id"])
                 data = {
                     "done": True,
-                    "content": serialize_content_blocks(content_blocks),
+                    "content": content_serializer.serialize(content_blocks),
                     "title": title,
                 }
 
+                # Database side effects of batched events must not land after the
+                # final save and overwrite it
+                await event_emitter.flush()
+
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    Chats.upsert_message_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
-                            "content": serialize_content_blocks(content_blocks),
+                            "content": content_serializer.serialize(content_blocks),
                         },
                     )
+                else:
+                    await CHAT_MESSAGE_WRITE_BUFFER.close(
+                        metadata["chat_id"], metadata["message_id"]
+                    )
 
                 # Send a webhook notification if the user is not active
-                if not get_active_status_by_user_id(user.id):
+                if not await get_active_status_by_user_id(user.id):
                     webhook_url = Users.get_user_webhook_url_by_id(user.id)
                     if webhook_url:
                         post_webhook(
@@ -2477,16 +2373,28 @@ async def process_chat_response(
             except asyncio.CancelledError:
                 log.warning("Task was cancelled!")
                 await event_emitter({"type": "task-cancelled"})
+                await event_emitter.flush()
 
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    Chats.upsert_message_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
-                            "content": serialize_content_blocks(content_blocks),
+                            "content": content_serializer.serialize(content_blocks),
                         },
                     )
+            finally:
+                await event_emitter.flush()
+                if ENABLE_REALTIME_CHAT_SAVE:
+                    # Flushes what was buffered and drops the message, however
+                    # the stream ended
+                    try:
+                        await CHAT_MESSAGE_WRITE_BUFFER.close(
+                            metadata["chat_id"], metadata["message_id"]
+                        )
+                    except Exception as e:
+                        log.warning(f"Failed to save buffered chat message: {e}")
 
             if response.background is not None:
                 await response.background()
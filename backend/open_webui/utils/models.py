@@ -1,24 +1,36 @@
 import time
 import logging
 import asyncio
+import hashlib
+import json
 import sys
+import threading
+import uuid
+from itertools import chain
+from typing import Optional
 
 from aiocache import cached
 from fastapi import Request
+from sqlalchemy import event
 
 from open_webui.routers import openai, ollama
 from open_webui.functions import get_function_models
 
 
-from open_webui.models.functions import Functions
-from open_webui.models.models import Models
+from open_webui.internal.db import SessionLocal
+from open_webui.models.functions import Function, Functions
+from open_webui.models.models import Model, Models
 
 
 from open_webui.utils.plugin import (
     load_function_module_by_id,
     get_function_module_from_cache,
 )
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import (
+    _has_group_access,
+    get_user_group_ids,
+    has_access,
+)
 
 
 from open_webui.config import (
@@ -76,150 +88,350 @@ async def get_all_base_models(request: Request, user: UserModel = None):
     return function_models + openai_models + ollama_models
 
 
-async def get_all_models(request, refresh: bool = False, user: UserModel = None):
-    if (
-        request.app.state.MODELS
-        and request.app.state.BASE_MODELS
-        and (request.app.state.config.ENABLE_BASE_MODELS_CACHE and not refresh)
+def get_base_models_fingerprint(base_models: list) -> str:
+    # Base model lists are refetched as new lists of equal models
+    return hashlib.sha256(
+        json.dumps(base_models, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class ModelRegistrySnapshot:
+    def __init__(
+        self,
+        version: int,
+        base_models: list,
+        base_models_fingerprint: str,
+        arena_config: tuple,
+        models: list[dict],
+        model_access: dict[str, tuple[str, Optional[dict]]],
     ):
-        base_models = request.app.state.BASE_MODELS
+        self.version = version
+        self.base_models = base_models
+        self.base_models_fingerprint = base_models_fingerprint
+        self.arena_config = arena_config
+        self.models = models
+        self.models_by_id = {model["id"]: model for model in models}
+        # Owner and access control of every model with a Models entry
+        self.model_access = model_access
+
+
+class ModelRegistry:
+    """
+    Compiled model list shared by every request until models, functions or the
+    base model list change.
+
+    Every commit that writes a `Model` or `Function` row bumps `version`, and so
+    does a message on REDIS_CHANNEL from another replica; a snapshot is only used
+    while its version, base model list and arena settings are current. Base model
+    lists are compared by content, since they are refetched on every request
+    unless ENABLE_BASE_MODELS_CACHE is set.
+    """
+
+    REDIS_CHANNEL = "open-webui:models:invalidate"
+
+    def __init__(self):
+        self.version = 0
+        self.snapshot: Optional[ModelRegistrySnapshot] = None
+        self.base_models_stale = False
+
+        self.redis = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._id = str(uuid.uuid4())
+        self._version_lock = threading.Lock()
+        self._build_lock: Optional[asyncio.Lock] = None
+
+    def get(self, base_models: list, arena_config: tuple):
+        snapshot = self.snapshot
+        if (
+            snapshot is not None
+            and snapshot.version == self.version
+            and snapshot.arena_config == arena_config
+            and (
+                snapshot.base_models is base_models
+                or snapshot.base_models_fingerprint
+                == get_base_models_fingerprint(base_models)
+            )
+        ):
+            return snapshot
+        return None
+
+    def invalidate(self, publish: bool = True):
+        with self._version_lock:
+            self.version += 1
+        if publish:
+            self._publish({"base_models": False})
+
+    def refresh_base_models(self):
+        # The local base model list was just refetched, other replicas refetch theirs
+        self._publish({"base_models": True})
+
+    def _publish(self, message: dict):
+        if self.redis is None or self.loop is None:
+            return
+        # Called from request handlers as well as from worker threads
+        asyncio.run_coroutine_threadsafe(
+            self.redis.publish(
+                self.REDIS_CHANNEL, json.dumps({**message, "sender": self._id})
+            ),
+            self.loop,
+        )
+
+    async def listen(self):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.REDIS_CHANNEL)
+
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                data = json.loads(message["data"])
+                if data.get("sender") == self._id:
+                    continue
+                if data.get("base_models"):
+                    self.base_models_stale = True
+                self.invalidate(publish=False)
+            except Exception as e:
+                log.exception(f"Error handling model registry invalidation: {e}")
+
+    async def build(self, request: Request, base_models: list, arena_config: tuple):
+        if self._build_lock is None:
+            self._build_lock = asyncio.Lock()
+
+        # Concurrent requests wait for one rebuild instead of each running their own
+        async with self._build_lock:
+            snapshot = self.get(base_models, arena_config)
+            if snapshot is None:
+                version = self.version
+                # Before compiling, which may update the models in place
+                fingerprint = get_base_models_fingerprint(base_models)
+                models, model_access = compile_models(request, base_models)
+                snapshot = ModelRegistrySnapshot(
+                    version,
+                    base_models,
+                    fingerprint,
+                    arena_config,
+                    models,
+                    model_access,
+                )
+                self.snapshot = snapshot
+            return snapshot
+
+    def filter_models(self, models: list[dict], user: UserModel) -> list[dict]:
+        """Models of `models` the user can read, checked against the snapshot."""
+        snapshot = self.snapshot
+        model_access = snapshot.model_access if snapshot else {}
+        user_group_ids = None
+
+        def has_read_access(access_control: Optional[dict]) -> bool:
+            nonlocal user_group_ids
+            if access_control is None:
+                return True
+            if user_group_ids is None:
+                user_group_ids = get_user_group_ids(user.id)
+            return _has_group_access(user.id, user_group_ids, "read", access_control)
+
+        filtered_models = []
+        for model in models:
+            if model.get("arena"):
+                if has_read_access(
+                    model.get("info", {}).get("meta", {}).get("access_control", {})
+                ):
+                    filtered_models.append(model)
+                continue
+
+            if model["id"] in model_access:
+                owner_id, access_control = model_access[model["id"]]
+                if user.id == owner_id or has_read_access(access_control):
+                    filtered_models.append(model)
+
+        return filtered_models
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_model_registry_flush(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, (Model, Function)):
+            session.info["model_registry_changed"] = True
+            return
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _track_model_registry_statement(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and (
+        orm_execute_state.bind_mapper is not None
+        and orm_execute_state.bind_mapper.class_ in (Model, Function)
+    ):
+        orm_execute_state.session.info["model_registry_changed"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_model_registry(session):
+    # Only after the commit, a rebuild before it would compile the old rows again
+    if session.info.pop("model_registry_changed", False):
+        MODEL_REGISTRY.invalidate()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _reset_model_registry_changes(session):
+    session.info.pop("model_registry_changed", None)
+
+
+def get_arena_models(request: Request) -> list[dict]:
+    if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
+        return [
+            {
+                "id": model["id"],
+                "name": model["name"],
+                "info": {
+                    "meta": model["meta"],
+                },
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "arena",
+                "arena": True,
+            }
+            for model in request.app.state.config.EVALUATION_ARENA_MODELS
+        ]
     else:
-        base_models = await get_all_base_models(request, user=user)
-        request.app.state.BASE_MODELS = base_models
+        # Add default arena model
+        return [
+            {
+                "id": DEFAULT_ARENA_MODEL["id"],
+                "name": DEFAULT_ARENA_MODEL["name"],
+                "info": {
+                    "meta": DEFAULT_ARENA_MODEL["meta"],
+                },
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "arena",
+                "arena": True,
+            }
+        ]
 
+
+def compile_models(
+    request: Request, base_models: list
+) -> tuple[list[dict], dict[str, tuple[str, Optional[dict]]]]:
     # deep copy the base models to avoid modifying the original list
     models = [model.copy() for model in base_models]
 
-    # If there are no models, return an empty list
-    if len(models) == 0:
-        return []
-
     # Add arena models
     if request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS:
-        arena_models = []
-        if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
-            arena_models = [
-                {
-                    "id": model["id"],
-                    "name": model["name"],
-                    "info": {
-                        "meta": model["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-                for model in request.app.state.config.EVALUATION_ARENA_MODELS
-            ]
-        else:
-            # Add default arena model
-            arena_models = [
-                {
-                    "id": DEFAULT_ARENA_MODEL["id"],
-                    "name": DEFAULT_ARENA_MODEL["name"],
-                    "info": {
-                        "meta": DEFAULT_ARENA_MODEL["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-            ]
-        models = models + arena_models
+        models = models + get_arena_models(request)
 
-    global_action_ids = [
-        function.id for function in Functions.get_global_action_functions()
-    ]
-    enabled_action_ids = [
-        function.id
+    enabled_actions = {
+        function.id: function
         for function in Functions.get_functions_by_type("action", active_only=True)
+    }
+    enabled_filters = {
+        function.id: function
+        for function in Functions.get_functions_by_type("filter", active_only=True)
+    }
+    global_action_ids = [
+        function.id for function in enabled_actions.values() if function.is_global
     ]
-
     global_filter_ids = [
-        function.id for function in Functions.get_global_filter_functions()
-    ]
-    enabled_filter_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("filter", active_only=True)
+        function.id for function in enabled_filters.values() if function.is_global
     ]
 
+    # Ollama may return model ids in different formats (e.g., 'llama3' vs. 'llama3:7b')
+    models_by_id = {}
+    ollama_models_by_name = {}
+    models_by_base_id = {}
+    for model in models:
+        models_by_id.setdefault(model["id"], model)
+        name = model["id"].split(":")[0]
+        if model.get("owned_by") == "ollama":
+            ollama_models_by_name.setdefault(name, []).append(model)
+        models_by_base_id.setdefault(model["id"], model)
+        models_by_base_id.setdefault(name, model)
+
     custom_models = Models.get_all_models()
+    model_access = {
+        custom_model.id: (custom_model.user_id, custom_model.access_control)
+        for custom_model in custom_models
+    }
+
+    removed_ids = set()
     for custom_model in custom_models:
-        if custom_model.base_model_id is None:
-            # Applied directly to a base model
-            for model in models:
-                if custom_model.id == model["id"] or (
-                    model.get("owned_by") == "ollama"
-                    and custom_model.id
-                    == model["id"].split(":")[
-                        0
-                    ]  # Ollama may return model ids in different formats (e.g., 'llama3' vs. 'llama3:7b')
-                ):
-                    if custom_model.is_active:
-                        model["name"] = custom_model.name
-                        model["info"] = custom_model.model_dump()
-
-                        # Set action_ids and filter_ids
-                        action_ids = []
-                        filter_ids = []
-
-                        if "info" in model and "meta" in model["info"]:
-                            action_ids.extend(
-                                model["info"]["meta"].get("actionIds", [])
-                            )
-                            filter_ids.extend(
-                                model["info"]["meta"].get("filterIds", [])
-                            )
-
-                        model["action_ids"] = action_ids
-                        model["filter_ids"] = filter_ids
-                    else:
-                        models.remove(model)
-
-        elif custom_model.is_active and (
-            custom_model.id not in [model["id"] for model in models]
+        if custom_model.base_model_id is not None:
+            continue
+
+        # Applied directly to a base model
+        matches = {
+            id(model): model
+            for model in (
+                (
+                    [models_by_id[custom_model.id]]
+                    if custom_model.id in models_by_id
+                    else []
+                )
+                + ollama_models_by_name.get(custom_model.id, [])
+            )
+        }
+        for model in matches.values():
+            if custom_model.is_active:
+                model["name"] = custom_model.name
+                model["info"] = custom_model.model_dump()
+
+                # Set action_ids and filter_ids
+                meta = model["info"].get("meta") or {}
+                model["action_ids"] = list(meta.get("actionIds", []))
+                model["filter_ids"] = list(meta.get("filterIds", []))
+            else:
+                removed_ids.add(model["id"])
+
+    if removed_ids:
+        models = [model for model in models if model["id"] not in removed_ids]
+        for model_id in removed_ids:
+            models_by_id.pop(model_id, None)
+
+    for custom_model in custom_models:
+        if (
+            custom_model.base_model_id is None
+            or not custom_model.is_active
+            or custom_model.id in models_by_id
         ):
-            owned_by = "openai"
-            pipe = None
+            continue
 
-            action_ids = []
-            filter_ids = []
+        owned_by = "openai"
+        pipe = None
 
-            for model in models:
-                if (
-                    custom_model.base_model_id == model["id"]
-                    or custom_model.base_model_id == model["id"].split(":")[0]
-                ):
-                    owned_by = model.get("owned_by", "unknown owner")
-                    if "pipe" in model:
-                        pipe = model["pipe"]
-                    break
+        action_ids = []
+        filter_ids = []
 
-            if custom_model.meta:
-                meta = custom_model.meta.model_dump()
+        base_model = models_by_base_id.get(custom_model.base_model_id)
+        if base_model is not None and base_model["id"] not in removed_ids:
+            owned_by = base_model.get("owned_by", "unknown owner")
+            if "pipe" in base_model:
+                pipe = base_model["pipe"]
 
-                if "actionIds" in meta:
-                    action_ids.extend(meta["actionIds"])
+        if custom_model.meta:
+            meta = custom_model.meta.model_dump()
 
-                if "filterIds" in meta:
-                    filter_ids.extend(meta["filterIds"])
+            if "actionIds" in meta:
+                action_ids.extend(meta["actionIds"])
 
-            models.append(
-                {
-                    "id": f"{custom_model.id}",
-                    "name": custom_model.name,
-                    "object": "model",
-                    "created": custom_model.created_at,
-                    "owned_by": owned_by,
-                    "info": custom_model.model_dump(),
-                    "preset": True,
-                    **({"pipe": pipe} if pipe is not None else {}),
-                    "action_ids": action_ids,
-                    "filter_ids": filter_ids,
-                }
-            )
+            if "filterIds" in meta:
+                filter_ids.extend(meta["filterIds"])
+
+        model = {
+            "id": f"{custom_model.id}",
+            "name": custom_model.name,
+            "object": "model",
+            "created": custom_model.created_at,
+            "owned_by": owned_by,
+            "info": custom_model.model_dump(),
+            "preset": True,
+            **({"pipe": pipe} if pipe is not None else {}),
+            "action_ids": action_ids,
+            "filter_ids": filter_ids,
+        }
+        models.append(model)
+        models_by_id[model["id"]] = model
 
     # Process action_ids to get the actions
     def get_action_items_from_module(function, module):
@@ -269,46 +481,79 @@ async def get_all_models(request, refresh: bool = False, user: UserModel = None)
         function_module, _, _ = get_function_module_from_cache(request, function_id)
         return function_module
 
+    # Items are the same for every model using a function
+    action_items = {}
+    filter_items = {}
+
     for model in models:
         action_ids = [
             action_id
             for action_id in list(set(model.pop("action_ids", []) + global_action_ids))
-            if action_id in enabled_action_ids
+            if action_id in enabled_actions
         ]
         filter_ids = [
             filter_id
             for filter_id in list(set(model.pop("filter_ids", []) + global_filter_ids))
-            if filter_id in enabled_filter_ids
+            if filter_id in enabled_filters
         ]
 
         model["actions"] = []
         for action_id in action_ids:
-            action_function = Functions.get_function_by_id(action_id)
-            if action_function is None:
-                raise Exception(f"Action not found: {action_id}")
-
-            function_module = get_function_module_by_id(action_id)
-            model["actions"].extend(
-                get_action_items_from_module(action_function, function_module)
-            )
+            if action_id not in action_items:
+                action_items[action_id] = get_action_items_from_module(
+                    enabled_actions[action_id], get_function_module_by_id(action_id)
+                )
+            model["actions"].extend(action_items[action_id])
 
         model["filters"] = []
         for filter_id in filter_ids:
-            filter_function = Functions.get_function_by_id(filter_id)
-            if filter_function is None:
-                raise Exception(f"Filter not found: {filter_id}")
+            if filter_id not in filter_items:
+                function_module = get_function_module_by_id(filter_id)
+                filter_items[filter_id] = (
+                    get_filter_items_from_module(
+                        enabled_filters[filter_id], function_module
+                    )
+                    if getattr(function_module, "toggle", None)
+                    else []
+                )
+            model["filters"].extend(filter_items[filter_id])
 
-            function_module = get_function_module_by_id(filter_id)
+    return models, model_access
 
-            if getattr(function_module, "toggle", None):
-                model["filters"].extend(
-                    get_filter_items_from_module(filter_function, function_module)
-                )
 
-    log.debug(f"get_all_models() returned {len(models)} models")
+async def get_all_models(request, refresh: bool = False, user: UserModel = None):
+    if (
+        request.app.state.MODELS
+        and request.app.state.BASE_MODELS
+        and (request.app.state.config.ENABLE_BASE_MODELS_CACHE and not refresh)
+        and not MODEL_REGISTRY.base_models_stale
+    ):
+        base_models = request.app.state.BASE_MODELS
+    else:
+        MODEL_REGISTRY.base_models_stale = False
+        base_models = await get_all_base_models(request, user=user)
+        request.app.state.BASE_MODELS = base_models
+        if refresh:
+            MODEL_REGISTRY.refresh_base_models()
 
-    request.app.state.MODELS = {model["id"]: model for model in models}
-    return models
+    # If there are no models, return an empty list
+    if len(base_models) == 0:
+        return []
+
+    arena_config = (
+        request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS,
+        request.app.state.config.EVALUATION_ARENA_MODELS,
+    )
+    snapshot = MODEL_REGISTRY.get(base_models, arena_config)
+    if snapshot is None:
+        snapshot = await MODEL_REGISTRY.build(request, base_models, arena_config)
+        log.debug(
+            f"get_all_models() compiled {len(snapshot.models)} models (version {snapshot.version})"
+        )
+
+    request.app.state.MODELS = snapshot.models_by_id
+    # Callers may annotate the returned models, keep the snapshot intact
+    return [model.copy() for model in snapshot.models]
 
 
 def check_model_access(user, model):
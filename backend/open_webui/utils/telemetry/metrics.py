@@ -8,6 +8,11 @@ Metrics collected:
 
 * http.server.requests (counter)
 * http.server.duration (histogram, milliseconds)
+* webui.chat.write_behind.* (counters, buffered realtime chat saves)
+* webui.rag.query_embedding_cache.* (counters, query embedding cache hits/misses)
+* webui.rag.chunk_embedding_store.* (counters, document chunk embeddings reused)
+* webui.rag.extraction_cache.* (counters, extractions reused/evicted, time saved)
+* webui.upstream.* (counters, OpenAI/Ollama requests and pooled connections)
 
 Attributes used: http.method, http.route, http.status_code
 
@@ -34,8 +39,16 @@ from opentelemetry.sdk.resources import SERVICE_NAME, Resource
 
 from open_webui.env import OTEL_SERVICE_NAME, OTEL_EXPORTER_OTLP_ENDPOINT
 
-from open_webui.socket.main import get_active_user_ids
-from open_webui.models.users import Users
+from open_webui.socket.main import get_active_user_count
+from open_webui.models.users import USER_ACTIVITY, USER_CACHE, Users
+from open_webui.utils.write_behind import CHAT_MESSAGE_WRITE_BUFFER
+from open_webui.retrieval.embedding_cache import (
+    CHUNK_EMBEDDING_STORE,
+    QUERY_EMBEDDING_CACHE,
+)
+from open_webui.retrieval.extraction_cache import EXTRACTION_CACHE
+from open_webui.utils.http_pool import UPSTREAM_POOL
+from open_webui.storage.provider import Storage
 
 _EXPORT_INTERVAL_MILLIS = 10_000  # 10 seconds
 
@@ -67,6 +80,27 @@ def _build_meter_provider() -> MeterProvider:
         View(
             instrument_name="webui.users.active",
         ),
+        View(
+            instrument_name="webui.chat.write_behind.*",
+        ),
+        View(
+            instrument_name="webui.rag.query_embedding_cache.*",
+        ),
+        View(
+            instrument_name="webui.rag.chunk_embedding_store.*",
+        ),
+        View(
+            instrument_name="webui.rag.extraction_cache.*",
+        ),
+        View(
+            instrument_name="webui.upstream.*",
+        ),
+        View(
+            instrument_name="webui.users.*",
+        ),
+        View(
+            instrument_name="webui.storage.cache.*",
+        ),
     ]
 
     provider = MeterProvider(
@@ -100,7 +134,7 @@ def setup_metrics(app: FastAPI) -> None:
     ) -> Sequence[metrics.Observation]:
         return [
             metrics.Observation(
-                value=len(get_active_user_ids()),
+                value=get_active_user_count(),
             )
         ]
 
@@ -127,6 +161,229 @@ def setup_metrics(app: FastAPI) -> None:
         callbacks=[observe_active_users],
     )
 
+    def observe_write_behind(stat: str):
+        def callback(
+            options: metrics.CallbackOptions,
+        ) -> Sequence[metrics.Observation]:
+            return [metrics.Observation(value=CHAT_MESSAGE_WRITE_BUFFER.stats[stat])]
+
+        return callback
+
+    meter.create_observable_counter(
+        name="webui.chat.write_behind.writes",
+        description="Realtime chat saves received by the write-behind buffer",
+        unit="1",
+        callbacks=[observe_write_behind("writes")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.chat.write_behind.flushes",
+        description="Realtime chat saves flushed to the database",
+        unit="1",
+        callbacks=[observe_write_behind("flushes")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.chat.write_behind.bytes_written",
+        description="Bytes of chat messages flushed to the database",
+        unit="By",
+        callbacks=[observe_write_behind("bytes_written")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.chat.write_behind.bytes_saved",
+        description="Bytes of chat messages coalesced instead of written",
+        unit="By",
+        callbacks=[observe_write_behind("bytes_saved")],
+    )
+
+    if QUERY_EMBEDDING_CACHE is not None:
+
+        def observe_query_embedding_cache(stat: str):
+            def callback(
+                options: metrics.CallbackOptions,
+            ) -> Sequence[metrics.Observation]:
+                return [metrics.Observation(value=QUERY_EMBEDDING_CACHE.stats[stat])]
+
+            return callback
+
+        meter.create_observable_counter(
+            name="webui.rag.query_embedding_cache.hits",
+            description="Query embeddings served from the cache",
+            unit="1",
+            callbacks=[observe_query_embedding_cache("hits")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.rag.query_embedding_cache.misses",
+            description="Query embeddings computed by the embedding backend",
+            unit="1",
+            callbacks=[observe_query_embedding_cache("misses")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.rag.query_embedding_cache.redis_hits",
+            description="Query embedding cache hits served from Redis",
+            unit="1",
+            callbacks=[observe_query_embedding_cache("redis_hits")],
+        )
+
+    if CHUNK_EMBEDDING_STORE is not None:
+
+        def observe_chunk_embedding_store(stat: str):
+            def callback(
+                options: metrics.CallbackOptions,
+            ) -> Sequence[metrics.Observation]:
+                return [metrics.Observation(value=CHUNK_EMBEDDING_STORE.stats[stat])]
+
+            return callback
+
+        meter.create_observable_counter(
+            name="webui.rag.chunk_embedding_store.reused",
+            description="Document chunk embeddings reused from the store",
+            unit="1",
+            callbacks=[observe_chunk_embedding_store("reused")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.rag.chunk_embedding_store.embedded",
+            description="Document chunk embeddings computed by the embedding backend",
+            unit="1",
+            callbacks=[observe_chunk_embedding_store("embedded")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.rag.chunk_embedding_store.calls_saved",
+            description="Embedding backend calls saved by reused chunk embeddings",
+            unit="1",
+            callbacks=[observe_chunk_embedding_store("calls_saved")],
+        )
+
+    def observe_upstream_pool(stat: str):
+        def callback(
+            options: metrics.CallbackOptions,
+        ) -> Sequence[metrics.Observation]:
+            return [metrics.Observation(value=UPSTREAM_POOL.stats[stat])]
+
+        return callback
+
+    meter.create_observable_counter(
+        name="webui.upstream.requests",
+        description="Requests sent to OpenAI and Ollama upstreams",
+        unit="1",
+        callbacks=[observe_upstream_pool("requests")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.upstream.connections_created",
+        description="Upstream connections opened (TCP and TLS handshake)",
+        unit="1",
+        callbacks=[observe_upstream_pool("connections_created")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.upstream.connections_reused",
+        description="Upstream requests served on a pooled keep-alive connection",
+        unit="1",
+        callbacks=[observe_upstream_pool("connections_reused")],
+    )
+
+    def observe_stat(stats: dict, stat: str):
+        def callback(
+            options: metrics.CallbackOptions,
+        ) -> Sequence[metrics.Observation]:
+            return [metrics.Observation(value=stats[stat])]
+
+        return callback
+
+    meter.create_observable_counter(
+        name="webui.users.cache.hits",
+        description="Authenticated user lookups served from the user cache",
+        unit="1",
+        callbacks=[observe_stat(USER_CACHE.stats, "hits")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.users.cache.misses",
+        description="Authenticated user lookups read from the database",
+        unit="1",
+        callbacks=[observe_stat(USER_CACHE.stats, "misses")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.users.last_active.updates",
+        description="Requests that refreshed a user's last active timestamp",
+        unit="1",
+        callbacks=[observe_stat(USER_ACTIVITY.stats, "updates")],
+    )
+
+    meter.create_observable_counter(
+        name="webui.users.last_active.rows_written",
+        description="User rows written by batched last active updates",
+        unit="1",
+        callbacks=[observe_stat(USER_ACTIVITY.stats, "rows_written")],
+    )
+
+    if EXTRACTION_CACHE is not None:
+        meter.create_observable_counter(
+            name="webui.rag.extraction_cache.hits",
+            description="Document extractions served from the extraction cache",
+            unit="1",
+            callbacks=[observe_stat(EXTRACTION_CACHE.stats, "hits")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.rag.extraction_cache.misses",
+            description="Documents extracted by the content extraction engine",
+            unit="1",
+            callbacks=[observe_stat(EXTRACTION_CACHE.stats, "misses")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.rag.extraction_cache.evictions",
+            description="Extraction cache entries removed by its age or size bound",
+            unit="1",
+            callbacks=[observe_stat(EXTRACTION_CACHE.stats, "evictions")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.rag.extraction_cache.seconds_saved",
+            description="Extraction time saved by the extraction cache",
+            unit="s",
+            callbacks=[observe_stat(EXTRACTION_CACHE.stats, "seconds_saved")],
+        )
+
+    # Local copies of remote storage objects, not kept by local storage
+    storage_cache = getattr(Storage, "cache", None)
+    if storage_cache is not None:
+        meter.create_observable_counter(
+            name="webui.storage.cache.hits",
+            description="Remote storage reads served from the local copy",
+            unit="1",
+            callbacks=[observe_stat(storage_cache.stats, "hits")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.storage.cache.misses",
+            description="Remote storage reads that downloaded the object",
+            unit="1",
+            callbacks=[observe_stat(storage_cache.stats, "misses")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.storage.cache.evictions",
+            description="Local copies of remote storage objects evicted",
+            unit="1",
+            callbacks=[observe_stat(storage_cache.stats, "evictions")],
+        )
+
+        meter.create_observable_counter(
+            name="webui.storage.cache.bytes_fetched",
+            description="Bytes downloaded from remote storage",
+            unit="By",
+            callbacks=[observe_stat(storage_cache.stats, "bytes_fetched")],
+        )
+
     # FastAPI middleware
     @app.middleware("http")
     async def _metrics_middleware(request: Request, call_next):
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from open_webui.models.chats import Chats
+from open_webui.env import (
+    REDIS_KEY_PREFIX,
+    REALTIME_CHAT_SAVE_INTERVAL,
+    REALTIME_CHAT_SAVE_MAX_BYTES,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+# Deletes a journal entry only if it still holds the payload that was read, so
+# that an entry rewritten by its replica in the meantime is left alone
+CLAIM_JOURNAL_ENTRY = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    return redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+
+def get_message_size(message: dict) -> int:
+    # Estimated without serializing the message, it is mostly the content string
+    return sum(
+        len(value) if isinstance(value, str) else len(json.dumps(value, default=str))
+        for value in message.values()
+    )
+
+
+@dataclass
+class PendingMessage:
+    message: dict = field(default_factory=dict)
+    size: int = 0
+    flushed_size: int = 0
+    flushed_at: float = field(default_factory=time.monotonic)
+    journaled_at: Optional[float] = None
+    timer: Optional[asyncio.Task] = None
+
+
+class ChatMessageWriteBuffer:
+    """
+    Write-behind buffer for streamed chat messages.
+
+    Writes for the same (chat_id, message_id) are merged in memory and persisted
+    with a single upsert once `interval` seconds have passed since the last flush,
+    once the payload has grown by `max_bytes`, or when `flush` is called at the end
+    of the stream. A timer flushes messages whose stream stalls.
+
+    When Redis is available buffered messages are also journaled, at most once
+    per `journal_interval` seconds, so that `recover` can replay messages that
+    were not flushed before a crash. Replicas share the journal: an entry is only
+    recovered once it is `stale_after` seconds old, since its replica would have
+    flushed and removed it by then if it were still running.
+    """
+
+    def __init__(
+        self,
+        interval: float = REALTIME_CHAT_SAVE_INTERVAL,
+        max_bytes: int = REALTIME_CHAT_SAVE_MAX_BYTES,
+        redis=None,
+        redis_key: str = f"{REDIS_KEY_PREFIX}:chat:write_behind",
+        journal_interval: float = 0.25,
+        stale_after: float = 30,
+    ):
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.redis = redis
+        self.redis_key = redis_key
+        self.journal_interval = journal_interval
+        self.stale_after = max(interval, 0) + stale_after
+
+        self._pending: dict[tuple[str, str], PendingMessage] = {}
+        self.stats = {
+            "writes": 0,
+            "flushes": 0,
+            "bytes_written": 0,
+            "bytes_saved": 0,
+        }
+
+    def _journal_field(self, chat_id: str, message_id: str) -> str:
+        return json.dumps([chat_id, message_id])
+
+    async def write(self, chat_id: str, message_id: str, message: dict):
+        key = (chat_id, message_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = PendingMessage()
+
+        pending.message = {**pending.message, **message}
+        pending.size = get_message_size(pending.message)
+        self.stats["writes"] += 1
+
+        now = time.monotonic()
+        if (
+            self.interval <= 0
+            or now - pending.flushed_at >= self.interval
+            or pending.size - pending.flushed_size >= self.max_bytes
+        ):
+            await self.flush(chat_id, message_id)
+            return
+
+        # Every buffered write that does not reach the database saves a full upsert
+        self.stats["bytes_saved"] += pending.size
+
+        if pending.timer is None:
+            pending.timer = asyncio.create_task(
+                self._flush_later(
+                    chat_id, message_id, pending.flushed_at + self.interval - now
+                )
+            )
+
+        if self.redis and (
+            pending.journaled_at is None
+            or now - pending.journaled_at >= self.journal_interval
+        ):
+            await self._journal(chat_id, message_id, pending)
+
+    async def _journal(self, chat_id: str, message_id: str, pending: PendingMessage):
+        pending.journaled_at = time.monotonic()
+        try:
+            await self.redis.hset(
+                self.redis_key,
+                self._journal_field(chat_id, message_id),
+                json.dumps(
+                    {"message": pending.message, "journaled_at": time.time()},
+                    ensure_ascii=False,
+                ),
+            )
+        except Exception as e:
+            log.warning(f"Failed to journal buffered chat message: {e}")
+
+    async def _flush_later(self, chat_id: str, message_id: str, delay: float):
+        await asyncio.sleep(delay)
+        pending = self._pending.get((chat_id, message_id))
+        if pending is None or pending.timer is not asyncio.current_task():
+            return
+
+        pending.timer = None
+        try:
+            await self.flush(chat_id, message_id)
+        except Exception as e:
+            log.warning(f"Failed to flush buffered chat message: {e}")
+
+    async def flush(self, chat_id: str, message_id: str) -> bool:
+        """Persist a buffered message, returning False if the upsert failed."""
+        key = (chat_id, message_id)
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return True
+        if pending.timer is not None:
+            pending.timer.cancel()
+            pending.timer = None
+        if not pending.message:
+            return True
+
+        if not Chats.upsert_message_by_id_and_message_id(
+            chat_id, message_id, pending.message
+        ):
+            # Keep the message buffered and journaled, so that it is retried by a
+            # later flush or, should this replica stop, by `recover`
+            self._pending[key] = pending
+            if self.interval > 0:
+                pending.timer = asyncio.create_task(
+                    self._flush_later(chat_id, message_id, self.interval)
+                )
+            if self.redis:
+                await self._journal(chat_id, message_id, pending)
+            return False
+
+        self.stats["flushes"] += 1
+        self.stats["bytes_written"] += pending.size
+
+        if self.redis and pending.journaled_at is not None:
+            await self._clear_journal(chat_id, message_id)
+
+        # Later writes to the same message start from the flushed state
+        if self.interval > 0:
+            self._pending.setdefault(
+                key,
+                PendingMessage(flushed_size=pending.size, flushed_at=time.monotonic()),
+            )
+        return True
+
+    async def _clear_journal(self, chat_id: str, message_id: str):
+        try:
+            await self.redis.hdel(
+                self.redis_key, self._journal_field(chat_id, message_id)
+            )
+        except Exception as e:
+            log.warning(f"Failed to clear chat message journal: {e}")
+
+    async def close(self, chat_id: str, message_id: str):
+        """
+        Flush and forget a message once its stream has ended or failed. A message
+        that cannot be saved is left in the journal for `recover` to retry.
+        """
+        try:
+            if not await self.flush(chat_id, message_id):
+                log.warning(f"Failed to save message {message_id} of chat {chat_id}")
+        finally:
+            pending = self._pending.pop((chat_id, message_id), None)
+            if pending is not None and pending.timer is not None:
+                pending.timer.cancel()
+
+    async def recover(self, redis=None) -> int:
+        """
+        Replay journaled messages that were buffered but never flushed by a
+        replica that is gone, claiming each entry so it is replayed only once.
+        """
+        redis = redis or self.redis
+        if redis is None:
+            return 0
+
+        entries = await redis.hgetall(self.redis_key)
+        recovered = 0
+        for journal_field, payload in entries.items():
+            try:
+                entry = json.loads(payload)
+                if time.time() - entry.get("journaled_at", 0) < self.stale_after:
+                    continue
+                if not await redis.eval(
+                    CLAIM_JOURNAL_ENTRY, 1, self.redis_key, journal_field, payload
+                ):
+                    continue
+
+                chat_id, message_id = json.loads(journal_field)
+                if Chats.upsert_message_by_id_and_message_id(
+                    chat_id, message_id, entry["message"]
+                ):
+                    recovered += 1
+                else:
+                    # Put the entry back, it is retried on the next run
+                    await redis.hsetnx(self.redis_key, journal_field, payload)
+            except Exception as e:
+                log.warning(f"Failed to recover journaled chat message: {e}")
+
+        if recovered:
+            log.info(f"Recovered {recovered} buffered chat message(s) from journal")
+        return recovered
+
+    async def run(self):
+        """Periodically recover the journal entries left behind by other replicas."""
+        while True:
+            await asyncio.sleep(self.stale_after)
+            try:
+                await self.recover()
+            except Exception as e:
+                log.warning(f"Failed to recover buffered chat messages: {e}")
+
+
+CHAT_MESSAGE_WRITE_BUFFER = ChatMessageWriteBuffer()
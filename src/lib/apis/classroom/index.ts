@@ -17,8 +17,16 @@ export const getClassroomToggle = async (token: string): Promise<{ enabled: bool
   return res.json();
 };
 
-export const listCourses = async (token: string): Promise<Course[]> => {
-  const res = await fetch(`${WEBUI_BASE_URL}/api/classroom/courses`, {
+export const listCourses = async (
+  token: string,
+  params: { term?: string; limit?: number; cursor?: string } = {}
+): Promise<Course[]> => {
+  const searchParams = new URLSearchParams();
+  if (params.term) searchParams.append('term', params.term);
+  if (params.limit) searchParams.append('limit', `${params.limit}`);
+  if (params.cursor) searchParams.append('cursor', params.cursor);
+  const query = searchParams.toString();
+  const res = await fetch(`${WEBUI_BASE_URL}/api/classroom/courses${query ? `?${query}` : ''}`, {
     headers: { Accept: 'application/json', 'Content-Type': 'application/json', ...(token && { authorization: `Bearer ${token}` }) }
   });
   if (!res.ok) throw await res.json();